@@ -0,0 +1,157 @@
+"""
+Load test: sync def handlers on a thread pool vs. async def handlers on asyncpg
+
+Serves the same queries through both handler styles from one uvicorn
+process, with equally sized connection pools, and hits them at increasing
+concurrency:
+
+    python -m benchmarks.async_load --concurrency 50 200 500 --requests 5000
+
+Endpoints:
+    kpis       SELECT * FROM kpis
+    analytics  first page (100 rows) of analytics_data by (timestamp, id)
+    slow       SELECT pg_sleep(--delay), a query that keeps the database busy
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ENDPOINTS = ('kpis', 'analytics', 'slow')
+
+
+def create_app():
+    """Application factory run inside the uvicorn process"""
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine, select, text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from database.connection import get_database_url
+    from database.models import KPI, AnalyticsData
+
+    pool_size = int(os.environ['BENCH_POOL_SIZE'])
+    delay = float(os.environ['BENCH_DELAY'])
+    pool = {'pool_size': pool_size, 'max_overflow': 0, 'pool_timeout': 60}
+    sync_session = sessionmaker(bind=create_engine(get_database_url(), **pool))
+    async_session = async_sessionmaker(create_async_engine(get_database_url('postgresql+asyncpg'), **pool))
+
+    queries = {
+        'kpis': select(KPI),
+        'analytics': select(AnalyticsData).order_by(AnalyticsData.timestamp, AnalyticsData.id).limit(100),
+        'slow': text('SELECT pg_sleep(:delay)').bindparams(delay=delay),
+    }
+    def sync_handler(stmt):
+        def handler():
+            with sync_session() as db:
+                return len(db.execute(stmt).all())
+        return handler
+
+    def async_handler(stmt):
+        async def handler():
+            async with async_session() as db:
+                return len((await db.execute(stmt)).all())
+        return handler
+
+    app = FastAPI()
+    for name, stmt in queries.items():
+        app.get(f'/sync/{name}')(sync_handler(stmt))
+        app.get(f'/async/{name}')(async_handler(stmt))
+    return app
+
+
+async def run_load(url: str, concurrency: int, requests: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            began = time.perf_counter()
+            try:
+                response = await client.get(url)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - began) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        began = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2) if latencies else None,
+        'errors': errors,
+    }
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen):
+    for _ in range(200):
+        if server.poll() is not None:
+            sys.exit('uvicorn exited before accepting connections')
+        try:
+            httpx.get(f'{base_url}/sync/kpis', timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    sys.exit('uvicorn did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per endpoint, mode and concurrency')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--delay', type=float, default=0.05, help='Seconds slept by the slow endpoint')
+    parser.add_argument('--pool-size', type=int, default=50, help='Connections in each mode\'s pool')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    env = {**os.environ, 'BENCH_POOL_SIZE': str(args.pool_size), 'BENCH_DELAY': str(args.delay)}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'benchmarks.async_load:create_app', '--factory',
+         '--port', str(args.port), '--log-level', 'warning', '--no-access-log'],
+        env=env
+    )
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = []
+    try:
+        wait_until_ready(base_url, server)
+        print(f"{'endpoint':<10}{'conc.':>6} {'mode':<6}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                for mode in ('sync', 'async'):
+                    url = f'{base_url}/{mode}/{endpoint}'
+                    # Warm up connections and the pool before measuring
+                    asyncio.run(run_load(url, concurrency, concurrency))
+                    result = asyncio.run(run_load(url, concurrency, args.requests))
+                    results.append({'endpoint': endpoint, 'concurrency': concurrency, 'mode': mode, **result})
+                    print(f"{endpoint:<10}{concurrency:>6} {mode:<6}{result['rps']:>10}{result['p50_ms']:>10}"
+                          f"{result['p99_ms']:>10}{result['errors']:>8}", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'requests': args.requests, 'delay': args.delay, 'pool_size': args.pool_size,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""
+Benchmark suite: throughput and latency of the service endpoints by data size
+
+Creates and migrates a dedicated database if needed, seeds it with
+synthetic analytics_data (plus rollups), KPIs with history and reports at
+each size, starts the service against it and loads every scenario:
+
+    python -m benchmarks.endpoints --sizes 10k 1m 10m --output results.json
+    python -m benchmarks.endpoints --sizes 10k --compare results.json
+
+Scenarios:
+    ingest_single      POST /api/analytics/data, one row per request
+    ingest_bulk        POST /api/analytics/data/bulk, --bulk-rows rows per request
+    analytics_data     GET /api/analytics/data, a page of one source and type over the last week
+    aggregate          GET /api/analytics/aggregate, hourly sum/avg/p95 of one source by region over the last week
+    run_report         GET /api/reports/{id}/run?refresh=true, running the query every time
+    run_report_cached  GET /api/reports/{id}/run, reusing a fresh result
+    dashboard          GET /api/dashboard
+    overview           GET /api/overview
+
+Results are written as JSON along with the commit they were taken at.
+--compare matches them against an earlier file by size, scenario and
+concurrency, and exits with status 1 if a p99 grew by more than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from database.connection import get_database_url
+from database.partitions import create_default_partition, create_partitions, month_start
+from database.rollups import rebuild
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Ingestion runs last since it adds rows
+SCENARIOS = ('analytics_data', 'aggregate', 'run_report', 'run_report_cached', 'dashboard', 'overview',
+             'ingest_single', 'ingest_bulk')
+SIZE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+SEED_BATCH = 1_000_000
+
+SOURCES = ('orders', 'crm', 'inventory', 'finance', 'web')
+DATA_TYPES = ('revenue', 'orders', 'customers', 'products', 'latency')
+REGIONS = ('north', 'south', 'east', 'west', 'center', 'abroad')
+
+SEED_SQL = """
+    INSERT INTO analytics_data (source, data_type, "timestamp", value, dimension, dimension_value)
+    SELECT (ARRAY['orders', 'crm', 'inventory', 'finance', 'web'])[1 + i % 5],
+           (ARRAY['revenue', 'orders', 'customers', 'products', 'latency'])[1 + (i / 5) % 5],
+           :start + (i * :step) * interval '1 second',
+           round((random() * 1000)::numeric, 2),
+           'region',
+           (ARRAY['north', 'south', 'east', 'west', 'center', 'abroad'])[1 + (i / 25) % 6]
+    FROM generate_series(:first, :last) AS i
+"""
+
+REPORTS = {
+    'revenue_by_region': """
+        SELECT dimension_value AS region, sum(value) AS total FROM analytics_data
+        WHERE data_type = 'revenue' AND "timestamp" >= (now() AT TIME ZONE 'utc') - interval '30 days'
+        GROUP BY 1 ORDER BY 2 DESC
+    """,
+    'daily_orders': """
+        SELECT date_trunc('day', "timestamp") AS day, count(*) AS orders FROM analytics_data
+        WHERE data_type = 'orders' AND "timestamp" >= (now() AT TIME ZONE 'utc') - interval '90 days'
+        GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    if value[-1:] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def ensure_database(name: str):
+    """Create the benchmark database if it does not exist and migrate it"""
+    maintenance = create_engine(get_database_url().rsplit('/', 1)[0] + '/postgres', isolation_level='AUTOCOMMIT')
+    with maintenance.connect() as connection:
+        if not connection.execute(text('SELECT 1 FROM pg_database WHERE datname = :name'), {'name': name}).first():
+            connection.execute(text(f'CREATE DATABASE "{name}"'))
+            print(f"Created database {name}")
+    maintenance.dispose()
+    subprocess.run([sys.executable, '-m', 'alembic', 'upgrade', 'head'], cwd=SERVICE_DIR,
+                   env={**os.environ, 'DB_NAME': name}, check=True, stdout=subprocess.DEVNULL)
+
+
+def seed(engine, rows: int, days: int, kpis: int, now: datetime) -> dict:
+    """Replace the data with ``rows`` analytics rows over the last ``days``, KPIs and reports"""
+    start = now - timedelta(days=days)
+    began = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text(
+            'TRUNCATE analytics_data, analytics_rollup_hourly, analytics_rollup_daily, kpis, reports CASCADE'
+        ))
+        create_partitions(connection, start=month_start(start.date()), months_ahead=1)
+        create_default_partition(connection, 'analytics_data')
+    params = {'start': start, 'step': days * 86400.0 / rows}
+    for first in range(0, rows, SEED_BATCH):
+        with engine.begin() as connection:
+            connection.execute(text(SEED_SQL), {**params, 'first': first, 'last': min(rows, first + SEED_BATCH) - 1})
+        print(f"  {min(rows, first + SEED_BATCH)} of {rows} rows", flush=True)
+
+    with engine.begin() as connection:
+        rebuild(connection, 'analytics_rollup_hourly', 'hour')
+        rebuild(connection, 'analytics_rollup_daily', 'day')
+        connection.execute(text("""
+            INSERT INTO kpis (name, category, current_value, target_value, unit, last_updated)
+            SELECT 'kpi_' || i, (ARRAY['sales', 'finance', 'operations'])[1 + i % 3],
+                   random() * 100, 80, '%', :now
+            FROM generate_series(1, :kpis) AS i
+        """), {'now': now, 'kpis': kpis})
+        connection.execute(text("""
+            INSERT INTO kpi_values (metric_id, value, period_start, period_end, created_at)
+            SELECT k.id, random() * 100, :now - d * interval '1 day', :now - d * interval '1 day', :now
+            FROM kpis k, generate_series(0, 29) AS d
+        """), {'now': now})
+        report_ids = {
+            name: str(connection.execute(text("""
+                INSERT INTO reports (name, query, created_at, updated_at)
+                VALUES (:name, :query, :now, :now) RETURNING id
+            """), {'name': name, 'query': query.strip(), 'now': now}).scalar())
+            for name, query in REPORTS.items()
+        }
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM ANALYZE'))
+    print(f"  seeded in {time.perf_counter() - began:.1f}s", flush=True)
+    return report_ids
+
+
+def existing_data(engine) -> tuple:
+    """(analytics rows, report ids by name) of an already seeded database"""
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT count(*) FROM analytics_data')).scalar()
+        return rows, {name: str(report_id) for report_id, name in connection.execute(
+            text('SELECT id, name FROM reports WHERE name = ANY(:names)'), {'names': list(REPORTS)}
+        )}
+
+
+def scenario_request(name: str, index: int, report_ids: dict, bulk_rows: int, now: datetime) -> tuple:
+    """(method, path, keyword arguments for httpx) of the index-th request of a scenario"""
+    if name == 'ingest_single':
+        return 'POST', '/api/analytics/data', {'json': synthetic_row(index, now)}
+    if name == 'ingest_bulk':
+        rows = [synthetic_row(index * bulk_rows + offset, now) for offset in range(bulk_rows)]
+        return 'POST', '/api/analytics/data/bulk?return_ids=false', {'json': rows}
+    if name == 'analytics_data':
+        params = {
+            'source': SOURCES[index % len(SOURCES)],
+            'data_type': DATA_TYPES[index % len(DATA_TYPES)],
+            'start_date': (now - timedelta(days=7)).isoformat(),
+            'end_date': now.isoformat(),
+            'limit': 1000,
+        }
+        return 'GET', '/api/analytics/data', {'params': params}
+    if name == 'aggregate':
+        params = {
+            'bucket': 'hour',
+            'aggregates': 'sum,avg,p95',
+            'source': SOURCES[index % len(SOURCES)],
+            'dimension': 'region',
+            'start_date': (now - timedelta(days=7)).isoformat(),
+        }
+        return 'GET', '/api/analytics/aggregate', {'params': params}
+    if name in ('run_report', 'run_report_cached'):
+        report_id = list(report_ids.values())[index % len(report_ids)]
+        return 'GET', f'/api/reports/{report_id}/run', {'params': {'refresh': name == 'run_report'}}
+    if name == 'dashboard':
+        return 'GET', '/api/dashboard', {'params': {'period': 'month'}}
+    return 'GET', '/api/overview', {'params': {'timeframe': 'month'}}
+
+
+def synthetic_row(index: int, now: datetime) -> dict:
+    return {
+        'source': SOURCES[index % len(SOURCES)],
+        'data_type': DATA_TYPES[index // len(SOURCES) % len(DATA_TYPES)],
+        'timestamp': (now - timedelta(seconds=index % 86400)).isoformat(),
+        'value': float(index % 1000),
+        'dimension': 'region',
+        'dimension_value': REGIONS[index % len(REGIONS)],
+    }
+
+
+async def run_load(base_url: str, build_request, concurrency: int, requests: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for index in remaining:
+            method, path, kwargs = build_request(index)
+            began = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - began) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        began = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2) if latencies else None,
+        'errors': errors,
+    }
+
+
+def start_server(port: int, database: str) -> subprocess.Popen:
+    env = {**os.environ, 'DB_NAME': database, 'REPORT_SCHEDULER_ENABLED': 'false', 'KPI_ENGINE_ENABLED': 'false'}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning',
+         '--no-access-log'],
+        cwd=SERVICE_DIR, env=env
+    )
+    for _ in range(600):
+        if server.poll() is not None:
+            sys.exit('uvicorn exited before accepting connections')
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/api/health', timeout=1)
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    else:
+        server.terminate()
+        sys.exit('uvicorn did not start')
+    # With HOT_WINDOW_ENABLED=true, measure once the window is loaded
+    while httpx.get(f'http://127.0.0.1:{port}/api/cache/stats', timeout=5).json().get('hot_window', {}).get('loading'):
+        time.sleep(0.5)
+    return server
+
+
+def current_commit() -> dict:
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=SERVICE_DIR, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '--', '.'))}
+
+
+def compare(baseline_path: str, results: list, threshold: float) -> int:
+    """Print p99 and throughput changes against a baseline file, return the number of p99 regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r['size'], r['scenario'], r['concurrency']): r for r in baseline['results']}
+    print(f"\nAgainst {baseline_path} ({(baseline.get('commit') or 'unknown commit')[:12]})")
+    print(f"{'size':>10} {'scenario':<18}{'conc.':>6}{'p99 before':>12}{'p99 now':>10}{'change':>9}{'rps change':>12}")
+    regressions = 0
+    for result in results:
+        previous = before.get((result['size'], result['scenario'], result['concurrency']))
+        if previous is None or not previous['p99_ms'] or not result['p99_ms']:
+            continue
+        change = (result['p99_ms'] - previous['p99_ms']) / previous['p99_ms']
+        rps_change = (result['rps'] - previous['rps']) / previous['rps'] if previous['rps'] else 0
+        regressed = change > threshold
+        regressions += regressed
+        print(f"{result['size']:>10} {result['scenario']:<18}{result['concurrency']:>6}{previous['p99_ms']:>12}"
+              f"{result['p99_ms']:>10}{change:>+9.0%}{rps_change:>+12.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['10k'], help='analytics_data rows, e.g. 10k 1m 10m')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10])
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario and concurrency')
+    parser.add_argument('--bulk-rows', type=int, default=1000, help='Rows per ingest_bulk request')
+    parser.add_argument('--days', type=int, default=90, help='Time span covered by the seeded rows')
+    parser.add_argument('--kpis', type=int, default=200)
+    parser.add_argument('--database', default='erp_analytics_bench', help='Database to create, seed and serve')
+    parser.add_argument('--skip-seed', action='store_true',
+                        help='Reuse the data already in the database, including rows added by ingestion scenarios')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p99 growth against --compare')
+    args = parser.parse_args()
+
+    # The service, alembic and the seeding all use DB_NAME
+    os.environ['DB_NAME'] = args.database
+    ensure_database(args.database)
+    engine = create_engine(get_database_url())
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = []
+    print(f"{'size':>10} {'scenario':<18}{'conc.':>6}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    sizes = [None] if args.skip_seed else [parse_size(size) for size in args.sizes]
+    for size in sizes:
+        now = datetime.utcnow().replace(microsecond=0)
+        if args.skip_seed:
+            size, report_ids = existing_data(engine)
+        else:
+            print(f"Seeding {size} rows", flush=True)
+            report_ids = seed(engine, size, args.days, args.kpis, now)
+        server = start_server(args.port, args.database)
+        try:
+            for scenario in args.scenarios:
+                if scenario.startswith('run_report') and not report_ids:
+                    continue
+                for concurrency in args.concurrency:
+                    def build_request(index):
+                        return scenario_request(scenario, index, report_ids, args.bulk_rows, now)
+                    # Warm up connections, pools and caches before measuring
+                    asyncio.run(run_load(base_url, build_request, concurrency, concurrency))
+                    result = asyncio.run(run_load(base_url, build_request, concurrency, args.requests))
+                    if scenario == 'ingest_bulk':
+                        result['rows_per_s'] = round(result['rps'] * args.bulk_rows, 1)
+                    results.append({'size': size, 'scenario': scenario, 'concurrency': concurrency, **result})
+                    print(f"{size:>10} {scenario:<18}{concurrency:>6}{result['rps']:>10}{result['p50_ms']:>10}"
+                          f"{result['p99_ms']:>10}{result['errors']:>8}", flush=True)
+        finally:
+            server.terminate()
+            server.wait()
+    engine.dispose()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                **current_commit(),
+                'taken_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'settings': {key: getattr(args, key) for key in ('requests', 'bulk_rows', 'days', 'kpis')},
+                'results': results,
+            }, f, indent=2)
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
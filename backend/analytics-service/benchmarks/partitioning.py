@@ -0,0 +1,152 @@
+"""
+Query latency benchmark: unindexed analytics_data vs. partitioned + indexed
+
+Seeds two scratch tables in a ``bench`` schema with the same synthetic rows
+and times the filters used by the analytics endpoints against each:
+
+    python -m benchmarks.partitioning --rows 10000000
+
+The scratch schema is dropped afterwards unless --keep is given.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from database.connection import get_database_url
+from database.partitions import create_default_partition, create_partitions, month_start
+
+PLAIN_TABLE = 'bench.analytics_data_plain'
+PARTITIONED_TABLE = 'bench.analytics_data'
+
+COLUMNS_DDL = """
+    id uuid NOT NULL DEFAULT gen_random_uuid(),
+    source varchar NOT NULL,
+    data_type varchar NOT NULL,
+    "timestamp" timestamp NOT NULL,
+    value double precision,
+    dimension varchar,
+    dimension_value varchar
+"""
+
+SEED_SQL = """
+    INSERT INTO {table} (source, data_type, "timestamp", value, dimension, dimension_value)
+    SELECT (ARRAY['orders', 'crm', 'inventory', 'finance', 'web'])[1 + i % 5],
+           (ARRAY['revenue', 'count', 'latency', 'stock'])[1 + (i / 5) % 4],
+           :start + (i * :step) * interval '1 second',
+           random() * 1000,
+           'region',
+           (ARRAY['north', 'south', 'east', 'west', 'center', 'abroad'])[1 + (i / 20) % 6]
+    FROM generate_series(0, :rows - 1) AS i
+"""
+
+QUERIES = {
+    'source_type_last_week': """
+        SELECT count(*), sum(value) FROM {table}
+        WHERE source = 'orders' AND data_type = 'revenue'
+          AND "timestamp" >= :end - interval '7 days' AND "timestamp" <= :end
+    """,
+    'dimension_last_month': """
+        SELECT count(*), avg(value) FROM {table}
+        WHERE dimension = 'region' AND dimension_value = 'north'
+          AND "timestamp" >= :end - interval '30 days' AND "timestamp" <= :end
+    """,
+    'daily_sum_last_quarter': """
+        SELECT date_trunc('day', "timestamp"), sum(value) FROM {table}
+        WHERE source = 'crm' AND data_type = 'count'
+          AND "timestamp" >= :end - interval '90 days' AND "timestamp" <= :end
+        GROUP BY 1
+    """,
+    'first_page_last_day': """
+        SELECT * FROM {table}
+        WHERE "timestamp" >= :end - interval '1 day'
+        ORDER BY "timestamp", id LIMIT 1000
+    """,
+}
+
+
+def setup(connection, rows: int, days: int, start: datetime):
+    connection.execute(text('DROP SCHEMA IF EXISTS bench CASCADE'))
+    connection.execute(text('CREATE SCHEMA bench'))
+
+    # Layout before the partitioning migration: primary key only
+    connection.execute(text(f'CREATE TABLE {PLAIN_TABLE} ({COLUMNS_DDL}, PRIMARY KEY (id))'))
+
+    # Layout after the migration
+    connection.execute(text(
+        f'CREATE TABLE {PARTITIONED_TABLE} ({COLUMNS_DDL}, PRIMARY KEY (id, "timestamp")) '
+        'PARTITION BY RANGE ("timestamp")'
+    ))
+    create_partitions(connection, PARTITIONED_TABLE, start=month_start(start.date()), months_ahead=1)
+    create_default_partition(connection, PARTITIONED_TABLE)
+    for name, columns in (('source_type_ts', 'source, data_type, "timestamp"'),
+                          ('dimension_ts', 'dimension, dimension_value, "timestamp"'),
+                          ('ts_id', '"timestamp", id')):
+        connection.execute(text(f'CREATE INDEX ix_bench_{name} ON {PARTITIONED_TABLE} ({columns})'))
+
+    params = {'rows': rows, 'start': start, 'step': days * 86400.0 / rows}
+    for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+        began = time.perf_counter()
+        connection.execute(text(SEED_SQL.format(table=table)), params)
+        print(f"Seeded {rows} rows into {table} in {time.perf_counter() - began:.1f}s")
+        connection.execute(text(f'ANALYZE {table}'))
+
+
+def measure(connection, sql: str, params: dict, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        connection.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--days', type=int, default=365, help='Time span covered by the rows')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the bench schema')
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    end = datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    with engine.begin() as connection:
+        setup(connection, args.rows, args.days, start)
+
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in QUERIES.items():
+            results[name] = {
+                table: measure(connection, sql.format(table=table), {'end': end}, args.repeat)
+                for table in (PLAIN_TABLE, PARTITIONED_TABLE)
+            }
+
+    print(f"\n{'query':<26}{'plain p50':>12}{'plain p95':>12}{'part. p50':>12}{'part. p95':>12}")
+    for name, by_table in results.items():
+        plain, partitioned = by_table[PLAIN_TABLE], by_table[PARTITIONED_TABLE]
+        print(f"{name:<26}{plain['p50_ms']:>12}{plain['p95_ms']:>12}"
+              f"{partitioned['p50_ms']:>12}{partitioned['p95_ms']:>12}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'days': args.days, 'results': results}, f, indent=2)
+
+    if not args.keep:
+        with engine.begin() as connection:
+            connection.execute(text('DROP SCHEMA bench CASCADE'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: CPU cost of serializing a page of analytics data
+
+Encodes the same synthetic rows, without a database, the way
+GET /api/analytics/data did (ORM objects validated into the pydantic
+response model, then rendered with the standard json module) and the way it
+does now (column tuples encoded with orjson, as objects or as columns):
+
+    python -m benchmarks.serialization --rows 1000 10000 100000 --profile
+
+With --profile each path is also run under cProfile and its most
+expensive functions are listed.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from database.models import AnalyticsData
+from main import AnalyticsDataResponse
+from utils.serialization import response_columns, rows_response
+
+PATHS = ('pydantic', 'orjson_rows', 'orjson_columns')
+COLUMNS = [column.name for column in response_columns(AnalyticsData.__table__, AnalyticsDataResponse)]
+
+
+def make_rows(count: int) -> List[tuple]:
+    start = datetime(2025, 1, 1)
+    return [
+        (uuid.uuid4(), 'orders', 'revenue', start + timedelta(seconds=i), round(i * 0.37, 2), 'region', 'north')
+        for i in range(count)
+    ]
+
+
+def pydantic_body(objects: list) -> bytes:
+    field = create_response_field(name='response', type_=List[AnalyticsDataResponse])
+    content = asyncio.run(serialize_response(field=field, response_content=objects, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def encoder(path: str, rows: List[tuple]):
+    if path == 'pydantic':
+        objects = [AnalyticsData(**dict(zip(COLUMNS, row))) for row in rows]
+        return lambda: pydantic_body(objects)
+    shape = path.split('_')[1]
+    return lambda: rows_response(COLUMNS, rows, shape).body
+
+
+def measure(encode, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        body = encode()
+        timings.append(time.perf_counter() - began)
+    return {'median_ms': round(statistics.median(timings) * 1000, 2), 'bytes': len(body)}
+
+
+def profile(encode, top: int):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    encode()
+    profiler.disable()
+    pstats.Stats(profiler).sort_stats('tottime').print_stats(top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--profile', action='store_true', help='Print a cProfile of each path at the largest size')
+    parser.add_argument('--top', type=int, default=12, help='Functions listed per profile')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>8} {'path':<16}{'median ms':>11}{'bytes':>12}")
+    for count in args.rows:
+        rows = make_rows(count)
+        for path in args.paths:
+            result = {'rows': count, 'path': path, **measure(encoder(path, rows), args.repeat)}
+            results.append(result)
+            print(f"{count:>8} {path:<16}{result['median_ms']:>11}{result['bytes']:>12}")
+
+    if args.profile:
+        rows = make_rows(max(args.rows))
+        for path in args.paths:
+            print(f'\n=== {path}, {len(rows)} rows ===')
+            profile(encoder(path, rows), args.top)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
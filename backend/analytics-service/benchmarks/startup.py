@@ -0,0 +1,105 @@
+"""
+Benchmark: cold start of the service
+
+Measures, each in a fresh interpreter:
+    import      time to import main (python -c "import main")
+    first       time from spawning uvicorn until it answers GET /api/health
+
+and lists the slowest top-level imports reported by python -X importtime:
+
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import() -> float:
+    began = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import main'], cwd=SERVICE_DIR, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - began
+
+
+def time_first_response(port: int) -> float:
+    env = {**os.environ, 'REPORT_SCHEDULER_ENABLED': 'false'}
+    began = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                sys.exit('uvicorn exited before accepting connections')
+            try:
+                # Any answer of the health route counts, the database may be unreachable
+                response = httpx.get(f'http://127.0.0.1:{port}/api/health', timeout=5)
+                if response.status_code == 404:
+                    sys.exit('GET /api/health is not routed')
+                return time.perf_counter() - began
+            except httpx.TransportError:
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def slowest_imports(limit: int) -> list:
+    """Packages imported directly by main with their cumulative import time"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=SERVICE_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    totals = {}
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        cumulative, name = fields[1], fields[2]
+        # Nested imports are indented by two spaces per level; keep the ones main imports directly
+        if (len(name) - len(name.lstrip()) - 1) // 2 != 1:
+            continue
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(cumulative)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    first = [time_first_response(args.port) for _ in range(args.runs)]
+    results = {
+        'runs': args.runs,
+        'import_ms': {'median': round(statistics.median(imports) * 1000, 1), 'max': round(max(imports) * 1000, 1)},
+        'first_response_ms': {'median': round(statistics.median(first) * 1000, 1), 'max': round(max(first) * 1000, 1)},
+        'slowest_imports_ms': {name: round(us / 1000, 1) for name, us in slowest_imports(args.top)},
+    }
+
+    print(f"import main      median {results['import_ms']['median']:>8} ms   max {results['import_ms']['max']:>8} ms")
+    print(f"first response   median {results['first_response_ms']['median']:>8} ms   max {results['first_response_ms']['max']:>8} ms")
+    print('slowest imports:')
+    for name, ms in results['slowest_imports_ms'].items():
+        print(f'  {name:<24}{ms:>10} ms')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Set-based bulk write helpers for analytics service
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_returning(db: Session, table, rows: List[Dict[str, Any]], returning) -> List[Any]:
+    """Insert rows with a single multi-row INSERT ... RETURNING.
+
+    Returned values are in the same order as ``rows``. All rows must have
+    the same keys. Committing is left to the caller.
+    """
+    if not rows:
+        return []
+    stmt = insert(table).returning(returning, sort_by_parameter_order=True)
+    return list(db.execute(stmt, rows).scalars())
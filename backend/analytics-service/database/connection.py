@@ -1,58 +1,153 @@
 """
 Database connection module for analytics service
+One place for the engines, their pool settings and the session factories.
+Pool size, overflow, recycle, pre-ping and statement timeout are read from
+the environment, with an optional mode for running behind PgBouncer. The
+pools report how long each checkout waited to pool_checkout_observers.
+The schema is managed by Alembic only (alembic upgrade head), nothing here
+issues DDL.
 """
 
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.schema import CreateSchema
-from sqlalchemy.exc import ProgrammingError
-from contextlib import contextmanager
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+load_dotenv()
 
 # Base class for all models
 Base = declarative_base()
 
-def get_database_url():
+# Pool of the async engine serving requests
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+# Pool of the sync engine serving report workers, the scheduler and cursor streams
+DB_WORKER_POOL_SIZE = int(os.getenv('DB_WORKER_POOL_SIZE', '5'))
+DB_WORKER_MAX_OVERFLOW = int(os.getenv('DB_WORKER_MAX_OVERFLOW', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Default statement timeout of every connection in seconds, 0 disables it
+DB_STATEMENT_TIMEOUT = float(os.getenv('DB_STATEMENT_TIMEOUT', '0'))
+# Behind a transaction-pooling PgBouncer: no startup parameters and no named
+# prepared statements, since consecutive transactions may use different servers
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+
+
+# Called with (pool name, seconds) after every connection checkout
+pool_checkout_observers: List[Callable[[str, float], None]] = []
+
+
+class _TimedCheckout:
+    """Pool mixin timing checkouts, including waits for a free connection and connects"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        connection = super()._do_get()
+        elapsed = time.perf_counter() - start
+        for observer in pool_checkout_observers:
+            observer(self.logging_name, elapsed)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+# Pool loggers are named after this module; keep them at SQLAlchemy's default level like its own
+logging.getLogger(__name__).setLevel(logging.WARNING)
+
+
+def get_database_url(driver: str = 'postgresql') -> str:
     """Get database URL from environment variables"""
-    db_host = os.getenv('DB_HOST', 'localhost')
+    db_host = os.getenv('DB_HOST', 'postgres')
     db_port = os.getenv('DB_PORT', '5432')
-    db_name = os.getenv('DB_NAME', 'erp_system')
-    db_user = os.getenv('DB_USER', 'postgres')
-    db_password = os.getenv('DB_PASSWORD', 'postgres')
-    
-    return f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-
-def create_engine_with_schema(schema_name='analytics_service'):
-    """Create SQLAlchemy engine with schema"""
-    db_url = get_database_url()
+    db_name = os.getenv('DB_NAME', 'erp_analytics')
+    db_user = os.getenv('DB_USER', 'admin')
+    db_password = os.getenv('DB_PASSWORD', 'password')
+
+    return f"{driver}://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+
+def _pool_options(name: str, poolclass, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    return {
+        'poolclass': poolclass,
+        'pool_logging_name': name,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+def _set_local_statement_timeout(engine):
+    """Apply the statement timeout per transaction, for poolers that reject startup parameters"""
+    timeout_ms = str(int(DB_STATEMENT_TIMEOUT * 1000))
+
+    @event.listens_for(engine, 'begin')
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def create_sync_engine():
+    """psycopg2 engine used outside of request handlers"""
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT and not DB_PGBOUNCER:
+        connect_args['options'] = f"-c statement_timeout={int(DB_STATEMENT_TIMEOUT * 1000)}"
     engine = create_engine(
-        db_url,
-        pool_size=10,
-        max_overflow=20,
-        pool_recycle=3600,
-        pool_pre_ping=True,
-        connect_args={'options': f'-c search_path={schema_name},public'}
+        get_database_url(),
+        connect_args=connect_args,
+        **_pool_options('worker', TimedQueuePool, DB_WORKER_POOL_SIZE, DB_WORKER_MAX_OVERFLOW)
     )
-    
-    # Create schema if it doesn't exist
-    try:
-        with engine.connect() as connection:
-            connection.execute(CreateSchema(schema_name, if_not_exists=True))
-            print(f"Schema '{schema_name}' created or already exists")
-    except ProgrammingError as e:
-        print(f"Error creating schema '{schema_name}': {e}")
-    
+    if DB_STATEMENT_TIMEOUT and DB_PGBOUNCER:
+        _set_local_statement_timeout(engine)
+    return engine
+
+
+def create_request_engine():
+    """asyncpg engine used by the request handlers"""
+    connect_args = {}
+    url = get_database_url('postgresql+asyncpg')
+    if DB_PGBOUNCER:
+        # Unnamed statements only, and no statement cache on either side
+        connect_args['statement_cache_size'] = 0
+        url += '?prepared_statement_cache_size=0'
+    elif DB_STATEMENT_TIMEOUT:
+        connect_args['server_settings'] = {'statement_timeout': str(int(DB_STATEMENT_TIMEOUT * 1000))}
+    engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        **_pool_options('request', TimedAsyncAdaptedQueuePool, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+    )
+    if DB_STATEMENT_TIMEOUT and DB_PGBOUNCER:
+        _set_local_statement_timeout(engine.sync_engine)
     return engine
 
-# Create engine and session factory
-engine = create_engine_with_schema()
-SessionFactory = sessionmaker(bind=engine)
+
+# Create engines and session factories
+engine = create_sync_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_request_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 @contextmanager
 def get_db_session():
     """Context manager for database sessions"""
-    session = SessionFactory()
+    session = SessionLocal()
     try:
         yield session
         session.commit()
@@ -62,11 +157,3 @@ def get_db_session():
     finally:
         session.close()
 
-def init_db():
-    """Initialize database by creating all tables"""
-    # Import all models to ensure they are registered with Base
-    from database import models
-    
-    # Create all tables
-    Base.metadata.create_all(engine)
-    print("Database tables created")
@@ -0,0 +1,111 @@
+"""
+Columnar export helpers for analytics service
+Batches read from a server-side cursor are converted to Arrow record
+batches and written as Parquet row groups or an Arrow IPC stream
+"""
+
+import io
+import json
+from typing import Any, Callable, Iterator, List, Sequence
+
+from database.streaming import to_plain
+
+EXPORT_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what a writer produced since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _to_text(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(to_plain(value))
+
+
+def _to_float(value: Any) -> Any:
+    return None if value is None else float(value)
+
+
+def arrow_column_types(type_codes: Sequence[int]) -> List[tuple]:
+    """Map Postgres type OIDs to (Arrow type, value converter); unknown types become strings"""
+    import pyarrow as pa
+
+    known = {
+        16: (pa.bool_(), None),
+        20: (pa.int64(), None),
+        21: (pa.int16(), None),
+        23: (pa.int32(), None),
+        700: (pa.float32(), None),
+        701: (pa.float64(), None),
+        1700: (pa.float64(), _to_float),  # numeric
+        1082: (pa.date32(), None),
+        1114: (pa.timestamp("us"), None),
+        1184: (pa.timestamp("us", tz="UTC"), None),
+    }
+    return [known.get(type_code, (pa.string(), _to_text)) for type_code in type_codes]
+
+
+def _record_batch(schema, converters: List[Callable], rows: Sequence[Sequence[Any]]):
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = [
+        pa.array(values if convert is None else [convert(value) for value in values], type=field.type)
+        for values, convert, field in zip(columns, converters, schema)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_columnar(batches: Iterator[tuple], fmt: str) -> Iterator[bytes]:
+    """Encode (columns, type_codes, rows) batches as Parquet or Arrow IPC stream chunks.
+
+    Each batch becomes one Parquet row group or Arrow record batch and is
+    yielded as soon as it is written, so only one batch is held in memory.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for columns, type_codes, rows in batches:
+        if writer is None:
+            column_types = arrow_column_types(type_codes)
+            schema = pa.schema([(name, arrow_type) for name, (arrow_type, _) in zip(columns, column_types)])
+            converters = [convert for _, convert in column_types]
+            if fmt == "parquet":
+                writer = pq.ParquetWriter(sink, schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_stream(sink, schema)
+        if rows:
+            writer.write_batch(_record_batch(schema, converters, rows))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,179 @@
+"""
+KPI calculation query helpers for analytics service
+KPIs with a calculation_query are computed by the service. Queries that
+are a single aggregate over the same table are merged into one query with
+an aggregate FILTER per KPI, so each table is scanned once per cycle
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+# SELECT <aggregate>(<argument>) FROM <table> [WHERE <condition>]
+SIMPLE_AGGREGATE_PATTERN = re.compile(
+    r'^\s*select\s+(?P<function>sum|avg|min|max|count)\s*\((?P<argument>.+?)\)\s+'
+    r'from\s+(?P<table>[A-Za-z_][\w.]*)(?:\s+where\s+(?P<condition>.+?))?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+# Anything that could change the meaning of a query once it is merged
+UNMERGEABLE_PATTERN = re.compile(
+    r'\b(group\s+by|having|order\s+by|limit|offset|union|intersect|except|join|filter|over|distinct\s+on)\b|--|/\*',
+    re.IGNORECASE
+)
+EPOCH = datetime(1970, 1, 1)
+
+
+class SimpleAggregate(NamedTuple):
+    function: str
+    argument: str
+    table: str
+    condition: Optional[str]
+
+
+class KpiBatch(NamedTuple):
+    """SQL returning one row, and the column holding each KPI's value"""
+    sql: str
+    columns: Dict[str, int]
+
+
+def _balanced(expression: str) -> bool:
+    depth = 0
+    for character in expression:
+        depth += {'(': 1, ')': -1}.get(character, 0)
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+def parse_simple_aggregate(query: str) -> Optional[SimpleAggregate]:
+    """Split a single-aggregate query into its parts, or None if it cannot be merged"""
+    if UNMERGEABLE_PATTERN.search(query):
+        return None
+    match = SIMPLE_AGGREGATE_PATTERN.match(query)
+    if not match:
+        return None
+    condition = match.group('condition')
+    if not _balanced(match.group('argument')) or (condition and not _balanced(condition)):
+        return None
+    return SimpleAggregate(
+        match.group('function').lower(),
+        match.group('argument').strip(),
+        match.group('table').lower(),
+        condition.strip() if condition else None
+    )
+
+
+def merged_query(aggregates: List[SimpleAggregate]) -> str:
+    """One query computing several aggregates over the same table, one column each"""
+    columns = []
+    for index, aggregate in enumerate(aggregates):
+        column = f'{aggregate.function}({aggregate.argument})'
+        if aggregate.condition:
+            column += f' FILTER (WHERE {aggregate.condition})'
+        columns.append(f'{column} AS kpi_{index}')
+    sql = f'SELECT {", ".join(columns)} FROM {aggregates[0].table}'
+    # Rows matching no KPI's condition can be skipped, unless one KPI reads them all
+    if all(aggregate.condition for aggregate in aggregates):
+        sql += ' WHERE ' + ' OR '.join(f'({aggregate.condition})' for aggregate in aggregates)
+    return sql
+
+
+def plan_batches(queries: Dict[str, str], max_columns: int = 50) -> List[KpiBatch]:
+    """Group KPI calculation queries ({kpi id: query}) into the batches to run.
+
+    Simple aggregates over the same table are merged, at most
+    ``max_columns`` to a query, and KPIs with identical queries share a
+    column. Any other query runs on its own and its value is the first
+    column of its first row.
+    """
+    batches = []
+    by_table: Dict[str, Dict[SimpleAggregate, List[str]]] = {}
+    for kpi_id, query in queries.items():
+        aggregate = parse_simple_aggregate(query)
+        if aggregate is None:
+            batches.append(KpiBatch(query, {kpi_id: 0}))
+        else:
+            by_table.setdefault(aggregate.table, {}).setdefault(aggregate, []).append(kpi_id)
+
+    for grouped in by_table.values():
+        items = list(grouped.items())
+        for offset in range(0, len(items), max_columns):
+            chunk = items[offset:offset + max_columns]
+            columns = {kpi_id: index for index, (_, kpi_ids) in enumerate(chunk) for kpi_id in kpi_ids}
+            if len(chunk) == 1:
+                # Nothing to merge with, run the KPI's own query
+                batches.extend(KpiBatch(queries[kpi_id], {kpi_id: 0}) for kpi_id in chunk[0][1])
+            else:
+                batches.append(KpiBatch(merged_query([aggregate for aggregate, _ in chunk]), columns))
+    return batches
+
+
+def _to_value(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError('a boolean is not a KPI value')
+    return float(value)
+
+
+def run_batch(engine, batch: KpiBatch, statement_timeout: float) -> Dict[str, Optional[float]]:
+    """Run a batch in a read-only transaction and return {kpi id: value}"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+        connection.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {'timeout': str(int(statement_timeout * 1000))}
+        )
+        row = connection.execute(text(batch.sql)).first()
+        connection.rollback()
+    return {kpi_id: _to_value(row[column]) if row else None for kpi_id, column in batch.columns.items()}
+
+
+def compute_batch(engine, batch: KpiBatch, queries: Dict[str, str],
+                  statement_timeout: float) -> Tuple[Dict[str, Optional[float]], Dict[str, str]]:
+    """Run a batch and return ({kpi id: value}, {kpi id: error}).
+
+    When a merged query fails, its KPIs are run one by one so a single
+    broken calculation query does not hold back the others.
+    """
+    try:
+        return run_batch(engine, batch, statement_timeout), {}
+    except (SQLAlchemyError, ValueError, TypeError) as e:
+        if len(batch.columns) == 1:
+            kpi_id = next(iter(batch.columns))
+            return {}, {kpi_id: str(getattr(e, 'orig', e)).strip().splitlines()[0]}
+
+    values, errors = {}, {}
+    for kpi_id in batch.columns:
+        single_values, single_errors = compute_batch(engine, KpiBatch(queries[kpi_id], {kpi_id: 0}), queries,
+                                                     statement_timeout)
+        values.update(single_values)
+        errors.update(single_errors)
+    return values, errors
+
+
+def period_bounds(moment: datetime, interval_seconds: int) -> Tuple[datetime, datetime]:
+    """Start and end of the interval-long period containing a moment, aligned to the epoch"""
+    offset = (moment - EPOCH).total_seconds() // interval_seconds * interval_seconds
+    start = EPOCH + timedelta(seconds=offset)
+    return start, start + timedelta(seconds=interval_seconds)
+
+
+def upsert_kpi_values(db, table, rows: List[Dict[str, Any]]):
+    """Write computed KPI values with one INSERT ... ON CONFLICT, replacing values of the same period"""
+    if not rows:
+        return
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['metric_id', 'period_start'],
+        set_={
+            'value': stmt.excluded.value,
+            'period_end': stmt.excluded.period_end,
+            'created_at': stmt.excluded.created_at,
+        }
+    )
+    db.execute(stmt)
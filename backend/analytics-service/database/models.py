@@ -2,89 +2,143 @@
 Database models for analytics service
 """
 
-import uuid
-from sqlalchemy import Column, String, Text, DateTime, Date, Integer, Float, Boolean, ForeignKey, JSON, Enum
+from datetime import datetime
+from sqlalchemy import Column, String, Text, DateTime, Float, Integer, BigInteger, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import declared_attr, deferred, relationship
 from database.connection import Base
 
-class Report(Base):
-    """Report model for storing report definitions"""
-    __tablename__ = 'reports'
-    __table_args__ = {'schema': 'analytics_service'}
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    name = Column(String(255), nullable=False)
-    description = Column(Text)
-    type = Column(String(50), nullable=False)
-    parameters = Column(JSONB)
-    created_by = Column(UUID(as_uuid=True), nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    
-    # Relationships
-    executions = relationship("ReportExecution", back_populates="report", cascade="all, delete-orphan")
-    
-    def __repr__(self):
-        return f"<Report(id='{self.id}', name='{self.name}', type='{self.type}')>"
+class AnalyticsData(Base):
+    """Raw analytics data points"""
+    __tablename__ = 'analytics_data'
+    # Monthly range partitioned on timestamp, see migrations/versions/20251017000001
+    __table_args__ = (
+        Index('ix_analytics_data_source_type_ts', 'source', 'data_type', 'timestamp'),
+        Index('ix_analytics_data_dimension_ts', 'dimension', 'dimension_value', 'timestamp'),
+        Index('ix_analytics_data_ts_id', 'timestamp', 'id'),
+    )
 
+    id = Column(UUID, primary_key=True, server_default=text('gen_random_uuid()'))
+    source = Column(String, nullable=False)
+    data_type = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
+    value = Column(Float)
+    dimension = Column(String)
+    dimension_value = Column(String)
 
-class ReportExecution(Base):
-    """ReportExecution model for storing report execution results"""
-    __tablename__ = 'report_executions'
-    __table_args__ = {'schema': 'analytics_service'}
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    report_id = Column(UUID(as_uuid=True), ForeignKey('analytics_service.reports.id'), nullable=False)
-    parameters = Column(JSONB)
-    result = Column(JSONB)
-    status = Column(String(50), nullable=False)
-    executed_by = Column(UUID(as_uuid=True), nullable=False)
-    started_at = Column(DateTime, server_default=func.now())
-    completed_at = Column(DateTime)
-    
-    # Relationships
-    report = relationship("Report", back_populates="executions")
-    
-    def __repr__(self):
-        return f"<ReportExecution(id='{self.id}', report_id='{self.report_id}', status='{self.status}')>"
+
+class AnalyticsRollupMixin:
+    """Pre-aggregated analytics data per time bucket"""
+    # Rows without a dimension are stored with '' so the bucket key is unique
+    source = Column(String, primary_key=True)
+    data_type = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True, default='')
+    dimension_value = Column(String, primary_key=True, default='')
+    bucket = Column(DateTime, primary_key=True)
+    sum = Column(Float, nullable=False)
+    count = Column(BigInteger, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        # Aggregations filter on data_type and a bucket range, the primary key starts with source
+        return (Index(f'ix_{cls.__tablename__}_data_type_bucket', 'data_type', 'bucket'),)
+
+
+class AnalyticsRollupHourly(AnalyticsRollupMixin, Base):
+    __tablename__ = 'analytics_rollup_hourly'
 
 
-class KpiMetric(Base):
-    """KpiMetric model for storing KPI metric definitions"""
-    __tablename__ = 'kpi_metrics'
-    __table_args__ = {'schema': 'analytics_service'}
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    name = Column(String(100), nullable=False)
-    description = Column(Text)
-    category = Column(String(50), nullable=False)
+class AnalyticsRollupDaily(AnalyticsRollupMixin, Base):
+    __tablename__ = 'analytics_rollup_daily'
+
+
+class KPI(Base):
+    """KPI definition with its latest value"""
+    __tablename__ = 'kpis'
+
+    id = Column(UUID, primary_key=True, server_default=text('gen_random_uuid()'))
+    name = Column(String, nullable=False, unique=True)
+    description = Column(String)
+    category = Column(String(50), index=True)
+    # SQL computing the value, for KPIs calculated by the service instead of pushed
     calculation_query = Column(Text)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    
+    current_value = Column(Float)
+    target_value = Column(Float)
+    unit = Column(String)
+    last_updated = Column(DateTime, default=datetime.utcnow)
+    # Seconds between computations of calculation_query, the service default when NULL
+    refresh_interval = Column(Integer)
+    next_compute_at = Column(DateTime, index=True)
+
     # Relationships
-    values = relationship("KpiValue", back_populates="metric", cascade="all, delete-orphan")
-    
+    values = relationship('KpiValue', back_populates='metric', cascade='all, delete-orphan', passive_deletes=True)
+
     def __repr__(self):
-        return f"<KpiMetric(id='{self.id}', name='{self.name}', category='{self.category}')>"
+        return f"<KPI(id='{self.id}', name='{self.name}', category='{self.category}')>"
 
 
 class KpiValue(Base):
-    """KpiValue model for storing KPI metric values"""
+    """Value of a KPI over a period"""
     __tablename__ = 'kpi_values'
-    __table_args__ = {'schema': 'analytics_service'}
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    metric_id = Column(UUID(as_uuid=True), ForeignKey('analytics_service.kpi_metrics.id'), nullable=False)
+    __table_args__ = (
+        Index('ix_kpi_values_metric_id_period_start', 'metric_id', 'period_start', unique=True),
+    )
+
+    id = Column(UUID, primary_key=True, server_default=text('gen_random_uuid()'))
+    metric_id = Column(UUID, ForeignKey('kpis.id', ondelete='CASCADE'), nullable=False)
     value = Column(Float, nullable=False)
-    period_start = Column(Date, nullable=False)
-    period_end = Column(Date, nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
-    
+    period_start = Column(DateTime, nullable=False)
+    period_end = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
     # Relationships
-    metric = relationship("KpiMetric", back_populates="values")
-    
+    metric = relationship('KPI', back_populates='values')
+
     def __repr__(self):
         return f"<KpiValue(id='{self.id}', metric_id='{self.metric_id}', value={self.value})>"
+
+
+class Report(Base):
+    """Report definition: a SQL query, its parameters and an optional schedule"""
+    __tablename__ = 'reports'
+
+    id = Column(UUID, primary_key=True, server_default=text('gen_random_uuid()'))
+    name = Column(String, nullable=False)
+    description = Column(String)
+    query = Column(String, nullable=False)
+    # Bind parameters of the query: {"name": {"type": ..., "required": ..., "default": ...}}
+    parameters = Column(JSONB)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    schedule = Column(String)  # cron expression
+    next_run_at = Column(DateTime, index=True)
+
+    def __repr__(self):
+        return f"<Report(id='{self.id}', name='{self.name}')>"
+
+
+class ReportExecution(Base):
+    """Run of a report and its result"""
+    __tablename__ = 'report_executions'
+    __table_args__ = (
+        Index('ix_report_executions_cache_key_completed_at', 'cache_key', 'completed_at'),
+    )
+
+    id = Column(UUID, primary_key=True, server_default=text('gen_random_uuid()'))
+    report_id = Column(UUID, ForeignKey('reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    parameters = Column(JSONB)
+    result = Column(JSONB)
+    # gzip-compressed JSON of results too large to keep inline in result
+    result_data = deferred(Column(LargeBinary))
+    status = Column(String(50), nullable=False, index=True)  # pending, running, completed, failed
+    # Hash of query text and parameters, used to reuse fresh results
+    cache_key = Column(String(64))
+    executed_by = Column(UUID)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<ReportExecution(id='{self.id}', report_id='{self.report_id}', status='{self.status}')>"
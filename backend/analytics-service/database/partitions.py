@@ -0,0 +1,166 @@
+"""
+Monthly range partition maintenance for the analytics_data table
+
+Run periodically (e.g. daily from cron) to keep future partitions ahead of
+ingestion and to detach partitions that fell out of the retention window:
+
+    python -m database.partitions --months-ahead 3 --retention-months 24
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger("analytics-service")
+
+PARTITIONED_TABLE = 'analytics_data'
+PARTITION_KEY = 'timestamp'
+PARTITION_SUFFIX = re.compile(r'_y(\d{4})m(\d{2})$')
+
+
+def month_start(value: date) -> date:
+    """Return the first day of the month containing value"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Return the first day of the month ``months`` after value"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Return the partition name for a month, e.g. analytics_data_y2025m06"""
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def default_partition(connection, table: str) -> Optional[str]:
+    """Return the qualified name of the default partition of table, if it has one"""
+    return connection.execute(text(
+        "SELECT CAST(CAST(p.partdefid AS regclass) AS text) FROM pg_partitioned_table p "
+        "WHERE p.partrelid = CAST(:table AS regclass) AND p.partdefid <> 0"
+    ), {'table': table}).scalar()
+
+
+def create_partition(connection, table: str, month: date, key: str = PARTITION_KEY) -> str:
+    """Create the partition holding one month of rows if it does not exist.
+
+    Rows of that month already caught by the default partition would make
+    CREATE TABLE ... PARTITION OF fail, so they are moved into the new
+    table before it is attached.
+    """
+    name = partition_name(table, month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is not None:
+        return name
+
+    default = default_partition(connection, table)
+    in_month = f'"{key}" >= :start AND "{key}" < :end'
+    month_range = {'start': month, 'end': add_months(month, 1)}
+    if default is None or connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})"), month_range
+    ).scalar() is False:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return name
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), month_range).rowcount
+    # Builds the parent's indexes on the new partition
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.info(f"Moved {moved} rows from {default} into {name}")
+    return name
+
+
+def create_default_partition(connection, table: str) -> str:
+    """Create the default partition catching rows outside every monthly range"""
+    name = f"{table}_default"
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} DEFAULT"))
+    return name
+
+
+def create_partitions(connection, table: str = PARTITIONED_TABLE, start: Optional[date] = None,
+                      months_ahead: int = 3) -> List[str]:
+    """Create monthly partitions from start (default: this month) to months_ahead in the future"""
+    current = month_start(start or datetime.utcnow().date())
+    last = add_months(month_start(datetime.utcnow().date()), months_ahead)
+    names = []
+    while current <= last:
+        names.append(create_partition(connection, table, current))
+        current = add_months(current, 1)
+    return names
+
+
+def list_partitions(connection, table: str = PARTITIONED_TABLE) -> List[tuple]:
+    """Return (qualified name, month) for every monthly partition of table"""
+    schema = table.rsplit('.', 1)[0] + '.' if '.' in table else ''
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {'table': table}).scalars()
+    partitions = []
+    for relname in rows:
+        match = PARTITION_SUFFIX.search(relname)
+        if match:
+            partitions.append((schema + relname, date(int(match.group(1)), int(match.group(2)), 1)))
+    return partitions
+
+
+def detach_partitions(connection, table: str = PARTITIONED_TABLE, retention_months: int = 24,
+                      drop: bool = False) -> List[str]:
+    """Detach (and optionally drop) monthly partitions older than retention_months"""
+    cutoff = add_months(month_start(datetime.utcnow().date()), -retention_months)
+    detached = []
+    for name, month in list_partitions(connection, table):
+        if month >= cutoff:
+            continue
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    return detached
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain analytics_data monthly partitions')
+    parser.add_argument('--months-ahead', type=int,
+                        default=int(os.getenv('PARTITION_MONTHS_AHEAD', '3')))
+    parser.add_argument('--retention-months', type=int,
+                        default=int(os.getenv('PARTITION_RETENTION_MONTHS', '24')))
+    parser.add_argument('--drop', action='store_true', help='Drop detached partitions')
+    args = parser.parse_args()
+
+    from database.connection import get_database_url
+
+    engine = create_engine(get_database_url())
+    failed = False
+    # Separate transactions, so a failure creating partitions does not undo detaching them
+    try:
+        with engine.begin() as connection:
+            created = create_partitions(connection, months_ahead=args.months_ahead)
+        print(f"Partitions ensured: {', '.join(created)}")
+    except SQLAlchemyError as e:
+        failed = True
+        print(f"Creating partitions failed: {str(getattr(e, 'orig', e)).strip()}", file=sys.stderr)
+    try:
+        with engine.begin() as connection:
+            detached = detach_partitions(connection, retention_months=args.retention_months, drop=args.drop)
+        print(f"Partitions detached: {', '.join(detached) or 'none'}")
+    except SQLAlchemyError as e:
+        failed = True
+        print(f"Detaching partitions failed: {str(getattr(e, 'orig', e)).strip()}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
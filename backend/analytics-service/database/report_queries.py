@@ -0,0 +1,190 @@
+"""
+Parameterized report query helpers for analytics service
+Report queries use named bind parameters (``:start_date``) declared in
+reports.parameters and run as server-side prepared statements
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, bindparam, text
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+# Same pattern SQLAlchemy's text() uses, so '::' casts are left alone
+BIND_PARAM_PATTERN = re.compile(r'(?<![:\w\\]):(\w+)(?!:)')
+PARAMETER_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', '1', 'yes'):
+        return True
+    if isinstance(value, str) and value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError
+
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        raise ValueError
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _to_datetime(value: Any) -> datetime:
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Timestamps are stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _to_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError
+    return value
+
+
+# Declared parameter type -> (Postgres type of the prepared statement, coercion, SQLAlchemy type)
+PARAMETER_TYPES = {
+    'string': ('text', _to_str, String),
+    'integer': ('integer', _to_int, Integer),
+    'number': ('double precision', float, Float),
+    'boolean': ('boolean', _to_bool, Boolean),
+    'date': ('date', _to_date, Date),
+    'datetime': ('timestamp', _to_datetime, DateTime),
+}
+
+
+def query_parameter_names(query: str) -> List[str]:
+    """Names of the bind parameters in a query, in order of first use"""
+    return list(OrderedDict.fromkeys(BIND_PARAM_PATTERN.findall(query)))
+
+
+def coerce_value(name: str, declaration: Dict[str, Any], value: Any) -> Any:
+    """Convert a parameter value to its declared type, raising ValueError if it does not fit"""
+    type_name = declaration['type']
+    try:
+        return PARAMETER_TYPES[type_name][1](value)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f'Parameter {name} must be of type {type_name}, got {value!r}')
+
+
+def validate_declarations(query: str, declarations: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Check parameter declarations against a report query and return them normalized.
+
+    Each declaration is ``{"type": ..., "required": bool, "default": ...}``
+    with type one of PARAMETER_TYPES. Every bind parameter in the query must
+    be declared.
+    """
+    normalized = {}
+    for name, declaration in (declarations or {}).items():
+        if not PARAMETER_NAME_PATTERN.match(name):
+            raise ValueError(f'Invalid parameter name: {name}')
+        if not isinstance(declaration, dict) or declaration.get('type') not in PARAMETER_TYPES:
+            raise ValueError(f'Parameter {name} must declare a type: {", ".join(PARAMETER_TYPES)}')
+        default = declaration.get('default')
+        if default is not None:
+            # Validated here, stored as given so it stays JSON serializable
+            coerce_value(name, declaration, default)
+        normalized[name] = {
+            'type': declaration['type'],
+            'required': bool(declaration.get('required', default is None)),
+            'default': default,
+        }
+
+    undeclared = [name for name in query_parameter_names(query) if name not in normalized]
+    if undeclared:
+        raise ValueError(f'Query parameters are not declared: {", ".join(undeclared)}')
+    return normalized
+
+
+def coerce_parameters(declarations: Optional[Dict[str, Any]], values: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate run-time values against the declarations, filling in defaults"""
+    declarations = declarations or {}
+    values = values or {}
+    unknown = [name for name in values if name not in declarations]
+    if unknown:
+        raise ValueError(f'Unknown parameters: {", ".join(unknown)}')
+
+    coerced = {}
+    for name, declaration in declarations.items():
+        value = values.get(name, declaration.get('default'))
+        if value is None:
+            if declaration.get('required'):
+                raise ValueError(f'Parameter {name} is required')
+            coerced[name] = None
+        else:
+            coerced[name] = coerce_value(name, declaration, value)
+    return coerced
+
+
+def bind_query(query: str, declarations: Dict[str, Any], parameters: Dict[str, Any]) -> TextClause:
+    """Build a text() statement with the parameters bound as their declared types.
+
+    With asyncpg the typed binds are rendered as casts, and the driver
+    prepares and caches the statement per connection by itself.
+    """
+    return text(query).bindparams(*[
+        bindparam(name, parameters[name], type_=PARAMETER_TYPES[declarations[name]['type']][2])
+        for name in query_parameter_names(query)
+    ])
+
+
+def prepare_statement(query: str, declarations: Dict[str, Any]) -> Tuple[str, str, List[str]]:
+    """Return (name, PREPARE statement, parameter order) for a report query"""
+    names = query_parameter_names(query)
+    positions = {name: index for index, name in enumerate(names, start=1)}
+    body = BIND_PARAM_PATTERN.sub(lambda match: f'${positions[match.group(1)]}', query)
+    types = [PARAMETER_TYPES[declarations[name]['type']][0] for name in names]
+
+    digest = hashlib.sha1('\0'.join([body] + types).encode()).hexdigest()[:24]
+    statement_name = f'report_{digest}'
+    type_list = f' ({", ".join(types)})' if types else ''
+    # Executed through the driver with a parameter mapping, so literal % must be doubled
+    body = body.replace('%', '%%')
+    return statement_name, f'PREPARE {statement_name}{type_list} AS {body}', names
+
+
+def execute_prepared(db: Session, query: str, declarations: Dict[str, Any],
+                     parameters: Dict[str, Any], cache_size: int = 100) -> Result:
+    """Run a report query as a prepared statement on the session's connection.
+
+    Prepared statements live as long as the database connection, so the
+    names already prepared are tracked in the pooled connection's info and
+    later runs of the same query skip parsing and planning. At most
+    ``cache_size`` statements are kept per connection.
+    """
+    connection = db.connection()
+    prepared = connection.connection.info.setdefault('report_prepared_statements', OrderedDict())
+    statement_name, prepare_sql, names = prepare_statement(query, declarations)
+
+    if statement_name in prepared:
+        prepared.move_to_end(statement_name)
+    else:
+        while len(prepared) >= cache_size:
+            oldest, _ = prepared.popitem(last=False)
+            connection.exec_driver_sql(f'DEALLOCATE {oldest}')
+        connection.exec_driver_sql(prepare_sql)
+        prepared[statement_name] = True
+
+    if not names:
+        return connection.exec_driver_sql(f'EXECUTE {statement_name}')
+    placeholders = ', '.join(f'%({name})s' for name in names)
+    return connection.exec_driver_sql(
+        f'EXECUTE {statement_name} ({placeholders})', {name: parameters[name] for name in names}
+    )
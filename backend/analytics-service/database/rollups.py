@@ -0,0 +1,99 @@
+"""
+Incrementally maintained rollups of analytics_data
+
+Each rollup table keeps sum/count/min/max of ``value`` per time bucket,
+source, data_type, dimension and dimension_value. Rows without a dimension
+are stored with an empty string so the bucket key can be unique.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+KEY_COLUMNS = ('bucket', 'source', 'data_type', 'dimension', 'dimension_value')
+
+# Granularities that can be read from a rollup of the given unit
+ROLLUP_READABLE = {
+    'hour': ('hour', 'day', 'week', 'month'),
+    'day': ('day', 'week', 'month'),
+}
+
+
+def truncate(value: datetime, unit: str) -> datetime:
+    """Python equivalent of date_trunc for the rollup units"""
+    if unit == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported rollup unit: {unit}")
+
+
+def is_aligned(value: Optional[datetime], unit: str) -> bool:
+    """Whether a range bound falls on a bucket boundary of the unit"""
+    return value is None or truncate(value, unit) == value
+
+
+def compute_deltas(rows: Iterable[Dict[str, Any]], unit: str) -> List[Dict[str, Any]]:
+    """Aggregate raw rows into rollup rows for one unit, sorted by bucket key"""
+    deltas: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        value = row['value']
+        if value is None:
+            continue
+        key = (truncate(row['timestamp'], unit), row['source'], row['data_type'],
+               row.get('dimension') or '', row.get('dimension_value') or '')
+        delta = deltas.get(key)
+        if delta is None:
+            deltas[key] = dict(zip(KEY_COLUMNS, key), sum=value, count=1, min=value, max=value)
+        else:
+            delta['sum'] += value
+            delta['count'] += 1
+            delta['min'] = min(delta['min'], value)
+            delta['max'] = max(delta['max'], value)
+    # A stable key order keeps concurrent upserts from deadlocking on row locks
+    return [deltas[key] for key in sorted(deltas)]
+
+
+def upsert_deltas(db, table, deltas: List[Dict[str, Any]]):
+    """Merge rollup deltas into a rollup table with one INSERT ... ON CONFLICT"""
+    if not deltas:
+        return
+    stmt = insert(table).values(deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            'sum': table.c.sum + stmt.excluded.sum,
+            'count': table.c.count + stmt.excluded.count,
+            'min': func.least(table.c.min, stmt.excluded.min),
+            'max': func.greatest(table.c.max, stmt.excluded.max),
+        }
+    )
+    db.execute(stmt)
+
+
+def rebuild(connection, table: str, unit: str, start: Optional[datetime] = None,
+            end: Optional[datetime] = None, source_table: str = 'analytics_data'):
+    """Recompute a rollup table from raw rows for [start, end), e.g. for backfills.
+
+    start and end must fall on bucket boundaries of the unit.
+    """
+    conditions = []
+    if start is not None:
+        conditions.append('"timestamp" >= :start')
+    if end is not None:
+        conditions.append('"timestamp" < :end')
+    delete_where = f"WHERE {' AND '.join(conditions)}".replace('"timestamp"', 'bucket') if conditions else ''
+    where = f"WHERE {' AND '.join(conditions + ['value IS NOT NULL'])}"
+    params = {'start': start, 'end': end}
+    connection.execute(text(f"DELETE FROM {table} {delete_where}"), params)
+    connection.execute(text(f"""
+        INSERT INTO {table} (bucket, source, data_type, dimension, dimension_value, sum, count, min, max)
+        SELECT date_trunc('{unit}', "timestamp"), source, data_type,
+               COALESCE(dimension, ''), COALESCE(dimension_value, ''),
+               sum(value), count(value), min(value), max(value)
+        FROM {source_table}
+        {where}
+        GROUP BY 1, 2, 3, 4, 5
+    """), params)
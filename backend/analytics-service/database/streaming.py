@@ -0,0 +1,90 @@
+"""
+Server-side cursor streaming helpers for analytics service
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def to_plain(value: Any) -> Any:
+    """Convert a database value to a JSON/CSV friendly value"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def iter_typed_batches(engine, stmt, batch_size: int, statement_timeout: Optional[float] = None) -> Iterator[tuple]:
+    """Execute a statement on a server-side cursor and yield (columns, type_codes, rows) batches.
+
+    A dedicated connection is held for the lifetime of the iterator so only
+    ``batch_size`` rows are buffered in memory at a time. At least one
+    (possibly empty) batch is yielded so callers always see the columns.
+    Type codes are the Postgres type OIDs of the columns. The transaction is
+    rolled back when the iterator finishes.
+    """
+    with engine.connect() as connection:
+        if statement_timeout:
+            connection.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": str(int(statement_timeout * 1000))}
+            )
+        result = connection.execution_options(yield_per=batch_size).execute(stmt)
+        columns = list(result.keys())
+        type_codes = [column.type_code for column in result.cursor.description]
+        empty = True
+        for rows in result.partitions(batch_size):
+            empty = False
+            yield columns, type_codes, rows
+        if empty:
+            yield columns, type_codes, []
+
+
+def iter_batches(engine, stmt, batch_size: int, statement_timeout: Optional[float] = None) -> Iterator[tuple]:
+    """Execute a statement on a server-side cursor and yield (columns, rows) batches"""
+    for columns, _, rows in iter_typed_batches(engine, stmt, batch_size, statement_timeout):
+        yield columns, rows
+
+
+def encode_ndjson(columns: List[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Encode a batch of rows as newline-delimited JSON objects"""
+    return "".join(
+        json.dumps({column: to_plain(value) for column, value in zip(columns, row)}) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(columns: List[str], rows: Sequence[Sequence[Any]], header: bool = False) -> str:
+    """Encode a batch of rows as CSV, optionally preceded by a header line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([to_plain(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_rows(engine, stmt, fmt: str, batch_size: int, statement_timeout: Optional[float] = None) -> Iterator[str]:
+    """Stream the result of a statement as NDJSON or CSV text chunks"""
+    header = True
+    for columns, rows in iter_batches(engine, stmt, batch_size, statement_timeout):
+        if fmt == "csv":
+            yield encode_csv(columns, rows, header=header)
+            header = False
+        else:
+            yield encode_ndjson(columns, rows)
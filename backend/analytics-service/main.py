@@ -1,93 +1,226 @@
 import os
+import re
+import math
+import atexit
+import asyncio
+import json
+import uuid
+import base64
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import queue
+import threading
+import multiprocessing
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import List, Optional, Dict, Any
 
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, String, DateTime, Float, Integer, ForeignKey, text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.dialects.postgresql import UUID
-import pandas as pd
-import numpy as np
-from pydantic import BaseModel
-import matplotlib.pyplot as plt
-import seaborn as sns
+from sqlalchemy import String, DateTime, Float, BigInteger, text, select, update, values, column, tuple_, func, cast, case, and_, or_, bindparam
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer, undefer
+from sqlalchemy.exc import SQLAlchemyError
+from pydantic import BaseModel, ValidationError, validator
 from dotenv import load_dotenv
 
+from database.bulk import insert_returning, iter_chunks
+from database.connection import DB_PGBOUNCER, SessionLocal, AsyncSessionLocal, engine, async_engine, pool_checkout_observers
+from database.export import EXPORT_MEDIA_TYPES, stream_columnar
+from database.kpi_queries import compute_batch, period_bounds, plan_batches, upsert_kpi_values
+from database.models import AnalyticsData, AnalyticsRollupDaily, AnalyticsRollupHourly, KPI, KpiValue, Report, ReportExecution
+from database.report_queries import bind_query, coerce_parameters, execute_prepared, validate_declarations
+from database.rollups import ROLLUP_READABLE, compute_deltas, is_aligned, truncate, upsert_deltas
+from database.streaming import STREAM_MEDIA_TYPES, iter_batches, iter_typed_batches, stream_rows, to_plain
+from utils.cache import TTLCache
+from utils.charts import CHART_MEDIA_TYPES, chart_digest, render_chart, warm_up
+from utils.metrics import (
+    InstrumentationMiddleware, InstrumentedRoute, instrument_engine, metrics_payload, observe_pool_checkout, track_pool
+)
+from utils.result_store import ResultExpired, ResultStore, report_cache_key
+from utils.scheduler import PeriodicTask, is_valid_schedule, next_run_time
+from utils.serialization import ROW_SHAPE_PATTERN, response_columns, rows_response
+from utils.write_behind import WriteBehindQueue, describe, is_transient, read_spool
+from utils.trends import compute_trends
+
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("analytics.log"),
-    ],
-)
+# Configure logging: records are queued and written by a listener thread, so
+# logging never blocks a request on console or file I/O
+log_handlers = [
+    logging.StreamHandler(),
+    logging.FileHandler("analytics.log"),
+]
+for log_handler in log_handlers:
+    log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+queue_handler = QueueHandler(log_queue)
+# The listener's handlers apply the format, the queued record only carries the message
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+log_listener.start()
+# Flushes the queue on exit
+atexit.register(log_listener.stop)
 logger = logging.getLogger("analytics-service")
 
-# Database configuration
-DB_HOST = os.getenv("DB_HOST", "postgres")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_USER = os.getenv("DB_USER", "admin")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
-DB_NAME = os.getenv("DB_NAME", "erp_analytics")
-
-# Create SQLAlchemy engine
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Define SQLAlchemy models
-class AnalyticsData(Base):
-    __tablename__ = "analytics_data"
-    
-    id = Column(UUID, primary_key=True, server_default=text("gen_random_uuid()"))
-    source = Column(String, nullable=False)
-    data_type = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    value = Column(Float)
-    dimension = Column(String)
-    dimension_value = Column(String)
-
-class KPI(Base):
-    __tablename__ = "kpis"
-    
-    id = Column(UUID, primary_key=True, server_default=text("gen_random_uuid()"))
-    name = Column(String, nullable=False, unique=True)
-    description = Column(String)
-    current_value = Column(Float)
-    target_value = Column(Float)
-    unit = Column(String)
-    last_updated = Column(DateTime, default=datetime.utcnow)
-
-class Report(Base):
-    __tablename__ = "reports"
-    
-    id = Column(UUID, primary_key=True, server_default=text("gen_random_uuid()"))
-    name = Column(String, nullable=False)
-    description = Column(String)
-    query = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    schedule = Column(String)  # cron expression
+# Instrumentation: per-request profiles for requests with PROFILE_HEADER, off by default
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+# Bulk ingestion configuration
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+BULK_INSERT_MAX_CHUNK_SIZE = 10000
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+# Write-behind ingestion of single points: POST /api/analytics/data answers 202 once
+# the point is queued, and a background thread writes the queue in batches of
+# INGEST_FLUSH_ROWS or after INGEST_FLUSH_INTERVAL seconds; 429 when the queue is full
+INGEST_WRITE_BEHIND = os.getenv("INGEST_WRITE_BEHIND", "false").lower() == "true"
+INGEST_QUEUE_MAX_ROWS = int(os.getenv("INGEST_QUEUE_MAX_ROWS", "50000"))
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "1000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.2"))
+# File keeping queued points until they are written, replayed on start; empty disables it
+INGEST_SPOOL_PATH = os.getenv("INGEST_SPOOL_PATH", "")
+INGEST_SHUTDOWN_TIMEOUT = float(os.getenv("INGEST_SHUTDOWN_TIMEOUT", "30"))
+
+# Read configuration
+ANALYTICS_PAGE_SIZE = int(os.getenv("ANALYTICS_PAGE_SIZE", "1000"))
+ANALYTICS_MAX_PAGE_SIZE = 10000
+KPI_HISTORY_MAX_LIMIT = 10000
+# KPIs per bulk upsert request, written KPI_BULK_CHUNK_SIZE per INSERT ... ON CONFLICT
+KPI_BULK_MAX_SIZE = int(os.getenv("KPI_BULK_MAX_SIZE", "10000"))
+KPI_BULK_CHUNK_SIZE = int(os.getenv("KPI_BULK_CHUNK_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# Aggregation configuration
+AGGREGATE_FUNCTIONS = {"sum": func.sum, "avg": func.avg, "min": func.min, "max": func.max, "count": func.count}
+PERCENTILE_PATTERN = re.compile(r"^p(\d{1,2}(\.\d+)?)$")
+ROLLUP_AGGREGATES = {
+    "sum": lambda rollup: func.sum(rollup.sum),
+    "count": lambda rollup: cast(func.sum(rollup.count), BigInteger),
+    "min": lambda rollup: func.min(rollup.min),
+    "max": lambda rollup: func.max(rollup.max),
+    "avg": lambda rollup: cast(func.sum(rollup.sum) / func.sum(rollup.count), Float),
+}
+# Rollups by unit, coarsest first
+ROLLUPS = (("day", AnalyticsRollupDaily), ("hour", AnalyticsRollupHourly))
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Business overview configuration: overview metric -> analytics data_type summed for it
+OVERVIEW_METRICS = {
+    "revenue": os.getenv("OVERVIEW_REVENUE_DATA_TYPE", "revenue"),
+    "orders": os.getenv("OVERVIEW_ORDERS_DATA_TYPE", "orders"),
+    "customers": os.getenv("OVERVIEW_CUSTOMERS_DATA_TYPE", "customers"),
+    "products": os.getenv("OVERVIEW_PRODUCTS_DATA_TYPE", "products"),
+}
+OVERVIEW_CURRENCY = os.getenv("OVERVIEW_CURRENCY", "UAH")
+# Dashboard: dimension whose values are ranked by revenue as top products
+DASHBOARD_PRODUCT_DIMENSION = os.getenv("DASHBOARD_PRODUCT_DIMENSION", "product")
+DASHBOARD_TOP_PRODUCTS = 5
+DASHBOARD_GROWTH_MONTHS = 6
+TIMEFRAMES = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+# Report execution configuration
+REPORT_SYNC_STATEMENT_TIMEOUT = float(os.getenv("REPORT_SYNC_STATEMENT_TIMEOUT", "30"))
+REPORT_STATEMENT_TIMEOUT = float(os.getenv("REPORT_STATEMENT_TIMEOUT", "300"))
+REPORT_MAX_CONCURRENT_EXECUTIONS = int(os.getenv("REPORT_MAX_CONCURRENT_EXECUTIONS", "4"))
+REPORT_MAX_QUEUED_EXECUTIONS = int(os.getenv("REPORT_MAX_QUEUED_EXECUTIONS", "16"))
+REPORT_MAX_WAIT = 30
+# Pending or running executions not finished after this many seconds were lost by a crashed replica
+REPORT_EXECUTION_STALE_AFTER = float(os.getenv("REPORT_EXECUTION_STALE_AFTER", "3600"))
+REPORT_RESULT_TTL = float(os.getenv("REPORT_RESULT_TTL", "300"))
+REPORT_RESULT_INLINE_MAX_BYTES = int(os.getenv("REPORT_RESULT_INLINE_MAX_BYTES", str(256 * 1024)))
+REPORT_RESULT_RETENTION = float(os.getenv("REPORT_RESULT_RETENTION", str(7 * 86400)))
+# Server-side prepared statements for report queries; off by default behind a transaction-pooling PgBouncer
+REPORT_PREPARED_STATEMENTS = os.getenv("REPORT_PREPARED_STATEMENTS", "false" if DB_PGBOUNCER else "true").lower() == "true"
+REPORT_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("REPORT_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+REPORT_EXPORT_BATCH_SIZE = int(os.getenv("REPORT_EXPORT_BATCH_SIZE", "10000"))
+
+# Report scheduler configuration
+REPORT_SCHEDULER_ENABLED = os.getenv("REPORT_SCHEDULER_ENABLED", "true").lower() == "true"
+REPORT_SCHEDULER_INTERVAL = float(os.getenv("REPORT_SCHEDULER_INTERVAL", "30"))
+REPORT_SCHEDULE_JITTER = float(os.getenv("REPORT_SCHEDULE_JITTER", "30"))
+# "once" runs a schedule missed during downtime once on start, "skip" waits for its next occurrence
+REPORT_SCHEDULE_CATCHUP = os.getenv("REPORT_SCHEDULE_CATCHUP", "once")
+REPORT_SCHEDULE_GRACE = float(os.getenv("REPORT_SCHEDULE_GRACE", "300"))
+
+# KPI computation configuration
+KPI_ENGINE_ENABLED = os.getenv("KPI_ENGINE_ENABLED", "true").lower() == "true"
+KPI_ENGINE_INTERVAL = float(os.getenv("KPI_ENGINE_INTERVAL", "30"))
+# Seconds between computations of a KPI without its own refresh_interval
+KPI_REFRESH_INTERVAL = int(os.getenv("KPI_REFRESH_INTERVAL", "300"))
+KPI_MIN_REFRESH_INTERVAL = 10
+# Calculation queries run at once, each holds a connection of the worker pool
+KPI_COMPUTE_CONCURRENCY = int(os.getenv("KPI_COMPUTE_CONCURRENCY", "4"))
+KPI_STATEMENT_TIMEOUT = float(os.getenv("KPI_STATEMENT_TIMEOUT", "60"))
+# Most KPIs computed by one merged query
+KPI_MERGE_MAX_COLUMNS = int(os.getenv("KPI_MERGE_MAX_COLUMNS", "50"))
+KPI_MAX_PER_CYCLE = int(os.getenv("KPI_MAX_PER_CYCLE", "1000"))
+
+# Result cache for /api/dashboard and /api/overview, keyed by (endpoint, period)
+result_cache = TTLCache(
+    maxsize=int(os.getenv("RESULT_CACHE_MAXSIZE", "256")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "60"))
+)
+
+# Hot window: the last HOT_WINDOW_DAYS of analytics data held in memory as NumPy
+# columns, serving aggregations from it. Off by default: rows ingested by other
+# processes are not seen, so it is only correct with a single service process.
+HOT_WINDOW_ENABLED = os.getenv("HOT_WINDOW_ENABLED", "false").lower() == "true"
+HOT_WINDOW_DAYS = float(os.getenv("HOT_WINDOW_DAYS", "30"))
+HOT_WINDOW_MAX_MB = int(os.getenv("HOT_WINDOW_MAX_MB", "256"))
+HOT_WINDOW_CHUNK_ROWS = int(os.getenv("HOT_WINDOW_CHUNK_ROWS", "65536"))
+HOT_WINDOW_LOAD_BATCH_SIZE = 50000
+hot_window = None
+if HOT_WINDOW_ENABLED:
+    # NumPy is only imported when the window is used
+    from utils.hot_window import LOAD_COLUMNS, HotWindow
+    hot_window = HotWindow(
+        span=timedelta(days=HOT_WINDOW_DAYS),
+        max_bytes=HOT_WINDOW_MAX_MB * 1024 * 1024,
+        chunk_rows=HOT_WINDOW_CHUNK_ROWS
+    )
+
+# Chart rendering configuration
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "5000"))
+# Rendered chart images keyed by ("chart", data hash); the hash is also the ETag
+chart_cache = TTLCache(
+    maxsize=int(os.getenv("CHART_CACHE_MAXSIZE", "128")),
+    ttl=float(os.getenv("CHART_CACHE_TTL", "300"))
+)
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored without time zone, in UTC"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def require_finite(value: Optional[float]) -> Optional[float]:
+    """NaN and infinity would poison rollup sums, minimums and maximums for good"""
+    if value is not None and not math.isfinite(value):
+        raise ValueError("must be a finite number")
+    return value
 
 # Pydantic models for request/response
 class AnalyticsDataCreate(BaseModel):
@@ -96,9 +229,13 @@ class AnalyticsDataCreate(BaseModel):
     value: float
     dimension: Optional[str] = None
     dimension_value: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+    _normalize_timestamp = validator("timestamp", allow_reuse=True)(to_naive_utc)
+    _finite_value = validator("value", allow_reuse=True)(require_finite)
 
 class AnalyticsDataResponse(BaseModel):
-    id: str
+    id: uuid.UUID
     source: str
     data_type: str
     timestamp: datetime
@@ -109,36 +246,66 @@ class AnalyticsDataResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class BulkIngestError(BaseModel):
+    index: int
+    error: str
+
+class BulkIngestResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    ids: List[Optional[str]]
+    errors: List[BulkIngestError]
+
 class KPICreate(BaseModel):
     name: str
     description: Optional[str] = None
-    current_value: float
+    category: Optional[str] = None
+    # Pushed by clients, or computed by the service from calculation_query
+    current_value: Optional[float] = None
     target_value: float
     unit: Optional[str] = None
+    calculation_query: Optional[str] = None
+    refresh_interval: Optional[int] = None
+
+    _finite_values = validator("current_value", "target_value", allow_reuse=True)(require_finite)
 
 class KPIResponse(BaseModel):
-    id: str
+    id: uuid.UUID
     name: str
     description: Optional[str] = None
-    current_value: float
+    category: Optional[str] = None
+    current_value: Optional[float] = None
     target_value: float
     unit: Optional[str] = None
+    calculation_query: Optional[str] = None
+    refresh_interval: Optional[int] = None
     last_updated: datetime
     
     class Config:
         orm_mode = True
 
+class KpiValueResponse(BaseModel):
+    period_start: datetime
+    period_end: datetime
+    value: float
+    
+    class Config:
+        orm_mode = True
+
 class ReportCreate(BaseModel):
     name: str
     description: Optional[str] = None
     query: str
+    parameters: Optional[Dict[str, Dict[str, Any]]] = None
     schedule: Optional[str] = None
 
 class ReportResponse(BaseModel):
-    id: str
+    id: uuid.UUID
     name: str
     description: Optional[str] = None
     query: str
+    parameters: Optional[Dict[str, Dict[str, Any]]] = None
     created_at: datetime
     updated_at: datetime
     schedule: Optional[str] = None
@@ -146,6 +313,26 @@ class ReportResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class ReportRunRequest(BaseModel):
+    parameters: Optional[Dict[str, Any]] = None
+    timeout_seconds: Optional[float] = None
+    refresh: bool = False
+
+class ReportExecutionSummary(BaseModel):
+    id: uuid.UUID
+    report_id: uuid.UUID
+    status: str
+    parameters: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        orm_mode = True
+
+class ReportExecutionResponse(ReportExecutionSummary):
+    result: Optional[Dict[str, Any]] = None
+
 class DashboardData(BaseModel):
     kpis: List[KPIResponse]
     sales_trend: Dict[str, Any]
@@ -154,6 +341,8 @@ class DashboardData(BaseModel):
 
 # Create FastAPI app
 app = FastAPI(title="Analytics Service", description="API for ERP system analytics")
+# Routes record their template and serialization time for the metrics
+app.router.route_class = InstrumentedRoute
 
 # Add CORS middleware
 app.add_middleware(
@@ -163,191 +352,1380 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    InstrumentationMiddleware,
+    profile_header=PROFILE_HEADER if PROFILING_ENABLED else None,
+    profile_interval=PROFILE_INTERVAL
+)
+
+# Database time, rows and pool checkout waits
+instrument_engine(async_engine.sync_engine, "request")
+instrument_engine(engine, "worker")
+pool_checkout_observers.append(observe_pool_checkout)
+track_pool("request", lambda: async_engine.pool)
+track_pool("worker", lambda: engine.pool)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Request, database and pool metrics in Prometheus text format."""
+    body, media_type = metrics_payload()
+    return Response(content=body, headers={"Content-Type": media_type})
 
 # Health check endpoint
 @app.get("/api/health")
-def health_check():
-    return {"status": "ok", "service": "analytics-service"}
+async def health_check():
+    health = {"status": "ok", "service": "analytics-service"}
+    if ingest_queue is not None:
+        health["ingest_queue"] = ingest_queue.stats()
+    return health
+
+def ingest_analytics_rows(db: Session, rows: List[Dict[str, Any]]) -> List[Any]:
+    """Insert analytics rows and fold them into the rollups in one transaction."""
+    try:
+        ids = insert_returning(db, AnalyticsData.__table__, rows, AnalyticsData.id)
+        for unit, model in ROLLUPS:
+            upsert_deltas(db, model.__table__, compute_deltas(rows, unit))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if hot_window is not None:
+        hot_window.append(rows, ids)
+    if any(row["data_type"] in OVERVIEW_METRICS.values() for row in rows):
+        result_cache.invalidate("overview")
+    return ids
+
+def write_queued_rows(rows: List[Dict[str, Any]]):
+    """Write a batch of the write-behind queue."""
+    db = SessionLocal()
+    try:
+        ingest_analytics_rows(db, rows)
+    finally:
+        db.close()
+
+ingest_queue = WriteBehindQueue(
+    "ingest-writer", write_queued_rows, max_rows=INGEST_QUEUE_MAX_ROWS, batch_size=INGEST_FLUSH_ROWS,
+    max_delay=INGEST_FLUSH_INTERVAL, spool_path=INGEST_SPOOL_PATH or None
+) if INGEST_WRITE_BEHIND else None
+
+def replay_ingest_spool():
+    """Write the points a previous process queued but did not write.
+
+    Points carry their id from the moment they are queued, so those it did
+    write before stopping are recognized and skipped.
+    """
+    rows = []
+    for record in read_spool(INGEST_SPOOL_PATH):
+        record["id"] = uuid.UUID(record["id"])
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+        rows.append(record)
+    if not rows:
+        return
+    table = AnalyticsData.__table__
+    replayed = 0
+    db = SessionLocal()
+    try:
+        for chunk in iter_chunks(rows, INGEST_FLUSH_ROWS):
+            timestamps = [row["timestamp"] for row in chunk]
+            written = set(db.execute(
+                select(table.c.id).where(
+                    table.c.id.in_([row["id"] for row in chunk]),
+                    table.c.timestamp.between(min(timestamps), max(timestamps))
+                )
+            ).scalars())
+            pending = [row for row in chunk if row["id"] not in written]
+            if pending:
+                ingest_analytics_rows(db, pending)
+                replayed += len(pending)
+    finally:
+        db.close()
+    logger.info(f"Replayed {replayed} of {len(rows)} spooled analytics data points")
+
+@app.on_event("startup")
+def start_ingest_queue():
+    if ingest_queue is not None:
+        if INGEST_SPOOL_PATH:
+            replay_ingest_spool()
+        ingest_queue.start()
+
+@app.on_event("shutdown")
+def flush_ingest_queue():
+    if ingest_queue is not None:
+        ingest_queue.stop(timeout=INGEST_SHUTDOWN_TIMEOUT)
 
 # Analytics data endpoints
 @app.post("/api/analytics/data", response_model=AnalyticsDataResponse)
-def create_analytics_data(data: AnalyticsDataCreate, db: Session = Depends(get_db)):
-    db_data = AnalyticsData(
-        source=data.source,
-        data_type=data.data_type,
-        value=data.value,
-        dimension=data.dimension,
-        dimension_value=data.dimension_value
+async def create_analytics_data(data: AnalyticsDataCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    """Ingest one analytics data point.
+
+    With INGEST_WRITE_BEHIND the point is queued and answered with 202 and
+    the id it will be written with; a full queue is answered with 429.
+    """
+    row = data.dict()
+    row["timestamp"] = row["timestamp"] or datetime.utcnow()
+    if ingest_queue is not None:
+        row = {"id": uuid.uuid4(), **row}
+        if ingest_queue.spool_path:
+            # put writes the row to the spool file, keep that off the event loop
+            accepted = await run_in_threadpool(ingest_queue.put, [row])
+        else:
+            accepted = ingest_queue.put([row])
+        if not accepted:
+            raise HTTPException(
+                status_code=429, detail="Ingestion queue is full",
+                headers={"Retry-After": str(max(1, round(INGEST_FLUSH_INTERVAL)))}
+            )
+        response.status_code = 202
+        return row
+    [new_id] = await db.run_sync(ingest_analytics_rows, [row])
+    return {"id": new_id, **row}
+
+async def read_bulk_records(request: Request):
+    """Yield raw records from a JSON array or an NDJSON request body."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        records = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    for record in records:
+        yield record
+
+def parse_bulk_record(record: Any) -> Dict[str, Any]:
+    """Validate one bulk record and return it as an insertable row."""
+    if isinstance(record, bytes):
+        record = json.loads(record)
+    row = AnalyticsDataCreate.parse_obj(record).dict()
+    row["timestamp"] = row["timestamp"] or datetime.utcnow()
+    return row
+
+def format_record_error(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in error.errors()
+        )
+    return str(error)
+
+@app.post("/api/analytics/data/bulk", response_model=BulkIngestResponse)
+async def bulk_create_analytics_data(
+    request: Request,
+    chunk_size: int = Query(
+        BULK_INSERT_CHUNK_SIZE, ge=1, le=BULK_INSERT_MAX_CHUNK_SIZE,
+        description="Rows per multi-row INSERT and commit"
+    ),
+    return_ids: bool = Query(True, description="Include the generated id of every row"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ingest many analytics data points from a JSON array or an NDJSON stream.
+
+    Rows are validated one by one and written in chunks with a multi-row
+    INSERT ... RETURNING, committing once per chunk. A chunk the database
+    refuses is split in halves until the failing rows are isolated. Invalid
+    and refused rows are reported by their position in the input.
+    """
+    ids: List[Optional[str]] = []
+    errors: List[BulkIngestError] = []
+    pending: List[tuple] = []
+
+    async def write(part: List[tuple]):
+        try:
+            new_ids = await db.run_sync(ingest_analytics_rows, [row for _, row in part])
+        except SQLAlchemyError as e:
+            if len(part) > 1 and not is_transient(e):
+                # Bisect to find the rows the database refuses and write the others
+                middle = len(part) // 2
+                await write(part[:middle])
+                await write(part[middle:])
+                return
+            logger.error(f"Error inserting analytics data: {describe(e)}")
+            errors.extend(
+                BulkIngestError(index=index, error=f"Database error: {describe(e)}")
+                for index, _ in part
+            )
+        else:
+            for (index, _), new_id in zip(part, new_ids):
+                ids[index] = str(new_id)
+
+    async def flush():
+        await write(pending)
+        pending.clear()
+
+    index = 0
+    async for record in read_bulk_records(request):
+        ids.append(None)
+        try:
+            pending.append((index, parse_bulk_record(record)))
+        except ValueError as e:
+            errors.append(BulkIngestError(index=index, error=format_record_error(e)))
+        index += 1
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+
+    errors.sort(key=lambda error: error.index)
+    inserted = index - len(errors)
+    return BulkIngestResponse(
+        received=index,
+        inserted=inserted,
+        failed=len(errors),
+        ids=ids if return_ids else [],
+        errors=errors
     )
-    db.add(db_data)
-    db.commit()
-    db.refresh(db_data)
-    return db_data
+
+def encode_cursor(timestamp: datetime, row_id) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor."""
+    raw = json.dumps([timestamp.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def analytics_data_filters(
+    source: Optional[str] = None,
+    data_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    dimension: Optional[str] = None
+) -> list:
+    conditions = []
+    if source:
+        conditions.append(AnalyticsData.source == source)
+    if data_type:
+        conditions.append(AnalyticsData.data_type == data_type)
+    if start_date:
+        conditions.append(AnalyticsData.timestamp >= to_naive_utc(start_date))
+    if end_date:
+        conditions.append(AnalyticsData.timestamp <= to_naive_utc(end_date))
+    if dimension:
+        conditions.append(AnalyticsData.dimension == dimension)
+    return conditions
 
 @app.get("/api/analytics/data", response_model=List[AnalyticsDataResponse])
-def get_analytics_data(
+async def get_analytics_data(
     source: Optional[str] = None,
     data_type: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     dimension: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=ANALYTICS_MAX_PAGE_SIZE, description="Maximum number of rows"),
+    format: str = Query("json", regex="^(json|ndjson|csv)$", description="Response format: json, ndjson, csv"),
+    shape: str = Query("rows", regex=ROW_SHAPE_PATTERN, description="JSON shape: rows (objects) or columns (arrays)"),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(AnalyticsData)
-    
+    """Get analytics data ordered by (timestamp, id).
+
+    JSON responses are paginated: when more rows are available the
+    X-Next-Cursor header holds the cursor for the next page. With
+    shape=columns the page is an object of one array per field. The ndjson
+    and csv formats stream every matching row from a server-side cursor.
+    """
+    conditions = analytics_data_filters(source, data_type, start_date, end_date, dimension)
+    if cursor:
+        conditions.append(tuple_(AnalyticsData.timestamp, AnalyticsData.id) > decode_cursor(cursor))
+    order_by = (AnalyticsData.timestamp, AnalyticsData.id)
+
+    if format != "json":
+        table = AnalyticsData.__table__
+        stmt = select(table).where(*conditions).order_by(*order_by)
+        if limit:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(
+            stream_rows(engine, stmt, format, STREAM_BATCH_SIZE),
+            media_type=STREAM_MEDIA_TYPES[format]
+        )
+
+    page_size = limit or ANALYTICS_PAGE_SIZE
+    columns = response_columns(AnalyticsData.__table__, AnalyticsDataResponse)
+    stmt = select(*columns).where(*conditions).order_by(*order_by).limit(page_size + 1)
+    result = await db.execute(stmt)
+    names, rows = list(result.keys()), result.all()
+    headers = {}
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows_response(names, rows, shape, headers)
+
+def aggregate_column(name: str, value_column):
+    """Build the SQL aggregate expression for an aggregate name such as sum or p95."""
+    if name in AGGREGATE_FUNCTIONS:
+        return AGGREGATE_FUNCTIONS[name](value_column)
+    match = PERCENTILE_PATTERN.match(name)
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Unsupported aggregate: {name}")
+    fraction = float(match.group(1)) / 100
+    return func.percentile_cont(fraction).within_group(value_column)
+
+def parse_aggregates(aggregates: str) -> List[str]:
+    names = [name.strip().lower() for name in aggregates.split(",") if name.strip()]
+    if not names:
+        raise HTTPException(status_code=400, detail="At least one aggregate is required")
+    return list(dict.fromkeys(names))
+
+def choose_rollup(bucket: str, names: List[str], start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Return the coarsest rollup that answers the query exactly, or None for raw data."""
+    if not all(name in ROLLUP_AGGREGATES for name in names):
+        return None
+    for unit, model in ROLLUPS:
+        if bucket in ROLLUP_READABLE[unit] and is_aligned(start_date, unit) and is_aligned(end_date, unit):
+            return model
+    return None
+
+def aggregate_source(
+    bucket: str,
+    names: List[str],
+    source: Optional[str],
+    data_type: Optional[str],
+    dimension: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> tuple:
+    """Pick the table answering an aggregation and return (time column, dimension value column, labelled aggregate columns, conditions)."""
+    rollup = choose_rollup(bucket, names, start_date, end_date)
+    if rollup is None:
+        model, time_column = AnalyticsData, AnalyticsData.timestamp
+        dimension_column = AnalyticsData.dimension_value
+        value_columns = [aggregate_column(name, AnalyticsData.value).label(name) for name in names]
+    else:
+        model, time_column = rollup, rollup.bucket
+        dimension_column = func.nullif(rollup.dimension_value, "")
+        value_columns = [ROLLUP_AGGREGATES[name](rollup).label(name) for name in names]
+
+    conditions = []
     if source:
-        query = query.filter(AnalyticsData.source == source)
+        conditions.append(model.source == source)
     if data_type:
-        query = query.filter(AnalyticsData.data_type == data_type)
+        conditions.append(model.data_type == data_type)
+    if dimension:
+        conditions.append(model.dimension == dimension)
     if start_date:
-        query = query.filter(AnalyticsData.timestamp >= start_date)
+        conditions.append(time_column >= start_date)
     if end_date:
-        query = query.filter(AnalyticsData.timestamp <= end_date)
+        conditions.append(time_column < end_date)
+    return time_column, dimension_column, value_columns, conditions
+
+@app.get("/api/analytics/aggregate")
+async def aggregate_analytics_data(
+    bucket: str = Query("day", regex="^(minute|hour|day|week|month)$", description="Time bucket: minute, hour, day, week, month"),
+    aggregates: str = Query("sum,count", description="Comma separated: sum, avg, min, max, count, p50, p95, p99 ..."),
+    source: Optional[str] = None,
+    data_type: Optional[str] = None,
+    dimension: Optional[str] = Query(None, description="Group the series by the values of this dimension"),
+    start_date: Optional[datetime] = Query(None, description="Inclusive start of the range"),
+    end_date: Optional[datetime] = Query(None, description="Exclusive end of the range"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Aggregate analytics data into time buckets.
+
+    A range starting inside the hot window (HOT_WINDOW_ENABLED) is
+    aggregated in memory. Otherwise the database reads the coarsest rollup
+    table that can answer the request exactly (supported aggregates, range
+    aligned to the rollup unit), falling back to raw analytics data, e.g.
+    for minute buckets or percentiles.
+
+    The result is columnar: ``timestamps`` (and ``dimension_values`` when a
+    dimension is given) hold one entry per group and ``values`` maps every
+    requested aggregate to an array aligned with them.
+    """
+    names = parse_aggregates(aggregates)
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    time_column, dimension_column, value_columns, conditions = aggregate_source(
+        bucket, names, source, data_type, dimension, start_date, end_date
+    )
+    if hot_window is not None:
+        # Grouping a large part of the window takes long enough to stall other requests on the event loop
+        windowed = await run_in_threadpool(
+            hot_window.aggregate, bucket, names, start_date, end_date, source or None, data_type or None, dimension or None
+        )
+        if windowed is not None:
+            return aggregate_result(
+                bucket, names, dimension, windowed["timestamps"], windowed.get("dimension_values"),
+                windowed["values"]
+            )
+
+    group_columns = [func.date_trunc(bucket, time_column).label("bucket")]
     if dimension:
-        query = query.filter(AnalyticsData.dimension == dimension)
-    
-    return query.all()
+        group_columns.append(dimension_column.label("dimension_value"))
+    stmt = (
+        select(*group_columns, *value_columns)
+        .where(*conditions)
+        .group_by(*group_columns)
+        .order_by(*group_columns)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    columns = list(zip(*rows)) if rows else [()] * (len(group_columns) + len(value_columns))
+    return aggregate_result(
+        bucket, names, dimension, columns[0], columns[1] if dimension else None,
+        {name: list(column) for name, column in zip(names, columns[len(group_columns):])}
+    )
+
+def aggregate_result(
+    bucket: str,
+    names: List[str],
+    dimension: Optional[str],
+    timestamps: List[datetime],
+    dimension_values: Optional[list],
+    values: Dict[str, list]
+) -> Dict[str, Any]:
+    result = {
+        "bucket": bucket,
+        "timestamps": [bucket_start.isoformat() for bucket_start in timestamps],
+        "values": {name: values[name] for name in names}
+    }
+    if dimension:
+        result["dimension"] = dimension
+        result["dimension_values"] = list(dimension_values)
+    return result
+
+# Conditional requests
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def version_headers(name: str, *version: Any, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """ETag from the values identifying a version of a resource, and its Last-Modified.
+
+    Clients revalidate on every poll (no-cache), which costs one small
+    aggregate query instead of loading and serializing the whole resource.
+    """
+    digest = hashlib.sha256(json.dumps([name, *version], default=str).encode()).hexdigest()[:32]
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        # Never later than the response itself
+        last_modified = min(last_modified, datetime.utcnow())
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+def not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Whether the client's copy is current: If-None-Match, or else If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or "Last-Modified" not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return parsedate_to_datetime(headers["Last-Modified"]) <= since.replace(tzinfo=since.tzinfo or timezone.utc)
+
+def latest(*timestamps: Optional[datetime]) -> Optional[datetime]:
+    return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
 
 # KPI endpoints
+def check_kpi(kpi: KPICreate):
+    if kpi.current_value is None and not kpi.calculation_query:
+        raise HTTPException(status_code=400, detail="A KPI needs a current_value or a calculation_query")
+    if kpi.category is not None and len(kpi.category) > 50:
+        raise HTTPException(status_code=400, detail="category is longer than 50 characters")
+    if kpi.refresh_interval is not None and kpi.refresh_interval < KPI_MIN_REFRESH_INTERVAL:
+        raise HTTPException(
+            status_code=400, detail=f"refresh_interval must be at least {KPI_MIN_REFRESH_INTERVAL} seconds"
+        )
+
 @app.post("/api/kpis", response_model=KPIResponse)
-def create_kpi(kpi: KPICreate, db: Session = Depends(get_db)):
+async def create_kpi(kpi: KPICreate, db: AsyncSession = Depends(get_db)):
+    check_kpi(kpi)
+    now = datetime.utcnow()
     db_kpi = KPI(
         name=kpi.name,
         description=kpi.description,
+        category=kpi.category,
         current_value=kpi.current_value,
         target_value=kpi.target_value,
-        unit=kpi.unit
+        unit=kpi.unit,
+        calculation_query=kpi.calculation_query,
+        refresh_interval=kpi.refresh_interval,
+        last_updated=now
     )
     db.add(db_kpi)
-    db.commit()
-    db.refresh(db_kpi)
+    await db.flush()
+    if kpi.current_value is not None:
+        db.add(KpiValue(metric_id=db_kpi.id, value=kpi.current_value, period_start=now, period_end=now))
+    await db.commit()
+    await db.refresh(db_kpi)
+    result_cache.invalidate("dashboard")
     return db_kpi
 
+async def kpis_version(db: AsyncSession) -> tuple:
+    """(count, latest last_updated) of the KPIs, which changes with every write to them"""
+    return tuple((await db.execute(select(func.count(KPI.id), func.max(KPI.last_updated)))).one())
+
 @app.get("/api/kpis", response_model=List[KPIResponse])
-def get_kpis(db: Session = Depends(get_db)):
-    return db.query(KPI).all()
+async def get_kpis(
+    request: Request,
+    shape: str = Query("rows", regex=ROW_SHAPE_PATTERN, description="JSON shape: rows (objects) or columns (arrays)"),
+    db: AsyncSession = Depends(get_db)
+):
+    count, last_updated = await kpis_version(db)
+    headers = version_headers("kpis", shape, count, last_updated, last_modified=last_updated)
+    if not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    result = await db.execute(select(*response_columns(KPI.__table__, KPIResponse)))
+    return rows_response(list(result.keys()), result.all(), shape, headers)
 
 @app.put("/api/kpis/{kpi_id}", response_model=KPIResponse)
-def update_kpi(kpi_id: str, kpi: KPICreate, db: Session = Depends(get_db)):
-    db_kpi = db.query(KPI).filter(KPI.id == kpi_id).first()
+async def update_kpi(kpi_id: uuid.UUID, kpi: KPICreate, db: AsyncSession = Depends(get_db)):
+    check_kpi(kpi)
+    db_kpi = await db.get(KPI, kpi_id)
     if not db_kpi:
         raise HTTPException(status_code=404, detail="KPI not found")
     
     db_kpi.name = kpi.name
     db_kpi.description = kpi.description
-    db_kpi.current_value = kpi.current_value
+    db_kpi.category = kpi.category
     db_kpi.target_value = kpi.target_value
     db_kpi.unit = kpi.unit
+    if kpi.calculation_query != db_kpi.calculation_query or kpi.refresh_interval != db_kpi.refresh_interval:
+        # Computed on the engine's next pass
+        db_kpi.next_compute_at = None
+    db_kpi.calculation_query = kpi.calculation_query
+    db_kpi.refresh_interval = kpi.refresh_interval
     db_kpi.last_updated = datetime.utcnow()
+    # Computed KPIs keep their value unless one is pushed
+    if kpi.current_value is not None:
+        db_kpi.current_value = kpi.current_value
+        # Every update is kept as a point of the KPI's history
+        db.add(KpiValue(
+            metric_id=db_kpi.id, value=kpi.current_value,
+            period_start=db_kpi.last_updated, period_end=db_kpi.last_updated
+        ))
     
-    db.commit()
-    db.refresh(db_kpi)
+    await db.commit()
+    await db.refresh(db_kpi)
+    result_cache.invalidate("dashboard")
     return db_kpi
 
+@app.post("/api/kpis/bulk", response_model=List[KPIResponse])
+async def bulk_upsert_kpis(kpis: List[KPICreate], db: AsyncSession = Depends(get_db)):
+    """Create or update many KPIs by name, returning the resulting rows in input order.
+
+    Each chunk is written with one INSERT ... ON CONFLICT (name) DO UPDATE
+    ... RETURNING, and the pushed values with one multi-row INSERT into the
+    history, all in a single transaction. Updates follow update_kpi: a KPI
+    pushed without current_value keeps its value, and changing its
+    calculation query or refresh interval makes it due for computation.
+    """
+    if len(kpis) > KPI_BULK_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {KPI_BULK_MAX_SIZE} KPIs per request")
+    names = set()
+    for index, kpi in enumerate(kpis):
+        try:
+            check_kpi(kpi)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"kpis[{index}]: {e.detail}")
+        # A row cannot be updated twice by one INSERT ... ON CONFLICT
+        if kpi.name in names:
+            raise HTTPException(status_code=400, detail=f"kpis[{index}]: duplicate name {kpi.name!r}")
+        names.add(kpi.name)
+
+    now = datetime.utcnow()
+    results: Dict[str, KPI] = {}
+    for chunk in iter_chunks(kpis, KPI_BULK_CHUNK_SIZE):
+        stmt = pg_insert(KPI).values([
+            {
+                "name": kpi.name,
+                "description": kpi.description,
+                "category": kpi.category,
+                "current_value": kpi.current_value,
+                "target_value": kpi.target_value,
+                "unit": kpi.unit,
+                "calculation_query": kpi.calculation_query,
+                "refresh_interval": kpi.refresh_interval,
+                "last_updated": now,
+            }
+            for kpi in chunk
+        ])
+        recompute = or_(
+            stmt.excluded.calculation_query.is_distinct_from(KPI.calculation_query),
+            stmt.excluded.refresh_interval.is_distinct_from(KPI.refresh_interval)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[KPI.name],
+            set_={
+                "description": stmt.excluded.description,
+                "category": stmt.excluded.category,
+                "current_value": func.coalesce(stmt.excluded.current_value, KPI.current_value),
+                "target_value": stmt.excluded.target_value,
+                "unit": stmt.excluded.unit,
+                "calculation_query": stmt.excluded.calculation_query,
+                "refresh_interval": stmt.excluded.refresh_interval,
+                "last_updated": stmt.excluded.last_updated,
+                "next_compute_at": case((recompute, None), else_=KPI.next_compute_at),
+            }
+        ).returning(KPI)
+        upserted = (await db.scalars(stmt, execution_options={"populate_existing": True})).all()
+        results.update((db_kpi.name, db_kpi) for db_kpi in upserted)
+
+    # Every pushed value is kept as a point of the KPI's history
+    history = [
+        {"metric_id": results[kpi.name].id, "value": kpi.current_value, "period_start": now, "period_end": now}
+        for kpi in kpis if kpi.current_value is not None
+    ]
+    for chunk in iter_chunks(history, KPI_BULK_CHUNK_SIZE):
+        await db.execute(pg_insert(KpiValue).values(chunk))
+    await db.commit()
+    result_cache.invalidate("dashboard")
+    return [results[kpi.name] for kpi in kpis]
+
+@app.get("/api/kpis/{kpi_id}/history", response_model=List[KpiValueResponse])
+async def get_kpi_history(
+    kpi_id: uuid.UUID,
+    start_date: Optional[datetime] = Query(None, description="Inclusive start of the range"),
+    end_date: Optional[datetime] = Query(None, description="Exclusive end of the range"),
+    limit: int = Query(1000, ge=1, le=KPI_HISTORY_MAX_LIMIT, description="Maximum number of values, the latest are kept"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Recorded values of a KPI in a time range, oldest first."""
+    if not await db.get(KPI, kpi_id):
+        raise HTTPException(status_code=404, detail="KPI not found")
+    stmt = (
+        select(KpiValue)
+        .where(KpiValue.metric_id == kpi_id, *kpi_value_range(start_date, end_date))
+        .order_by(KpiValue.period_end.desc())
+        .limit(limit)
+    )
+    values = (await db.execute(stmt)).scalars().all()
+    return values[::-1]
+
+def kpi_value_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    conditions = []
+    if start_date:
+        conditions.append(KpiValue.period_end >= to_naive_utc(start_date))
+    if end_date:
+        conditions.append(KpiValue.period_end < to_naive_utc(end_date))
+    return conditions
+
+@app.get("/api/kpis/{kpi_id}/trends")
+async def get_kpi_trends(
+    kpi_id: uuid.UUID,
+    freq: Optional[str] = Query("day", regex="^(raw|hour|day|week|month)$", description="Resampling period: raw, hour, day, week, month"),
+    window: int = Query(7, ge=1, le=365, description="Periods in the moving average"),
+    horizon: int = Query(7, ge=0, le=365, description="Periods to forecast, 0 disables the forecast"),
+    fit_points: Optional[int] = Query(None, ge=2, description="Periods the forecast line is fitted to, all by default"),
+    start_date: Optional[datetime] = Query(None, description="Inclusive start of the range"),
+    end_date: Optional[datetime] = Query(None, description="Exclusive end of the range"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Moving average, period-over-period deltas and a linear forecast of a KPI's history.
+
+    Values are resampled to ``freq`` periods (the last value of a period,
+    carried forward over periods without updates) unless freq is raw. The
+    statistics are computed with pandas over the whole series at once, off
+    the event loop.
+    """
+    db_kpi = await db.get(KPI, kpi_id)
+    if not db_kpi:
+        raise HTTPException(status_code=404, detail="KPI not found")
+    name, target_value = db_kpi.name, db_kpi.target_value
+    stmt = (
+        select(KpiValue.period_end, KpiValue.value)
+        .where(KpiValue.metric_id == kpi_id, *kpi_value_range(start_date, end_date))
+        .order_by(KpiValue.period_end)
+    )
+    rows = (await db.execute(stmt)).all()
+    timestamps, values = (list(column) for column in zip(*rows)) if rows else ([], [])
+    trends = await run_in_threadpool(
+        compute_trends, timestamps, values, None if freq == "raw" else freq, window, horizon, fit_points
+    )
+    return {
+        "kpi_id": kpi_id,
+        "name": name,
+        "target_value": target_value,
+        "freq": freq,
+        "window": window,
+        **trends
+    }
+
 # Report endpoints
 @app.post("/api/reports", response_model=ReportResponse)
-def create_report(report: ReportCreate, db: Session = Depends(get_db)):
+async def create_report(report: ReportCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        parameters = validate_declarations(report.query, report.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_run_at = None
+    if report.schedule:
+        if not is_valid_schedule(report.schedule):
+            raise HTTPException(status_code=400, detail=f"Invalid cron schedule: {report.schedule}")
+        next_run_at = next_run_time(report.schedule, datetime.utcnow(), REPORT_SCHEDULE_JITTER)
     db_report = Report(
         name=report.name,
         description=report.description,
         query=report.query,
-        schedule=report.schedule
+        parameters=parameters or None,
+        schedule=report.schedule,
+        next_run_at=next_run_at
     )
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
+    await db.refresh(db_report)
     return db_report
 
 @app.get("/api/reports", response_model=List[ReportResponse])
-def get_reports(db: Session = Depends(get_db)):
-    return db.query(Report).all()
+async def get_reports(
+    request: Request,
+    shape: str = Query("rows", regex=ROW_SHAPE_PATTERN, description="JSON shape: rows (objects) or columns (arrays)"),
+    db: AsyncSession = Depends(get_db)
+):
+    count, updated_at = (await db.execute(select(func.count(Report.id), func.max(Report.updated_at)))).one()
+    headers = version_headers("reports", shape, count, updated_at, last_modified=updated_at)
+    if not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    result = await db.execute(select(*response_columns(Report.__table__, ReportResponse)))
+    return rows_response(list(result.keys()), result.all(), shape, headers)
 
-@app.get("/api/reports/{report_id}/run")
-def run_report(report_id: str, db: Session = Depends(get_db)):
-    db_report = db.query(Report).filter(Report.id == report_id).first()
-    if not db_report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
+def run_report_query(db: Session, report: Report, parameters: Dict[str, Any], timeout_seconds: float) -> tuple:
+    """Execute a report query under a statement timeout and return (columns, rows).
+
+    Used by the report worker threads on the sync engine.
+    """
+    timeout_ms = int(timeout_seconds * 1000)
+    db.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {"timeout": str(timeout_ms)})
+    if REPORT_PREPARED_STATEMENTS:
+        result = execute_prepared(
+            db, report.query, report.parameters or {}, parameters, REPORT_PREPARED_STATEMENT_CACHE_SIZE
+        )
+    else:
+        result = db.execute(bind_query(report.query, report.parameters or {}, parameters))
+    return list(result.keys()), result.fetchall()
+
+async def run_report_query_async(db: AsyncSession, report: Report, parameters: Dict[str, Any], timeout_seconds: float) -> tuple:
+    """Execute a report query on the async engine under a statement timeout.
+
+    asyncpg prepares every statement and caches it per connection, so
+    repeated runs of a report reuse the server-side prepared statement.
+    """
+    timeout_ms = int(timeout_seconds * 1000)
+    await db.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {"timeout": str(timeout_ms)})
+    result = await db.execute(bind_query(report.query, report.parameters or {}, parameters))
+    return list(result.keys()), result.fetchall()
+
+def report_run_parameters(report: Report, values: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validate run parameters of a report against its declarations."""
+    try:
+        return coerce_parameters(report.parameters, values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def plain_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Run parameters in the JSON form stored in report_executions and hashed into cache keys."""
+    return {name: to_plain(value) for name, value in parameters.items()}
+
+def build_report_result(columns: List[str], rows) -> Dict[str, Any]:
+    return {
+        "columns": columns,
+        "rows": [[to_plain(value) for value in row] for row in rows],
+        "row_count": len(rows)
+    }
+
+async def find_cached_result(db: AsyncSession, cache_key: str, max_age: Optional[float] = REPORT_RESULT_TTL) -> Optional[tuple]:
+    """Return (execution, result) of a completed run with the same cache key.
+
+    Only runs that completed within max_age seconds are used; None accepts
+    the latest run however old it is.
+    """
+    stmt = select(ReportExecution).options(undefer(ReportExecution.result_data)).where(
+        ReportExecution.cache_key == cache_key,
+        ReportExecution.status == "completed"
+    )
+    if max_age is not None:
+        if max_age <= 0:
+            return None
+        stmt = stmt.where(ReportExecution.completed_at >= datetime.utcnow() - timedelta(seconds=max_age))
+    execution = (await db.execute(stmt.order_by(ReportExecution.completed_at.desc()).limit(1))).scalars().first()
+    if execution is None:
+        return None
+    try:
+        return execution, await run_in_threadpool(result_store.load, execution.result, execution.result_data)
+    except ResultExpired:
+        return None
+
+async def load_report_result(db: AsyncSession, db_report: Report, parameters: Dict[str, Any], refresh: bool = False) -> tuple:
+    """Return (result, executed_at) of a report, reusing a fresh result of the same query if there is one.
+
+    Scheduled reports reuse their latest materialized result whatever its
+    age. A new run is recorded as a completed report execution.
+    """
+    report_id = db_report.id
+    stored_parameters = plain_parameters(parameters)
+    cache_key = report_cache_key(db_report.query, stored_parameters)
+    max_age = None if db_report.schedule else REPORT_RESULT_TTL
+
+    cached = None if refresh else await find_cached_result(db, cache_key, max_age)
+    if cached:
+        execution, result = cached
+        return result, execution.completed_at
+
+    started_at = datetime.utcnow()
     try:
         # Execute the report query
-        result = db.execute(text(db_report.query))
-        columns = result.keys()
-        data = [dict(zip(columns, row)) for row in result.fetchall()]
-        return {"name": db_report.name, "data": data}
+        columns, rows = await run_report_query_async(db, db_report, parameters, REPORT_SYNC_STATEMENT_TIMEOUT)
+        result = build_report_result(columns, rows)
     except Exception as e:
         logger.error(f"Error running report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error running report: {str(e)}")
+    # Discard anything the report query did before recording the run
+    await db.rollback()
+
+    executed_at = datetime.utcnow()
+    stored, data = await run_in_threadpool(result_store.save, result)
+    db.add(ReportExecution(
+        report_id=report_id,
+        parameters=stored_parameters,
+        status="completed",
+        cache_key=cache_key,
+        result=stored,
+        result_data=data,
+        created_at=started_at,
+        started_at=started_at,
+        completed_at=executed_at
+    ))
+    await db.commit()
+    cutoff = result_store.prune_cutoff()
+    if cutoff is not None:
+        await db.execute(expire_result_data(cutoff))
+        await db.commit()
+    return result, executed_at
+
+@app.get("/api/reports/{report_id}/run")
+async def run_report(
+    report_id: uuid.UUID,
+    request: Request,
+    refresh: bool = Query(False, description="Run the query even if a fresh result exists"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Run a report, reusing a fresh result of the same query if there is one.
+
+    Report parameters are passed as query string arguments. Scheduled
+    reports return their latest materialized result whatever its age, since
+    the scheduler keeps it up to date.
+    """
+    db_report = await db.get(Report, report_id)
+    if not db_report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    values = {key: value for key, value in request.query_params.items() if key != "refresh"}
+    parameters = report_run_parameters(db_report, values)
+    name = db_report.name
+    result, executed_at = await load_report_result(db, db_report, parameters, refresh)
+    data = [dict(zip(result["columns"], row)) for row in result["rows"]]
+    return {"name": name, "data": data, "executed_at": executed_at.isoformat()}
+
+@app.get("/api/reports/{report_id}/export")
+async def export_report(
+    report_id: uuid.UUID,
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson|parquet|arrow)$", description="Export format: csv, ndjson, parquet, arrow"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream a report's result as CSV, NDJSON, Parquet or Arrow IPC.
+
+    Rows are read from a server-side cursor in batches of
+    REPORT_EXPORT_BATCH_SIZE and each batch is encoded as soon as it
+    arrives, so memory stays bounded however large the report is. Report
+    parameters are passed as query string arguments.
+    """
+    db_report = await db.get(Report, report_id)
+    if not db_report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    values = {key: value for key, value in request.query_params.items() if key != "format"}
+    parameters = report_run_parameters(db_report, values)
+    # Server-side cursors cannot be declared over EXECUTE, so exports bind into the query text
+    stmt = bind_query(db_report.query, db_report.parameters or {}, parameters)
+
+    if format in EXPORT_MEDIA_TYPES:
+        batches = iter_typed_batches(engine, stmt, REPORT_EXPORT_BATCH_SIZE, REPORT_STATEMENT_TIMEOUT)
+        chunks = stream_columnar(batches, format)
+        media_type = EXPORT_MEDIA_TYPES[format]
+    else:
+        chunks = stream_rows(engine, stmt, format, REPORT_EXPORT_BATCH_SIZE, REPORT_STATEMENT_TIMEOUT)
+        media_type = STREAM_MEDIA_TYPES[format]
+    # Run the query before the response starts so its errors get a proper status code
+    try:
+        first_chunk = await run_in_threadpool(next, chunks)
+    except SQLAlchemyError as e:
+        logger.error(f"Error exporting report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error running report: {str(getattr(e, 'orig', e)).strip()}")
+    return StreamingResponse(
+        chain([first_chunk], chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="report-{db_report.id}.{format}"'}
+    )
+
+# Asynchronous report executions
+report_executor = ThreadPoolExecutor(
+    max_workers=REPORT_MAX_CONCURRENT_EXECUTIONS, thread_name_prefix="report"
+)
+# Caps running plus queued executions so a burst of submissions cannot pile up
+report_slots = threading.BoundedSemaphore(REPORT_MAX_CONCURRENT_EXECUTIONS + REPORT_MAX_QUEUED_EXECUTIONS)
+report_futures: Dict[str, Any] = {}
+result_store = ResultStore(
+    inline_max_bytes=REPORT_RESULT_INLINE_MAX_BYTES,
+    retention_seconds=REPORT_RESULT_RETENTION
+)
+
+def expire_result_data(cutoff: datetime):
+    """Remove the compressed payloads of results completed before cutoff."""
+    return (
+        update(ReportExecution)
+        .where(ReportExecution.result_data.isnot(None), ReportExecution.completed_at < cutoff)
+        .values(result_data=None)
+    )
+
+def execute_report(execution_id: str, timeout_seconds: float):
+    """Run a pending report execution and store its outcome."""
+    db = SessionLocal()
+    try:
+        execution = db.get(ReportExecution, execution_id)
+        if execution.status != "pending":
+            # Failed as stale or on shutdown while it waited in the queue
+            return
+        execution.status = "running"
+        execution.started_at = datetime.utcnow()
+        db.commit()
+
+        report = db.get(Report, execution.report_id)
+        try:
+            parameters = coerce_parameters(report.parameters, execution.parameters)
+            columns, rows = run_report_query(db, report, parameters, timeout_seconds)
+            result, data = result_store.save(build_report_result(columns, rows))
+            status = "completed"
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Error running report execution {execution_id}: {str(e)}")
+            result, data = {"error": str(getattr(e, "orig", e)).strip()}, None
+            status = "failed"
+        # Discard anything the report query did and reset the statement timeout
+        db.rollback()
+
+        execution.status = status
+        execution.result = result
+        execution.result_data = data
+        execution.completed_at = datetime.utcnow()
+        db.commit()
+        cutoff = result_store.prune_cutoff()
+        if cutoff is not None:
+            db.execute(expire_result_data(cutoff))
+            db.commit()
+    except Exception as e:
+        logger.error(f"Report execution {execution_id} crashed: {str(e)}")
+        db.rollback()
+        db.query(ReportExecution).filter(ReportExecution.id == execution_id).update({
+            "status": "failed", "result": {"error": "Internal error"}, "completed_at": datetime.utcnow()
+        })
+        db.commit()
+    finally:
+        db.close()
+        report_slots.release()
+
+def queue_report_execution(execution_id: str, timeout_seconds: float):
+    """Hand a pending execution to the worker pool; the caller must hold a report slot."""
+    try:
+        future = report_executor.submit(execute_report, execution_id, timeout_seconds)
+    except Exception:
+        report_slots.release()
+        raise
+    report_futures[execution_id] = future
+    future.add_done_callback(lambda _: report_futures.pop(execution_id, None))
+
+@app.post("/api/reports/{report_id}/executions", response_model=ReportExecutionSummary, status_code=202)
+async def submit_report_execution(
+    report_id: uuid.UUID,
+    response: Response,
+    run: Optional[ReportRunRequest] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a report run on the worker pool and return its execution record.
+
+    If the same query completed within REPORT_RESULT_TTL, that execution is
+    returned with status 200 instead of running the query again.
+    """
+    run = run or ReportRunRequest()
+    db_report = await db.get(Report, report_id)
+    if not db_report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    parameters = plain_parameters(report_run_parameters(db_report, run.parameters))
+    cache_key = report_cache_key(db_report.query, parameters)
+    cached = None if run.refresh else await find_cached_result(db, cache_key)
+    if cached:
+        response.status_code = 200
+        return cached[0]
+    timeout_seconds = min(run.timeout_seconds or REPORT_STATEMENT_TIMEOUT, REPORT_STATEMENT_TIMEOUT)
+
+    if not report_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many report executions in progress")
+    try:
+        execution = ReportExecution(
+            report_id=db_report.id, parameters=parameters, status="pending", cache_key=cache_key
+        )
+        db.add(execution)
+        await db.commit()
+        await db.refresh(execution)
+    except Exception:
+        report_slots.release()
+        raise
+    queue_report_execution(str(execution.id), timeout_seconds)
+    return execution
+
+@app.get("/api/reports/{report_id}/executions", response_model=List[ReportExecutionSummary])
+async def get_report_executions(
+    report_id: uuid.UUID,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    stmt = (
+        select(ReportExecution)
+        .options(defer(ReportExecution.result))
+        .where(ReportExecution.report_id == report_id)
+        .order_by(ReportExecution.created_at.desc())
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).scalars().all()
+
+@app.get("/api/reports/{report_id}/executions/{execution_id}", response_model=ReportExecutionResponse)
+async def get_report_execution(
+    report_id: uuid.UUID,
+    execution_id: uuid.UUID,
+    wait: float = Query(0, ge=0, le=REPORT_MAX_WAIT, description="Seconds to wait for the execution to finish"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a report execution, optionally long-polling until it finishes."""
+    future = report_futures.get(str(execution_id))
+    if wait and future is not None:
+        # asyncio.wait does not cancel the execution when the wait times out
+        await asyncio.wait([asyncio.wrap_future(future)], timeout=wait)
+    execution = await db.get(ReportExecution, execution_id, options=[undefer(ReportExecution.result_data)])
+    if not execution or execution.report_id != report_id:
+        raise HTTPException(status_code=404, detail="Report execution not found")
+    try:
+        result = await run_in_threadpool(result_store.load, execution.result, execution.result_data)
+    except ResultExpired:
+        raise HTTPException(status_code=410, detail="Report result is no longer available")
+    return ReportExecutionResponse.from_orm(execution).copy(update={"result": result})
+
+# Scheduled report executions
+def run_due_reports():
+    """Queue executions of scheduled reports whose next run time has passed.
+
+    Due reports are claimed with FOR UPDATE SKIP LOCKED and their next run
+    time is advanced in the same transaction, so when several replicas run
+    the scheduler each occurrence is executed by only one of them.
+    """
+    now = datetime.utcnow()
+    queued = []
+    db = SessionLocal()
+    try:
+        due_reports = (
+            db.query(Report)
+            .filter(
+                Report.schedule.isnot(None),
+                or_(Report.next_run_at.is_(None), Report.next_run_at <= now)
+            )
+            .order_by(Report.next_run_at.asc().nullsfirst())
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for report in due_reports:
+            if not is_valid_schedule(report.schedule):
+                logger.warning(f"Report {report.id} has an invalid schedule: {report.schedule}")
+                continue
+            # Scheduled runs use the declared defaults
+            try:
+                parameters = plain_parameters(coerce_parameters(report.parameters, None))
+            except ValueError as e:
+                logger.warning(f"Report {report.id} cannot run on schedule: {str(e)}")
+                report.next_run_at = next_run_time(report.schedule, now, REPORT_SCHEDULE_JITTER)
+                continue
+            # Reports without a next run time were scheduled outside the API and only get one
+            missed = report.next_run_at is not None and (now - report.next_run_at).total_seconds() > REPORT_SCHEDULE_GRACE
+            should_run = report.next_run_at is not None and not (missed and REPORT_SCHEDULE_CATCHUP == "skip")
+            if should_run and not report_slots.acquire(blocking=False):
+                # Worker pool is full, the remaining reports stay due until the next tick
+                break
+            # Runs missed during downtime collapse into this one
+            report.next_run_at = next_run_time(report.schedule, now, REPORT_SCHEDULE_JITTER)
+            if should_run:
+                execution_id = uuid.uuid4()
+                db.add(ReportExecution(
+                    id=execution_id,
+                    report_id=report.id,
+                    parameters=parameters,
+                    status="pending",
+                    cache_key=report_cache_key(report.query, parameters)
+                ))
+                queued.append(str(execution_id))
+        db.commit()
+    except Exception:
+        db.rollback()
+        for _ in queued:
+            report_slots.release()
+        raise
+    finally:
+        db.close()
+
+    for execution_id in queued:
+        queue_report_execution(execution_id, REPORT_STATEMENT_TIMEOUT)
+    if queued:
+        logger.info(f"Queued {len(queued)} scheduled report executions")
+
+def fail_executions(*conditions, error: str) -> int:
+    """Mark pending or running executions matching conditions as failed with error."""
+    db = SessionLocal()
+    try:
+        failed = db.query(ReportExecution).filter(
+            ReportExecution.status.in_(["pending", "running"]), *conditions
+        ).update({
+            "status": "failed", "result": {"error": error}, "completed_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return failed
+    finally:
+        db.close()
+
+def fail_stale_executions():
+    """Fail executions left pending or running by a replica that crashed.
+
+    No execution runs longer than REPORT_STATEMENT_TIMEOUT or waits longer
+    than the queue allows, so ones older than REPORT_EXECUTION_STALE_AFTER
+    will never finish and their clients would otherwise poll forever.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=REPORT_EXECUTION_STALE_AFTER)
+    failed = fail_executions(
+        func.coalesce(ReportExecution.started_at, ReportExecution.created_at) < cutoff,
+        error="Report execution was lost, run it again"
+    )
+    if failed:
+        logger.warning(f"Failed {failed} stale report executions")
+
+report_scheduler = PeriodicTask("report-scheduler", REPORT_SCHEDULER_INTERVAL, run_due_reports)
+stale_execution_reaper = PeriodicTask("report-reaper", REPORT_SCHEDULER_INTERVAL, fail_stale_executions)
+
+@app.on_event("startup")
+def start_report_scheduler():
+    try:
+        fail_stale_executions()
+    except SQLAlchemyError as e:
+        logger.error(f"Failing stale report executions failed: {str(e)}")
+    stale_execution_reaper.start()
+    if REPORT_SCHEDULER_ENABLED:
+        report_scheduler.start()
+
+@app.on_event("shutdown")
+def shutdown_report_executor():
+    report_scheduler.stop(timeout=5)
+    stale_execution_reaper.stop(timeout=5)
+    futures = list(report_futures.items())
+    report_executor.shutdown(wait=False, cancel_futures=True)
+    # Queued executions were cancelled, running ones still finish
+    cancelled = [execution_id for execution_id, future in futures if future.cancelled()]
+    if cancelled:
+        try:
+            fail_executions(
+                ReportExecution.id.in_(cancelled),
+                error="Report execution was cancelled by a service shutdown, run it again"
+            )
+        except SQLAlchemyError as e:
+            logger.error(f"Failing cancelled report executions failed: {str(e)}")
+
+# KPI computation
+kpi_executor = ThreadPoolExecutor(max_workers=KPI_COMPUTE_CONCURRENCY, thread_name_prefix="kpi")
+
+def compute_due_kpis():
+    """Compute the KPIs whose calculation query is due and store their values.
+
+    Due KPIs are claimed with FOR UPDATE SKIP LOCKED and their next compute
+    time advanced in the same transaction, like scheduled reports. Their
+    queries are planned into batches (simple aggregates over the same table
+    become one query, see database/kpi_queries.py) that run concurrently on
+    kpi_executor. Values are written with one upsert into kpi_values, keyed
+    by the refresh period, and one UPDATE of the KPIs' current values.
+    """
+    now = datetime.utcnow()
+    queries: Dict[uuid.UUID, str] = {}
+    periods: Dict[uuid.UUID, datetime] = {}
+    db = SessionLocal()
+    try:
+        due_kpis = (
+            db.query(KPI)
+            .filter(
+                KPI.calculation_query.isnot(None),
+                or_(KPI.next_compute_at.is_(None), KPI.next_compute_at <= now)
+            )
+            .order_by(KPI.next_compute_at.asc().nullsfirst())
+            .limit(KPI_MAX_PER_CYCLE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for kpi in due_kpis:
+            # Periods are aligned so KPIs sharing an interval come due, and are merged, together
+            period_start, period_end = period_bounds(now, kpi.refresh_interval or KPI_REFRESH_INTERVAL)
+            kpi.next_compute_at = period_end
+            queries[kpi.id] = kpi.calculation_query
+            periods[kpi.id] = period_start
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if not queries:
+        return
+
+    batches = plan_batches(queries, KPI_MERGE_MAX_COLUMNS)
+    futures = [
+        kpi_executor.submit(compute_batch, engine, batch, queries, KPI_STATEMENT_TIMEOUT)
+        for batch in batches
+    ]
+    computed: Dict[uuid.UUID, float] = {}
+    for future in futures:
+        batch_values, batch_errors = future.result()
+        computed.update((kpi_id, value) for kpi_id, value in batch_values.items() if value is not None)
+        for kpi_id, error in batch_errors.items():
+            logger.warning(f"KPI {kpi_id} calculation failed: {error}")
+    if not computed:
+        return
+
+    computed_at = datetime.utcnow()
+    latest = values(column("id", UUID), column("value", Float), name="latest").data(list(computed.items()))
+    db = SessionLocal()
+    try:
+        upsert_kpi_values(db, KpiValue.__table__, [
+            {
+                "metric_id": kpi_id,
+                "value": value,
+                "period_start": periods[kpi_id],
+                "period_end": computed_at,
+                "created_at": computed_at,
+            }
+            for kpi_id, value in computed.items()
+        ])
+        db.execute(
+            update(KPI)
+            .where(KPI.id == latest.c.id)
+            .values(current_value=latest.c.value, last_updated=computed_at)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    result_cache.invalidate("dashboard")
+    logger.info(f"Computed {len(computed)} of {len(queries)} due KPIs with {len(batches)} queries")
+
+kpi_engine = PeriodicTask("kpi-engine", KPI_ENGINE_INTERVAL, compute_due_kpis)
+
+@app.on_event("startup")
+def start_kpi_engine():
+    if KPI_ENGINE_ENABLED:
+        kpi_engine.start()
+
+@app.on_event("shutdown")
+def shutdown_kpi_engine():
+    kpi_engine.stop(timeout=5)
+    kpi_executor.shutdown(wait=False, cancel_futures=True)
+
+# Hot window warm-up
+def warm_up_hot_window(start: datetime):
+    """Load the window's rows from the database; aggregations use the database until it is done."""
+    table = AnalyticsData.__table__
+    stmt = select(*(table.c[name] for name in LOAD_COLUMNS)).where(table.c.timestamp >= start)
+    try:
+        hot_window.load(
+            (rows for _, rows in iter_batches(engine, stmt, HOT_WINDOW_LOAD_BATCH_SIZE)), start
+        )
+    except Exception as e:
+        hot_window.disable()
+        logger.error(f"Hot window warm-up failed, aggregations read the database: {str(e)}")
+        return
+    stats = hot_window.stats()
+    logger.info(f"Hot window loaded {stats['rows']} rows since {stats['start']} ({stats['bytes']} bytes)")
+
+@app.on_event("startup")
+def start_hot_window():
+    if hot_window is not None:
+        # Started before the first request so rows ingested during the load are kept
+        start = hot_window.begin_warm_up(datetime.utcnow())
+        threading.Thread(target=warm_up_hot_window, args=(start,), name="hot-window-warm-up", daemon=True).start()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
 
 # Overview endpoint for business metrics
+def percent_change(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round(((current - previous) / previous) * 100, 2)
+
 @app.get("/api/overview")
-def get_business_overview(
+async def get_business_overview(
     timeframe: str = Query("month", description="Timeframe for overview data: day, week, month, year"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get business overview metrics including revenue, orders, customers, and products."""
-    
-    # Calculate date range based on timeframe
-    end_date = datetime.utcnow()
-    if timeframe == "day":
-        start_date = end_date - timedelta(days=1)
-        previous_start = start_date - timedelta(days=1)
-        previous_end = start_date
-    elif timeframe == "week":
-        start_date = end_date - timedelta(weeks=1)
-        previous_start = start_date - timedelta(weeks=1)
-        previous_end = start_date
-    elif timeframe == "year":
-        start_date = end_date - timedelta(days=365)
-        previous_start = start_date - timedelta(days=365)
-        previous_end = start_date
-    else:  # Default to month
-        start_date = end_date - timedelta(days=30)
-        previous_start = start_date - timedelta(days=30)
-        previous_end = start_date
-    
-    # Mock data for business overview (in real implementation, this would query actual data)
-    current_revenue = round(np.random.normal(50000, 10000), 2)
-    previous_revenue = round(np.random.normal(45000, 8000), 2)
-    revenue_trend = round(((current_revenue - previous_revenue) / previous_revenue) * 100, 2)
-    
-    current_orders = np.random.randint(100, 500)
-    previous_orders = np.random.randint(80, 450)
-    orders_trend = round(((current_orders - previous_orders) / previous_orders) * 100, 2)
-    
-    current_customers = np.random.randint(50, 200)
-    previous_customers = np.random.randint(40, 180)
-    customers_trend = round(((current_customers - previous_customers) / previous_customers) * 100, 2)
-    
-    current_products = np.random.randint(20, 100)
-    previous_products = np.random.randint(18, 95)
-    products_trend = round(((current_products - previous_products) / previous_products) * 100, 2)
-    
-    # Sales trend data for chart
-    dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    sales_values = np.random.normal(1000, 200, size=len(dates))
+    return await result_cache.get_or_compute_async(
+        ("overview", timeframe), lambda: compute_business_overview(db, timeframe)
+    )
+
+async def compute_business_overview(db: AsyncSession, timeframe: str) -> Dict[str, Any]:
+    """Compute the business overview for a timeframe.
+
+    Each metric is the sum of the analytics data points of its data type
+    (see OVERVIEW_METRICS). When the hot window holds both periods they are
+    summed from it. Otherwise current and previous period totals come from a
+    single pass over the hourly rollup using conditional aggregation, and
+    the daily revenue trend is gap-filled in the database.
+    """
+    period = TIMEFRAMES.get(timeframe, TIMEFRAMES["month"])
+    # Periods end at the next full hour so they map onto whole rollup buckets
+    end_date = truncate(datetime.utcnow(), "hour") + timedelta(hours=1)
+    start_date = end_date - period
+    previous_start = start_date - period
+
+    windowed = await run_in_threadpool(overview_from_hot_window, start_date, end_date, previous_start)
+    if windowed is not None:
+        row, trend_rows = windowed
+    else:
+        row, trend_rows = await overview_from_rollup(db, start_date, end_date, previous_start)
     sales_trend_data = [
-        {"date": d.strftime("%Y-%m-%d"), "value": round(v, 2)}
-        for d, v in zip(dates, sales_values)
+        {"date": day.strftime("%Y-%m-%d"), "value": round(value, 2)}
+        for day, value in trend_rows
     ]
+
+    overview = {
+        metric: {
+            "current": round(row[f"{metric}_current"], 2),
+            "trend": percent_change(row[f"{metric}_current"], row[f"{metric}_previous"])
+        }
+        for metric in OVERVIEW_METRICS
+    }
+    overview["revenue"]["currency"] = OVERVIEW_CURRENCY
     
     return {
-        "revenue": {
-            "current": current_revenue,
-            "trend": revenue_trend,
-            "currency": "UAH"
-        },
-        "orders": {
-            "current": current_orders,
-            "trend": orders_trend
-        },
-        "customers": {
-            "current": current_customers,
-            "trend": customers_trend
-        },
-        "products": {
-            "current": current_products,
-            "trend": products_trend
-        },
+        **overview,
         "sales_trend": sales_trend_data,
         "timeframe": timeframe,
         "period": {
@@ -356,50 +1734,161 @@ def get_business_overview(
         }
     }
 
+def overview_from_hot_window(start_date: datetime, end_date: datetime, previous_start: datetime) -> Optional[tuple]:
+    """(period totals by "<metric>_current"/"<metric>_previous", daily revenue trend rows) from hourly sums
+    of the hot window, or None when it does not hold the previous period."""
+    if hot_window is None:
+        return None
+    totals, trend = {}, {}
+    for metric, data_type in OVERVIEW_METRICS.items():
+        hourly = hot_window.aggregate("hour", ["sum"], previous_start, end_date, data_type=data_type)
+        if hourly is None:
+            return None
+        totals[f"{metric}_current"] = totals[f"{metric}_previous"] = 0
+        for bucket_start, value in zip(hourly["timestamps"], hourly["values"]["sum"]):
+            if value is None:
+                continue
+            current = bucket_start >= start_date
+            totals[f"{metric}_{'current' if current else 'previous'}"] += value
+            if current and metric == "revenue":
+                day = truncate(bucket_start, "day")
+                trend[day] = trend.get(day, 0) + value
+    days = []
+    day = truncate(start_date, "day")
+    while day <= truncate(end_date - timedelta(hours=1), "day"):
+        days.append((day, trend.get(day, 0)))
+        day += timedelta(days=1)
+    return totals, days
+
+async def overview_from_rollup(db: AsyncSession, start_date: datetime, end_date: datetime, previous_start: datetime) -> tuple:
+    """(period totals row, daily revenue trend rows) of the business overview from the hourly rollup"""
+    rollup = AnalyticsRollupHourly
+    totals = []
+    for metric, data_type in OVERVIEW_METRICS.items():
+        is_metric = rollup.data_type == data_type
+        totals.append(func.coalesce(
+            func.sum(rollup.sum).filter(and_(is_metric, rollup.bucket >= start_date)), 0
+        ).label(f"{metric}_current"))
+        totals.append(func.coalesce(
+            func.sum(rollup.sum).filter(and_(is_metric, rollup.bucket < start_date)), 0
+        ).label(f"{metric}_previous"))
+    row = (await db.execute(
+        select(*totals).where(
+            rollup.data_type.in_(set(OVERVIEW_METRICS.values())),
+            rollup.bucket >= previous_start,
+            rollup.bucket < end_date
+        )
+    )).one()._mapping
+
+    # Days are summed in one range scan of the (data_type, bucket) index, then
+    # joined to the series on equality so days without data read as 0
+    trend_query = text(f"""
+        WITH daily AS (
+            SELECT date_trunc('day', bucket) AS day, sum(sum) AS value
+            FROM {rollup.__tablename__}
+            WHERE data_type = :data_type AND bucket >= :start AND bucket < :end
+            GROUP BY 1
+        )
+        SELECT series.day, COALESCE(daily.value, 0) AS value
+        FROM generate_series(date_trunc('day', :start), date_trunc('day', :end - interval '1 hour'),
+                             interval '1 day') AS series(day)
+        LEFT JOIN daily ON daily.day = series.day
+        ORDER BY series.day
+    """).bindparams(
+        bindparam("start", start_date, type_=DateTime),
+        bindparam("end", end_date, type_=DateTime),
+        bindparam("data_type", OVERVIEW_METRICS["revenue"], type_=String)
+    )
+    trend_rows = (await db.execute(trend_query)).all()
+    return row, trend_rows
+
 # Dashboard endpoint
 @app.get("/api/dashboard", response_model=DashboardData)
-def get_dashboard_data(
+async def get_dashboard_data(
+    request: Request,
+    response: Response,
     period: str = Query("month", description="Period for dashboard data: day, week, month, year"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # Get KPIs
-    kpis = db.query(KPI).all()
-    
-    # Calculate date range based on period
-    end_date = datetime.utcnow()
-    if period == "day":
-        start_date = end_date - timedelta(days=1)
-    elif period == "week":
-        start_date = end_date - timedelta(weeks=1)
-    elif period == "year":
-        start_date = end_date - timedelta(days=365)
-    else:  # Default to month
-        start_date = end_date - timedelta(days=30)
-    
-    # Mock data for sales trend
-    dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    sales_values = np.random.normal(1000, 200, size=len(dates))
+    count, last_updated = await kpis_version(db)
+    last_ingested = hot_window.max_timestamp() if hot_window is not None else None
+    if last_ingested is None:
+        last_ingested = (await db.execute(select(func.max(AnalyticsData.timestamp)))).scalar()
+    # The dashboard covers whole days up to today, so it also changes at midnight
+    today = truncate(datetime.utcnow(), "day")
+    version = (period, today, count, last_updated, last_ingested)
+    headers = version_headers("dashboard", *version, last_modified=latest(last_updated, last_ingested))
+    if not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return await result_cache.get_or_compute_async(
+        ("dashboard", *version), lambda: compute_dashboard_data(db, period, today)
+    )
+
+def month_starts(last: datetime, count: int) -> List[datetime]:
+    """First days of the ``count`` months ending with the month of ``last``"""
+    months = []
+    for index in range(last.year * 12 + last.month - count, last.year * 12 + last.month):
+        year, month = divmod(index, 12)
+        months.append(datetime(year, month + 1, 1))
+    return months
+
+async def compute_dashboard_data(db: AsyncSession, period: str, today: datetime) -> Dict[str, Any]:
+    """Compute the dashboard from the KPIs and the daily rollup.
+
+    The sales trend is the daily revenue of the period ending with
+    ``today``, the top products are the values of the
+    DASHBOARD_PRODUCT_DIMENSION dimension with the most revenue in it, and
+    customer growth is the running total of the customers data points over
+    the last DASHBOARD_GROWTH_MONTHS months.
+    """
+    kpis = [KPIResponse.from_orm(kpi) for kpi in (await db.execute(select(KPI))).scalars().all()]
+
+    rollup = AnalyticsRollupDaily
+    end_date = today + timedelta(days=1)
+    start_date = end_date - TIMEFRAMES.get(period, TIMEFRAMES["month"])
+    in_period = and_(
+        rollup.data_type == OVERVIEW_METRICS["revenue"], rollup.bucket >= start_date, rollup.bucket < end_date
+    )
+
+    daily = dict((await db.execute(
+        select(rollup.bucket, func.sum(rollup.sum)).where(in_period).group_by(rollup.bucket)
+    )).all())
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days)]
     sales_trend = {
-        "dates": [d.strftime("%Y-%m-%d") for d in dates],
-        "values": [round(v, 2) for v in sales_values]
+        "dates": [day.strftime("%Y-%m-%d") for day in days],
+        "values": [round(daily.get(day, 0), 2) for day in days]
     }
-    
-    # Mock data for top products
-    product_names = ["Product A", "Product B", "Product C", "Product D", "Product E"]
-    product_values = sorted(np.random.normal(500, 100, size=5), reverse=True)
+
+    product_revenue = func.sum(rollup.sum).label("revenue")
+    products = (await db.execute(
+        select(rollup.dimension_value, product_revenue)
+        .where(in_period, rollup.dimension == DASHBOARD_PRODUCT_DIMENSION)
+        .group_by(rollup.dimension_value)
+        .order_by(product_revenue.desc(), rollup.dimension_value)
+        .limit(DASHBOARD_TOP_PRODUCTS)
+    )).all()
     top_products = {
-        "names": product_names,
-        "values": [round(v, 2) for v in product_values]
+        "names": [name for name, _ in products],
+        "values": [round(value, 2) for _, value in products]
     }
-    
-    # Mock data for customer growth
-    months = pd.date_range(start=end_date - timedelta(days=180), end=end_date, freq='M')
-    customer_counts = np.cumsum(np.random.randint(5, 20, size=len(months)))
+
+    months = month_starts(today, DASHBOARD_GROWTH_MONTHS)
+    month = func.date_trunc("month", rollup.bucket)
+    monthly = dict((await db.execute(
+        select(month, func.sum(rollup.sum))
+        .where(rollup.data_type == OVERVIEW_METRICS["customers"], rollup.bucket >= months[0], rollup.bucket < end_date)
+        .group_by(month)
+    )).all())
+    counts, total = [], 0
+    for first_day in months:
+        total += monthly.get(first_day, 0)
+        counts.append(int(round(total)))
     customer_growth = {
-        "months": [m.strftime("%Y-%m") for m in months],
-        "counts": [int(c) for c in customer_counts]
+        "months": [first_day.strftime("%Y-%m") for first_day in months],
+        "counts": counts
     }
-    
+
     return {
         "kpis": kpis,
         "sales_trend": sales_trend,
@@ -407,6 +1896,210 @@ def get_dashboard_data(
         "customer_growth": customer_growth
     }
 
+# Chart endpoints
+chart_pool: Optional[ProcessPoolExecutor] = None
+
+def get_chart_pool() -> ProcessPoolExecutor:
+    """Process pool rendering charts, started on the first chart request.
+
+    Workers are spawned rather than forked so they do not inherit the event
+    loop, threads or database connections of the server process, and they
+    import matplotlib and seaborn once when they start.
+    """
+    global chart_pool
+    if chart_pool is None:
+        chart_pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=warm_up
+        )
+    return chart_pool
+
+async def render_chart_async(kind: str, data: Dict[str, Any], fmt: str, options: Dict[str, Any]) -> bytes:
+    global chart_pool
+    pool = get_chart_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, render_chart, kind, data, fmt, options)
+    except BrokenProcessPool:
+        # A worker died, start a fresh pool for the next request
+        if chart_pool is pool:
+            chart_pool = None
+        logger.error("Chart rendering process pool is broken")
+        raise HTTPException(status_code=500, detail="Error rendering chart")
+    except Exception as e:
+        logger.error(f"Error rendering chart: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error rendering chart: {str(e)}")
+
+async def chart_response(
+    request: Request, kind: str, data: Dict[str, Any], fmt: str, options: Dict[str, Any]
+) -> Response:
+    """Render a chart, or serve it from the image cache, with the data hash as ETag."""
+    digest = chart_digest(kind, data, fmt, options)
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    image = await chart_cache.get_or_compute_async(
+        ("chart", digest), lambda: render_chart_async(kind, data, fmt, options)
+    )
+    return Response(content=image, media_type=CHART_MEDIA_TYPES[fmt], headers=headers)
+
+def chart_options(width: int, height: int, title: Optional[str], ylabel: Optional[str] = None) -> Dict[str, Any]:
+    return {"width": width, "height": height, "title": title, "ylabel": ylabel}
+
+def check_chart_points(count: int):
+    if count > CHART_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Chart would have {count} points, at most {CHART_MAX_POINTS} are allowed; narrow the range or use a coarser bucket"
+        )
+
+CHART_FORMAT = Query("png", regex="^(png|svg)$", description="Image format: png, svg")
+CHART_AGGREGATE = Query("sum", regex="^(sum|avg|min|max|count)$", description="Aggregate: sum, avg, min, max, count")
+
+@app.get("/api/charts/timeseries")
+async def get_time_series_chart(
+    request: Request,
+    bucket: str = Query("day", regex="^(minute|hour|day|week|month)$", description="Time bucket: minute, hour, day, week, month"),
+    aggregate: str = CHART_AGGREGATE,
+    source: Optional[str] = None,
+    data_type: Optional[str] = None,
+    dimension: Optional[str] = Query(None, description="Draw one line per value of this dimension"),
+    start_date: Optional[datetime] = Query(None, description="Inclusive start of the range"),
+    end_date: Optional[datetime] = Query(None, description="Exclusive end of the range"),
+    format: str = CHART_FORMAT,
+    width: int = Query(800, ge=200, le=2000),
+    height: int = Query(400, ge=150, le=2000),
+    title: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Line chart of analytics data aggregated into time buckets, as in /api/analytics/aggregate."""
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    time_column, dimension_column, value_columns, conditions = aggregate_source(
+        bucket, [aggregate], source, data_type, dimension, start_date, end_date
+    )
+    bucket_column = func.date_trunc(bucket, time_column).label("bucket")
+    group_columns = [dimension_column.label("dimension_value"), bucket_column] if dimension else [bucket_column]
+    stmt = select(*group_columns, *value_columns).where(*conditions).group_by(*group_columns).order_by(*group_columns)
+    rows = (await db.execute(stmt)).all()
+    check_chart_points(len(rows))
+
+    series: Dict[Optional[str], Dict[str, list]] = {}
+    for row in rows:
+        line = series.setdefault(row.dimension_value if dimension else None, {"x": [], "y": []})
+        line["x"].append(row.bucket.isoformat())
+        line["y"].append(row[-1])
+    data = {"series": [{"label": label, **line} for label, line in series.items()]}
+    return await chart_response(request, "line", data, format, chart_options(width, height, title, aggregate))
+
+@app.get("/api/charts/top")
+async def get_top_chart(
+    request: Request,
+    dimension: str = Query(..., description="Dimension whose values are ranked"),
+    aggregate: str = CHART_AGGREGATE,
+    source: Optional[str] = None,
+    data_type: Optional[str] = None,
+    start_date: Optional[datetime] = Query(None, description="Inclusive start of the range"),
+    end_date: Optional[datetime] = Query(None, description="Exclusive end of the range"),
+    limit: int = Query(10, ge=1, le=50, description="Number of bars"),
+    format: str = CHART_FORMAT,
+    width: int = Query(800, ge=200, le=2000),
+    height: int = Query(400, ge=150, le=2000),
+    title: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Bar chart of the top dimension values by an aggregate of their analytics data."""
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    # Day buckets are readable from every rollup, so the coarsest aligned one is used
+    _, dimension_column, value_columns, conditions = aggregate_source(
+        "day", [aggregate], source, data_type, dimension, start_date, end_date
+    )
+    value_column = value_columns[0]
+    stmt = (
+        select(dimension_column.label("dimension_value"), value_column)
+        .where(*conditions)
+        .group_by(dimension_column)
+        .order_by(value_column.desc().nulls_last())
+        .limit(limit)
+    )
+    rows = (await db.execute(stmt)).all()
+    data = {"labels": [row.dimension_value for row in rows], "values": [row[1] for row in rows]}
+    return await chart_response(request, "bar", data, format, chart_options(width, height, title, aggregate))
+
+@app.get("/api/charts/kpis/{kpi_id}/gauge")
+async def get_kpi_gauge_chart(
+    kpi_id: uuid.UUID,
+    request: Request,
+    format: str = CHART_FORMAT,
+    width: int = Query(400, ge=200, le=2000),
+    height: int = Query(260, ge=150, le=2000),
+    title: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Gauge of a KPI's current value against its target."""
+    db_kpi = await db.get(KPI, kpi_id)
+    if not db_kpi:
+        raise HTTPException(status_code=404, detail="KPI not found")
+    data = {"value": db_kpi.current_value, "target": db_kpi.target_value, "unit": db_kpi.unit}
+    options = chart_options(width, height, title if title is not None else db_kpi.name)
+    return await chart_response(request, "gauge", data, format, options)
+
+@app.get("/api/charts/reports/{report_id}")
+async def get_report_chart(
+    report_id: uuid.UUID,
+    request: Request,
+    kind: str = Query("line", regex="^(line|bar)$", description="Chart type: line, bar"),
+    x: Optional[str] = Query(None, description="Column on the x axis (bar labels), defaults to the first column"),
+    y: Optional[str] = Query(None, description="Numeric column to plot, defaults to the second column"),
+    format: str = CHART_FORMAT,
+    width: int = Query(800, ge=200, le=2000),
+    height: int = Query(400, ge=150, le=2000),
+    title: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Chart of a report's result, reusing a fresh result like /api/reports/{id}/run.
+
+    Report parameters are passed as query string arguments.
+    """
+    db_report = await db.get(Report, report_id)
+    if not db_report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    chart_arguments = {"kind", "x", "y", "format", "width", "height", "title"}
+    values = {key: value for key, value in request.query_params.items() if key not in chart_arguments}
+    parameters = report_run_parameters(db_report, values)
+    name = db_report.name
+    result, _ = await load_report_result(db, db_report, parameters)
+
+    columns = result["columns"]
+    x = x or (columns[0] if columns else None)
+    y = y or (columns[1] if len(columns) > 1 else None)
+    for column in (x, y):
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"Report has no column {column}; columns: {', '.join(columns)}")
+    check_chart_points(result["row_count"])
+    x_index, y_index = columns.index(x), columns.index(y)
+    x_values = [row[x_index] for row in result["rows"]]
+    y_values = [row[y_index] for row in result["rows"]]
+    if any(value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))) for value in y_values):
+        raise HTTPException(status_code=400, detail=f"Column {y} is not numeric")
+
+    if kind == "bar":
+        data = {"labels": x_values, "values": y_values}
+    else:
+        data = {"series": [{"label": y, "x": x_values, "y": y_values}]}
+    options = chart_options(width, height, title if title is not None else name, y)
+    return await chart_response(request, kind, data, format, options)
+
+@app.on_event("shutdown")
+def shutdown_chart_pool():
+    if chart_pool is not None:
+        chart_pool.shutdown(wait=False, cancel_futures=True)
+
+# Cache statistics endpoint
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    stats = {**result_cache.stats(), "charts": chart_cache.stats()}
+    if hot_window is not None:
+        stats["hot_window"] = hot_window.stats()
+    return {**stats, "timestamp": datetime.utcnow().isoformat()}
+
 # Run the application
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8006"))
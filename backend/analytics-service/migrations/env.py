@@ -1,5 +1,7 @@
 """
 Alembic environment configuration for database migrations
+The only place the schema is created or changed: run `alembic upgrade head`
+before starting the service.
 """
 
 from logging.config import fileConfig
@@ -72,9 +74,6 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
-        # Create schema if it doesn't exist
-        connection.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
-        
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
@@ -83,6 +82,8 @@ def run_migrations_online():
         )
 
         with context.begin_transaction():
+            # Create schema if it doesn't exist
+            context.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
             context.run_migrations()
 
 
@@ -0,0 +1,63 @@
+"""KPI and report tables of the service
+
+The service used to create these with Base.metadata.create_all on import.
+They are created here, if missing, so a new database is built by Alembic
+alone; databases created the old way are left as they are. Tables created
+here are marked with a comment, and downgrade drops only those.
+
+Revision ID: 20251017000000
+Revises: 20250528000001
+Create Date: 2025-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20251017000000'
+down_revision = '20250528000001'
+branch_labels = None
+depends_on = None
+
+TABLES = ('kpis', 'reports')
+CREATED_BY = f'Created by revision {revision}'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('kpis'):
+        op.create_table('kpis',
+            sa.Column('id', postgresql.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('current_value', sa.Float(), nullable=True),
+            sa.Column('target_value', sa.Float(), nullable=True),
+            sa.Column('unit', sa.String(), nullable=True),
+            sa.Column('last_updated', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name'),
+            comment=CREATED_BY
+        )
+
+    if not inspector.has_table('reports'):
+        op.create_table('reports',
+            sa.Column('id', postgresql.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('query', sa.String(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('schedule', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            comment=CREATED_BY
+        )
+
+
+def downgrade():
+    # Tables that existed before this revision stay
+    inspector = sa.inspect(op.get_bind())
+    for table in reversed(TABLES):
+        if inspector.has_table(table) and inspector.get_table_comment(table).get('text') == CREATED_BY:
+            op.drop_table(table)
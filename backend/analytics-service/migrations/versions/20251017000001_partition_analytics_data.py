@@ -0,0 +1,93 @@
+"""Partition analytics_data by month and add composite indexes
+
+Revision ID: 20251017000001
+Revises: 20251017000000
+Create Date: 2025-10-17 00:00:01.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database.partitions import create_default_partition, create_partitions, month_start
+
+# revision identifiers, used by Alembic.
+revision = '20251017000001'
+down_revision = '20251017000000'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, source, data_type, "timestamp", value, dimension, dimension_value'
+
+
+def create_indexes():
+    op.create_index('ix_analytics_data_source_type_ts', 'analytics_data',
+                    ['source', 'data_type', 'timestamp'], unique=False)
+    op.create_index('ix_analytics_data_dimension_ts', 'analytics_data',
+                    ['dimension', 'dimension_value', 'timestamp'], unique=False)
+    op.create_index('ix_analytics_data_ts_id', 'analytics_data',
+                    ['timestamp', 'id'], unique=False)
+
+
+def upgrade():
+    connection = op.get_bind()
+    exists = sa.inspect(connection).has_table('analytics_data')
+
+    # Partitioned tables need the partition key in the primary key
+    op.execute("""
+        CREATE TABLE analytics_data_partitioned (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            source varchar NOT NULL,
+            data_type varchar NOT NULL,
+            "timestamp" timestamp NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            value double precision,
+            dimension varchar,
+            dimension_value varchar,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+
+    first_month = None
+    if exists:
+        oldest = connection.execute(sa.text('SELECT min("timestamp") FROM analytics_data')).scalar()
+        first_month = month_start(oldest.date()) if oldest else None
+    create_partitions(connection, 'analytics_data_partitioned', start=first_month, months_ahead=3)
+    create_default_partition(connection, 'analytics_data_partitioned')
+
+    if exists:
+        op.execute(f"""
+            INSERT INTO analytics_data_partitioned ({COLUMNS})
+            SELECT id, source, data_type, COALESCE("timestamp", now() AT TIME ZONE 'utc'),
+                   value, dimension, dimension_value
+            FROM analytics_data
+        """)
+        op.drop_table('analytics_data')
+
+    # Partition names are derived from the parent name, so rename them too
+    for (name,) in connection.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'analytics_data_partitioned'::regclass"
+    )).all():
+        op.rename_table(name, name.replace('analytics_data_partitioned', 'analytics_data', 1))
+    op.rename_table('analytics_data_partitioned', 'analytics_data')
+    op.execute('ALTER TABLE analytics_data RENAME CONSTRAINT analytics_data_partitioned_pkey TO analytics_data_pkey')
+
+    # Indexes on the parent are created on every existing and future partition
+    create_indexes()
+
+
+def downgrade():
+    op.execute("""
+        CREATE TABLE analytics_data_plain (
+            id uuid NOT NULL DEFAULT gen_random_uuid() PRIMARY KEY,
+            source varchar NOT NULL,
+            data_type varchar NOT NULL,
+            "timestamp" timestamp,
+            value double precision,
+            dimension varchar,
+            dimension_value varchar
+        )
+    """)
+    op.execute(f"INSERT INTO analytics_data_plain ({COLUMNS}) SELECT {COLUMNS} FROM analytics_data")
+    op.drop_table('analytics_data')
+    op.rename_table('analytics_data_plain', 'analytics_data')
+    op.execute('ALTER TABLE analytics_data RENAME CONSTRAINT analytics_data_plain_pkey TO analytics_data_pkey')
@@ -0,0 +1,42 @@
+"""Hourly and daily rollups of analytics_data
+
+Revision ID: 20251017000002
+Revises: 20251017000001
+Create Date: 2025-10-17 00:00:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database.rollups import rebuild
+
+# revision identifiers, used by Alembic.
+revision = '20251017000002'
+down_revision = '20251017000001'
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = (('analytics_rollup_hourly', 'hour'), ('analytics_rollup_daily', 'day'))
+
+
+def upgrade():
+    for table, unit in ROLLUP_TABLES:
+        op.create_table(table,
+            sa.Column('source', sa.String(), nullable=False),
+            sa.Column('data_type', sa.String(), nullable=False),
+            sa.Column('dimension', sa.String(), server_default='', nullable=False),
+            sa.Column('dimension_value', sa.String(), server_default='', nullable=False),
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('sum', sa.Float(), nullable=False),
+            sa.Column('count', sa.BigInteger(), nullable=False),
+            sa.Column('min', sa.Float(), nullable=False),
+            sa.Column('max', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('source', 'data_type', 'dimension', 'dimension_value', 'bucket')
+        )
+        # Backfill from the raw points already stored
+        rebuild(op.get_bind(), table, unit)
+
+
+def downgrade():
+    for table, _ in reversed(ROLLUP_TABLES):
+        op.drop_table(table)
@@ -0,0 +1,40 @@
+"""Report executions for reports run asynchronously
+
+Revision ID: 20251017000003
+Revises: 20251017000002
+Create Date: 2025-10-17 00:00:03.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20251017000003'
+down_revision = '20251017000002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_executions',
+        sa.Column('id', postgresql.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('report_id', postgresql.UUID(), nullable=False),
+        sa.Column('parameters', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('executed_by', postgresql.UUID(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_report_executions_report_id'), 'report_executions', ['report_id'], unique=False)
+    op.create_index(op.f('ix_report_executions_status'), 'report_executions', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_report_executions_status'), table_name='report_executions')
+    op.drop_index(op.f('ix_report_executions_report_id'), table_name='report_executions')
+    op.drop_table('report_executions')
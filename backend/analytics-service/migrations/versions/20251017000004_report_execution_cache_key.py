@@ -0,0 +1,26 @@
+"""Cache key for reusing report execution results
+
+Revision ID: 20251017000004
+Revises: 20251017000003
+Create Date: 2025-10-17 00:00:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251017000004'
+down_revision = '20251017000003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('report_executions', sa.Column('cache_key', sa.String(length=64), nullable=True))
+    op.create_index('ix_report_executions_cache_key_completed_at', 'report_executions',
+                    ['cache_key', 'completed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_report_executions_cache_key_completed_at', table_name='report_executions')
+    op.drop_column('report_executions', 'cache_key')
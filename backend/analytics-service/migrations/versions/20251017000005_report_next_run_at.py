@@ -0,0 +1,26 @@
+"""Next run time of scheduled reports
+
+Revision ID: 20251017000005
+Revises: 20251017000004
+Create Date: 2025-10-17 00:00:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251017000005'
+down_revision = '20251017000004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left NULL for existing reports, the scheduler fills it in on its first pass
+    op.add_column('reports', sa.Column('next_run_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_reports_next_run_at', 'reports', ['next_run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reports_next_run_at', table_name='reports')
+    op.drop_column('reports', 'next_run_at')
@@ -0,0 +1,24 @@
+"""Bind parameter declarations of reports
+
+Revision ID: 20251017000006
+Revises: 20251017000005
+Create Date: 2025-10-17 00:00:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20251017000006'
+down_revision = '20251017000005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('reports', sa.Column('parameters', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('reports', 'parameters')
@@ -0,0 +1,43 @@
+"""KPI categories, calculation queries and value history
+
+Revision ID: 20251017000007
+Revises: 20251017000006
+Create Date: 2025-10-17 00:00:07.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20251017000007'
+down_revision = '20251017000006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # kpi_metrics is folded into kpis, kpi_values references kpis
+    op.add_column('kpis', sa.Column('category', sa.String(length=50), nullable=True))
+    op.add_column('kpis', sa.Column('calculation_query', sa.Text(), nullable=True))
+    op.create_index(op.f('ix_kpis_category'), 'kpis', ['category'], unique=False)
+
+    op.create_table('kpi_values',
+        sa.Column('id', postgresql.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('metric_id', postgresql.UUID(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['metric_id'], ['kpis.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_kpi_values_metric_id_period_start', 'kpi_values', ['metric_id', 'period_start'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_kpi_values_metric_id_period_start', table_name='kpi_values')
+    op.drop_table('kpi_values')
+    op.drop_index(op.f('ix_kpis_category'), table_name='kpis')
+    op.drop_column('kpis', 'calculation_query')
+    op.drop_column('kpis', 'category')
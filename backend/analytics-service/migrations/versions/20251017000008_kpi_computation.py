@@ -0,0 +1,34 @@
+"""Refresh schedule of computed KPIs, one value per KPI and period
+
+Revision ID: 20251017000008
+Revises: 20251017000007
+Create Date: 2025-10-17 00:00:08.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251017000008'
+down_revision = '20251017000007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('kpis', sa.Column('refresh_interval', sa.Integer(), nullable=True))
+    # Left NULL, KPIs with a calculation query are computed on the engine's first pass
+    op.add_column('kpis', sa.Column('next_compute_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_kpis_next_compute_at', 'kpis', ['next_compute_at'], unique=False)
+
+    # Computed values are upserted by (metric_id, period_start)
+    op.drop_index('ix_kpi_values_metric_id_period_start', table_name='kpi_values')
+    op.create_index('ix_kpi_values_metric_id_period_start', 'kpi_values', ['metric_id', 'period_start'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_kpi_values_metric_id_period_start', table_name='kpi_values')
+    op.create_index('ix_kpi_values_metric_id_period_start', 'kpi_values', ['metric_id', 'period_start'], unique=False)
+    op.drop_index('ix_kpis_next_compute_at', table_name='kpis')
+    op.drop_column('kpis', 'next_compute_at')
+    op.drop_column('kpis', 'refresh_interval')
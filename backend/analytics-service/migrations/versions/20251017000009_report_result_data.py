@@ -0,0 +1,34 @@
+"""Compressed payload of large report results, shared by all replicas
+
+Revision ID: 20251017000009
+Revises: 20251017000008
+Create Date: 2025-10-17 00:00:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251017000009'
+down_revision = '20251017000008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('report_executions', sa.Column('result_data', sa.LargeBinary(), nullable=True))
+    # Results written to a replica's local disk are not migrated, they read as expired
+    op.execute("""
+        UPDATE report_executions
+        SET result = result - 'path' || '{"storage": "compressed"}'::jsonb
+        WHERE result->>'storage' = 'file'
+    """)
+
+
+def downgrade():
+    op.execute("""
+        UPDATE report_executions
+        SET result = '{"error": "Result removed by a schema downgrade"}'::jsonb, status = 'failed'
+        WHERE result->>'storage' = 'compressed'
+    """)
+    op.drop_column('report_executions', 'result_data')
@@ -0,0 +1,26 @@
+"""Index rollups by data type and bucket
+
+Revision ID: 20251017000010
+Revises: 20251017000009
+Create Date: 2025-10-17 00:00:10.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20251017000010'
+down_revision = '20251017000009'
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ('analytics_rollup_hourly', 'analytics_rollup_daily')
+
+
+def upgrade():
+    for table in ROLLUP_TABLES:
+        op.create_index(f'ix_{table}_data_type_bucket', table, ['data_type', 'bucket'], unique=False)
+
+
+def downgrade():
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_index(f'ix_{table}_data_type_bucket', table_name=table)
@@ -0,0 +1,91 @@
+"""
+Tests for bulk ingestion: record parsing and isolating the rows the database refuses
+"""
+
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import main
+
+
+def test_parse_bulk_record_accepts_objects_and_ndjson_lines():
+    line = b'{"source": "web", "data_type": "revenue", "value": 2, "timestamp": "2025-01-01T12:00:00+02:00"}'
+
+    row = main.parse_bulk_record(line)
+    assert row["value"] == 2.0
+    assert row["timestamp"] == datetime(2025, 1, 1, 10, 0)
+    assert main.parse_bulk_record({"source": "web", "data_type": "revenue", "value": 1})["timestamp"] is not None
+
+
+def test_parse_bulk_record_rejects_invalid_records():
+    with pytest.raises(ValidationError) as error:
+        main.parse_bulk_record({"source": "web", "value": "nan"})
+    message = main.format_record_error(error.value)
+    assert message.startswith("data_type: field required; value: ")
+
+    with pytest.raises(ValueError) as error:
+        main.parse_bulk_record(b'{"source": ')
+    assert main.format_record_error(error.value)
+
+
+class FakeSession:
+    """Stands in for the async session; run_sync hands the rows to the patched writer"""
+
+    async def run_sync(self, fn, rows):
+        return fn(None, rows)
+
+
+@pytest.fixture
+def bulk(monkeypatch):
+    written = []
+
+    def ingest(db, rows):
+        if any(row["value"] < 0 for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("value is negative"))
+        if any(row["source"] == "offline" for row in rows):
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        written.append([row["value"] for row in rows])
+        return [uuid.uuid4() for _ in rows]
+
+    async def get_db():
+        yield FakeSession()
+
+    monkeypatch.setattr(main, "ingest_analytics_rows", ingest)
+    main.app.dependency_overrides[main.get_db] = get_db
+    yield TestClient(main.app), written
+    main.app.dependency_overrides.pop(main.get_db)
+
+
+def record(value, source="web"):
+    return {"source": source, "data_type": "revenue", "value": value,
+            "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()}
+
+
+def test_refused_rows_are_isolated_by_bisection(bulk):
+    client, written = bulk
+    records = [record(1), record(-1), record(2), record(3), {"source": "web"}, record(-2), record(4)]
+
+    result = client.post("/api/analytics/data/bulk?chunk_size=10", json=records).json()
+    assert result["received"] == 7 and result["inserted"] == 4 and result["failed"] == 3
+    assert [error["index"] for error in result["errors"]] == [1, 4, 5]
+    assert result["errors"][0]["error"].startswith("Database error: value is negative")
+    assert sorted(value for part in written for value in part) == [1.0, 2.0, 3.0, 4.0]
+    assert [row_id is None for row_id in result["ids"]] == [False, True, False, False, True, True, False]
+
+
+def test_transient_errors_fail_the_whole_chunk_without_bisecting(bulk):
+    client, written = bulk
+    body = "\n".join(json.dumps(record(value, "offline" if value == 2 else "web")) for value in range(1, 5))
+
+    result = client.post(
+        "/api/analytics/data/bulk?chunk_size=2", content=body, headers={"Content-Type": "application/x-ndjson"}
+    ).json()
+    assert written == [[3.0, 4.0]]
+    assert [error["index"] for error in result["errors"]] == [0, 1]
+    assert result["inserted"] == 2
@@ -0,0 +1,121 @@
+"""
+Tests for the TTL cache and its single-flight computation
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.cache import TTLCache
+
+
+def test_value_is_cached_until_invalidated():
+    cache = TTLCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute(("dashboard", "month"), compute) == 1
+    assert cache.get_or_compute(("dashboard", "month"), compute) == 1
+    cache.invalidate("overview")
+    assert cache.get_or_compute(("dashboard", "month"), compute) == 1
+    cache.invalidate("dashboard")
+    assert cache.get_or_compute(("dashboard", "month"), compute) == 2
+    assert cache.stats()["hits"] == 2
+
+
+def test_expired_and_evicted_entries_are_recomputed():
+    cache = TTLCache(maxsize=1, ttl=0.01)
+
+    assert cache.get_or_compute(("a",), lambda: 1) == 1
+    time.sleep(0.02)
+    assert cache.get_or_compute(("a",), lambda: 2) == 2
+    cache.get_or_compute(("b",), lambda: 3)
+    assert cache.get_or_compute(("a",), lambda: 4) == 4
+    assert cache.stats()["evictions"] == 2
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute(("k",), compute)))
+    leader.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute(("k",), compute)))
+               for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join()
+
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+
+
+def test_value_computed_across_invalidation_is_not_stored():
+    cache = TTLCache()
+
+    def compute():
+        cache.invalidate("k")
+        return "stale"
+
+    assert cache.get_or_compute(("k",), compute) == "stale"
+    assert cache.get_or_compute(("k",), lambda: "fresh") == "fresh"
+
+
+def test_async_waiters_share_the_error_of_the_leader():
+    cache = TTLCache()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.get_or_compute_async(("k",), fail) for _ in range(3)), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert cache.stats()["misses"] == 1
+
+
+def test_async_waiter_computes_when_the_leader_is_cancelled():
+    cache = TTLCache()
+    calls = []
+
+    async def compute(tag):
+        calls.append(tag)
+        await asyncio.sleep(0.05)
+        return tag
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute_async(("k",), lambda: compute("leader")))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute_async(("k",), lambda: compute("waiter")))
+                   for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(run()) == ["waiter"] * 3
+    assert calls == ["leader", "waiter"]
@@ -0,0 +1,59 @@
+"""
+Tests for ETag and Last-Modified handling of conditional requests
+"""
+
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+from starlette.requests import Request
+
+from main import etag_matches, not_modified, version_headers
+
+UPDATED = datetime(2025, 4, 1, 8, 30, 15)
+
+
+def request(**headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_etag_follows_the_version():
+    headers = version_headers("kpis", "rows", 3, UPDATED, last_modified=UPDATED)
+
+    assert headers == version_headers("kpis", "rows", 3, UPDATED, last_modified=UPDATED)
+    assert headers["ETag"] != version_headers("kpis", "rows", 4, UPDATED)["ETag"]
+    assert headers["ETag"] != version_headers("reports", "rows", 3, UPDATED)["ETag"]
+    assert headers["Last-Modified"] == "Tue, 01 Apr 2025 08:30:15 GMT"
+    assert headers["Cache-Control"] == "no-cache"
+
+
+def test_last_modified_is_never_in_the_future():
+    headers = version_headers("kpis", last_modified=datetime.utcnow() + timedelta(days=1))
+
+    last_modified = parsedate_to_datetime(headers["Last-Modified"]).replace(tzinfo=None)
+    assert last_modified <= datetime.utcnow()
+    assert "Last-Modified" not in version_headers("kpis")
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard():
+    etag = '"abc"'
+
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    headers = version_headers("kpis", 1, last_modified=UPDATED)
+    since = headers["Last-Modified"]
+
+    assert not_modified(request(if_none_match=headers["ETag"]), headers)
+    assert not not_modified(request(if_none_match='"stale"', if_modified_since=since), headers)
+    assert not_modified(request(if_modified_since=since), headers)
+    assert not not_modified(request(if_modified_since="Tue, 01 Apr 2025 08:30:14 GMT"), headers)
+    assert not not_modified(request(if_modified_since="garbage"), headers)
+    assert not not_modified(request(), headers)
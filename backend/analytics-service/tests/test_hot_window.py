@@ -0,0 +1,112 @@
+"""
+Tests for the in-memory hot window of recent analytics data
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.hot_window import ROW_BYTES, HotWindow, group_aggregates, truncate_micros, to_micros
+
+# Noon yesterday, so the rows of a test never straddle a day boundary
+NOW = (datetime.utcnow() - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+SPAN = timedelta(days=30)
+
+
+def row(minutes_ago, value, source="web", data_type="revenue", dimension=None, dimension_value=None):
+    return {
+        "timestamp": NOW - timedelta(minutes=minutes_ago), "value": value, "source": source,
+        "data_type": data_type, "dimension": dimension, "dimension_value": dimension_value,
+    }
+
+
+def ready_window(rows=(), **options):
+    window = HotWindow(span=SPAN, max_bytes=options.pop("max_bytes", 1 << 20), **options)
+    start = window.begin_warm_up(NOW)
+    window.load([], start)
+    window.append(list(rows))
+    return window
+
+
+def test_window_answers_nothing_before_warm_up():
+    window = HotWindow(span=SPAN, max_bytes=1 << 20)
+    window.append([row(5, 1.0)])
+
+    assert window.aggregate("hour", ["sum"], NOW - timedelta(hours=1), None) is None
+    assert window.max_timestamp() is None
+
+
+def test_rows_ingested_during_warm_up_are_appended_once():
+    window = HotWindow(span=SPAN, max_bytes=1 << 20)
+    start = window.begin_warm_up(NOW)
+    window.append([row(1, 5.0)], ids=["new"])
+    loaded = [("old", NOW - timedelta(minutes=2), 1.0, "web", "revenue", None, None),
+              ("new", NOW - timedelta(minutes=1), 5.0, "web", "revenue", None, None)]
+    window.load([loaded], start)
+
+    result = window.aggregate("day", ["sum", "count"], NOW - timedelta(hours=1), None)
+    assert result["values"] == {"sum": [6.0], "count": [2]}
+
+
+def test_aggregate_by_bucket_with_filters():
+    window = ready_window([
+        row(10, 1.0), row(20, 3.0), row(20, 7.0, source="app"), row(30, 2.0, data_type="orders"),
+    ])
+    start = NOW - timedelta(hours=2)
+
+    result = window.aggregate("day", ["sum", "avg", "min", "max", "count"], start, None, data_type="revenue")
+    assert result["values"] == {"sum": [11.0], "avg": [11 / 3], "min": [1.0], "max": [7.0], "count": [3]}
+    assert window.aggregate("day", ["count"], start, None, source="app")["values"] == {"count": [1]}
+    assert window.aggregate("day", ["count"], start, None, source="unknown")["values"] == {"count": []}
+    hourly = window.aggregate("hour", ["count"], start, NOW - timedelta(minutes=15))
+    assert hourly["timestamps"] == [NOW - timedelta(hours=1)]
+    assert hourly["values"] == {"count": [3]}
+
+
+def test_aggregate_by_dimension_orders_null_last():
+    window = ready_window([
+        row(1, 1.0, dimension="region", dimension_value="south"),
+        row(2, 2.0, dimension="region", dimension_value="north"),
+        row(3, 4.0, dimension="region"),
+    ])
+
+    result = window.aggregate("day", ["sum"], NOW - timedelta(hours=1), None, dimension="region")
+    assert result["dimension_values"] == ["north", "south", None]
+    assert result["values"] == {"sum": [2.0, 1.0, 4.0]}
+
+
+def test_query_before_window_start_goes_to_the_database():
+    window = ready_window([row(1, 1.0)])
+
+    assert window.aggregate("day", ["sum"], NOW - 2 * SPAN, None) is None
+    assert window.max_timestamp() == NOW - timedelta(minutes=1)
+
+
+def test_evicting_a_chunk_moves_the_window_start():
+    window = ready_window(chunk_rows=2, max_bytes=4 * ROW_BYTES)
+    window.append([row(50, 1.0), row(40, 1.0)])
+    window.append([row(30, 1.0), row(20, 1.0)])
+    window.append([row(10, 1.0)])
+
+    assert window.stats()["evicted_chunks"] == 1
+    assert window.aggregate("day", ["count"], NOW - timedelta(minutes=45), None) is None
+    assert window.aggregate("hour", ["count"], NOW - timedelta(minutes=35), None)["values"] == {"count": [3]}
+
+
+def test_truncate_micros_weeks_start_on_monday():
+    sunday = datetime(2025, 10, 19, 15, 30)
+    truncated = truncate_micros(np.array([to_micros(sunday)], dtype=np.int64), "week")
+
+    assert truncated.astype(datetime).tolist() == [datetime(2025, 10, 13)]
+
+
+def test_group_aggregates_skip_nan_and_interpolate_percentiles():
+    values = np.array([1.0, 2.0, 3.0, 4.0, np.nan, np.nan])
+    groups = np.array([0, 0, 0, 0, 1, 0])
+
+    result = group_aggregates(["count", "sum", "p50", "p90", "min"], values, groups, 2)
+    assert result["count"] == [4, 0]
+    assert result["sum"] == [10.0, None]
+    assert result["p50"] == [2.5, None]
+    assert np.isclose(result["p90"][0], 3.7)
+    assert result["min"] == [1.0, None]
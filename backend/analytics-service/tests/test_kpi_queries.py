@@ -0,0 +1,70 @@
+"""
+Tests for KPI calculation query planning
+"""
+
+from datetime import datetime, timedelta
+
+from database.kpi_queries import KpiBatch, parse_simple_aggregate, period_bounds, plan_batches
+
+
+def test_simple_aggregates_are_parsed():
+    aggregate = parse_simple_aggregate("SELECT SUM(value) FROM analytics_data WHERE data_type = 'revenue';")
+
+    assert aggregate == ("sum", "value", "analytics_data", "data_type = 'revenue'")
+    assert parse_simple_aggregate("select count(*) from orders").condition is None
+
+
+def test_queries_that_cannot_be_merged_are_not_parsed():
+    for query in [
+        "SELECT sum(value) FROM analytics_data GROUP BY source",
+        "SELECT sum(value) FROM analytics_data a JOIN kpis k ON true",
+        "SELECT sum(value) FROM analytics_data -- comment",
+        "SELECT sum(value) + 1 FROM analytics_data",
+        "SELECT sum(value) FROM analytics_data WHERE (a = 1",
+    ]:
+        assert parse_simple_aggregate(query) is None, query
+
+
+def test_aggregates_over_one_table_are_merged():
+    queries = {
+        "revenue": "SELECT sum(value) FROM analytics_data WHERE data_type = 'revenue'",
+        "revenue_copy": "SELECT sum(value) FROM analytics_data WHERE data_type = 'revenue'",
+        "orders": "SELECT count(*) FROM analytics_data WHERE data_type = 'orders'",
+        "custom": "SELECT value FROM analytics_data ORDER BY timestamp DESC LIMIT 1",
+        "alone": "SELECT max(value) FROM other_table",
+    }
+
+    batches = plan_batches(queries)
+    assert KpiBatch(queries["custom"], {"custom": 0}) in batches
+    assert KpiBatch(queries["alone"], {"alone": 0}) in batches
+    merged, = [batch for batch in batches if len(batch.columns) > 1]
+    assert merged.columns == {"revenue": 0, "revenue_copy": 0, "orders": 1}
+    assert merged.sql == (
+        "SELECT sum(value) FILTER (WHERE data_type = 'revenue') AS kpi_0, "
+        "count(*) FILTER (WHERE data_type = 'orders') AS kpi_1 FROM analytics_data "
+        "WHERE (data_type = 'revenue') OR (data_type = 'orders')"
+    )
+
+
+def test_merged_queries_are_split_at_max_columns():
+    queries = {f"kpi{i}": f"SELECT sum(value) FROM analytics_data WHERE source = 's{i}'" for i in range(5)}
+
+    batches = plan_batches(queries, max_columns=2)
+    assert sorted(len(batch.columns) for batch in batches) == [1, 2, 2]
+
+
+def test_unconditional_aggregate_reads_every_row():
+    queries = {
+        "all": "SELECT count(*) FROM analytics_data",
+        "some": "SELECT count(*) FROM analytics_data WHERE source = 'web'",
+    }
+
+    batch, = plan_batches(queries)
+    assert " WHERE " not in batch.sql.split(" FROM ")[1]
+
+
+def test_period_bounds_are_aligned_to_the_epoch():
+    start, end = period_bounds(datetime(2025, 1, 1, 10, 7, 30), 300)
+
+    assert start == datetime(2025, 1, 1, 10, 5)
+    assert end - start == timedelta(seconds=300)
@@ -0,0 +1,33 @@
+"""
+Tests for the keyset pagination cursor
+"""
+
+import base64
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from main import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_its_position():
+    row_id = uuid.uuid4()
+    timestamp = datetime(2025, 3, 1, 12, 30, 15, 250000)
+
+    cursor = encode_cursor(timestamp, row_id)
+    assert decode_cursor(cursor) == (timestamp, row_id)
+    assert "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+    base64.urlsafe_b64encode(b'["2025-03-01T12:00:00", "not-a-uuid"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "00000000-0000-0000-0000-000000000000"]').decode(),
+])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,85 @@
+"""
+Tests for report query parameter declarations and coercion
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+from database.report_queries import (
+    coerce_parameters, prepare_statement, query_parameter_names, validate_declarations
+)
+
+QUERY = "SELECT * FROM analytics_data WHERE timestamp >= :since AND value::numeric > :min_value LIMIT :limit"
+
+
+def test_parameter_names_skip_casts():
+    assert query_parameter_names(QUERY) == ["since", "min_value", "limit"]
+    assert query_parameter_names("SELECT :a, :a, '1'::int") == ["a"]
+
+
+def test_declarations_are_normalized():
+    declarations = validate_declarations(QUERY, {
+        "since": {"type": "datetime"},
+        "min_value": {"type": "number", "default": 0},
+        "limit": {"type": "integer", "default": 100},
+    })
+
+    assert declarations["since"] == {"type": "datetime", "required": True, "default": None}
+    assert declarations["limit"] == {"type": "integer", "required": False, "default": 100}
+
+
+@pytest.mark.parametrize("declarations", [
+    {"since": {"type": "datetime"}, "min_value": {"type": "number"}},
+    {"since": {"type": "uuid"}, "min_value": {"type": "number"}, "limit": {"type": "integer"}},
+    {"since": {"type": "datetime"}, "min_value": {"type": "number"}, "limit": {"type": "integer", "default": "x"}},
+    {"bad-name": {"type": "string"}},
+])
+def test_invalid_declarations_are_refused(declarations):
+    with pytest.raises(ValueError):
+        validate_declarations(QUERY, declarations)
+
+
+def test_values_are_coerced_to_declared_types():
+    declarations = {
+        "since": {"type": "datetime", "required": True},
+        "day": {"type": "date", "required": False, "default": "2025-01-02"},
+        "limit": {"type": "integer", "required": False, "default": None},
+        "active": {"type": "boolean", "required": False, "default": None},
+        "ratio": {"type": "number", "required": False, "default": None},
+    }
+
+    coerced = coerce_parameters(declarations, {
+        "since": "2025-01-01T02:00:00+02:00", "limit": "10", "active": "yes", "ratio": "0.5",
+    })
+    assert coerced == {
+        "since": datetime(2025, 1, 1), "day": date(2025, 1, 2), "limit": 10, "active": True, "ratio": 0.5,
+    }
+
+
+@pytest.mark.parametrize("values, message", [
+    ({}, "Parameter since is required"),
+    ({"since": "2025-01-01", "other": 1}, "Unknown parameters: other"),
+    ({"since": "2025-01-01", "limit": 1.5}, "Parameter limit must be of type integer"),
+    ({"since": "2025-01-01", "limit": True}, "Parameter limit must be of type integer"),
+    ({"since": "yesterday"}, "Parameter since must be of type datetime"),
+])
+def test_invalid_values_are_refused(values, message):
+    declarations = {
+        "since": {"type": "datetime", "required": True},
+        "limit": {"type": "integer", "required": False, "default": None},
+    }
+    with pytest.raises(ValueError, match=message):
+        coerce_parameters(declarations, values)
+
+
+def test_prepared_statement_uses_positional_parameters():
+    declarations = {"since": {"type": "datetime"}, "min_value": {"type": "number"}, "limit": {"type": "integer"}}
+
+    name, sql, names = prepare_statement(QUERY + " -- 5%", declarations)
+    assert names == ["since", "min_value", "limit"]
+    assert sql == (
+        f"PREPARE {name} (timestamp, double precision, integer) AS SELECT * FROM analytics_data "
+        "WHERE timestamp >= $1 AND value::numeric > $2 LIMIT $3 -- 5%%"
+    )
+    assert prepare_statement(QUERY + " -- 5%", declarations)[0] == name
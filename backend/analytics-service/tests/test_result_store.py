@@ -0,0 +1,43 @@
+"""
+Tests for report result storage
+"""
+
+import pytest
+
+from utils.result_store import ResultExpired, ResultStore, report_cache_key
+
+
+def test_small_result_is_inline():
+    store = ResultStore(inline_max_bytes=1024)
+    result = {"columns": ["x"], "rows": [[1]], "row_count": 1}
+
+    stored, data = store.save(result)
+
+    assert stored == result and data is None
+    assert store.load(stored, data) == result
+
+
+def test_large_result_is_compressed():
+    store = ResultStore(inline_max_bytes=100)
+    result = {"columns": ["x"], "rows": [[i] for i in range(1000)], "row_count": 1000}
+
+    stored, data = store.save(result)
+
+    assert stored["storage"] == "compressed" and stored["row_count"] == 1000
+    assert stored["compressed_bytes"] == len(data) < stored["bytes"]
+    assert store.load(stored, data) == result
+    with pytest.raises(ResultExpired):
+        store.load(stored, None)
+
+
+def test_prune_cutoff_once_per_interval():
+    store = ResultStore(retention_seconds=60, prune_interval=3600)
+
+    assert store.prune_cutoff() is not None
+    assert store.prune_cutoff() is None
+
+
+def test_cache_key_ignores_parameter_order():
+    assert report_cache_key("q", {"a": 1, "b": 2}) == report_cache_key("q", {"b": 2, "a": 1})
+    assert report_cache_key("q", None) == report_cache_key("q", {})
+    assert report_cache_key("q", {"a": 1}) != report_cache_key("q", {"a": 2})
@@ -0,0 +1,52 @@
+"""
+Tests for the rollup delta computation
+"""
+
+from datetime import datetime
+
+import pytest
+
+from database.rollups import compute_deltas, is_aligned, truncate
+
+
+def point(timestamp, value, source="web", dimension=None, dimension_value=None):
+    return {"timestamp": timestamp, "value": value, "source": source, "data_type": "revenue",
+            "dimension": dimension, "dimension_value": dimension_value}
+
+
+def test_deltas_aggregate_rows_per_bucket_key():
+    rows = [
+        point(datetime(2025, 1, 1, 10, 5), 2.0),
+        point(datetime(2025, 1, 1, 10, 50), 5.0),
+        point(datetime(2025, 1, 1, 11, 0), 1.0),
+        point(datetime(2025, 1, 1, 10, 30), 4.0, dimension="region", dimension_value="north"),
+        point(datetime(2025, 1, 1, 10, 30), None),
+    ]
+
+    hourly = compute_deltas(rows, "hour")
+    assert [(d["bucket"].hour, d["dimension"], d["sum"], d["count"], d["min"], d["max"]) for d in hourly] == [
+        (10, "", 7.0, 2, 2.0, 5.0),
+        (10, "region", 4.0, 1, 4.0, 4.0),
+        (11, "", 1.0, 1, 1.0, 1.0),
+    ]
+    daily = compute_deltas(rows, "day")
+    assert [(d["dimension"], d["sum"], d["count"]) for d in daily] == [("", 8.0, 3), ("region", 4.0, 1)]
+
+
+def test_deltas_are_sorted_by_key():
+    rows = [point(datetime(2025, 1, 2), 1.0, source="b"), point(datetime(2025, 1, 1), 1.0, source="c"),
+            point(datetime(2025, 1, 2), 1.0, source="a")]
+
+    keys = [(d["bucket"], d["source"]) for d in compute_deltas(rows, "day")]
+    assert keys == sorted(keys)
+
+
+def test_truncate_and_alignment():
+    moment = datetime(2025, 3, 4, 5, 6, 7, 8)
+
+    assert truncate(moment, "hour") == datetime(2025, 3, 4, 5)
+    assert truncate(moment, "day") == datetime(2025, 3, 4)
+    assert is_aligned(datetime(2025, 3, 4), "day") and is_aligned(None, "hour")
+    assert not is_aligned(moment, "hour")
+    with pytest.raises(ValueError):
+        truncate(moment, "week")
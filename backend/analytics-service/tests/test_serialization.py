@@ -0,0 +1,56 @@
+"""
+Tests for the orjson row serialization helpers
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import orjson
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import Column, Float, MetaData, String, Table
+
+from utils.serialization import encode_default, response_columns, rows_payload, rows_response
+
+COLUMNS = ["id", "name", "value"]
+ROWS = [(1, "a", 1.5), (2, "b", None)]
+
+
+def test_rows_payload_shapes():
+    assert rows_payload(COLUMNS, ROWS) == [
+        {"id": 1, "name": "a", "value": 1.5}, {"id": 2, "name": "b", "value": None}
+    ]
+    assert rows_payload(COLUMNS, ROWS, "columns") == {"id": [1, 2], "name": ["a", "b"], "value": [1.5, None]}
+    assert rows_payload(COLUMNS, [], "columns") == {"id": [], "name": [], "value": []}
+
+
+def test_encode_default_handles_uuid_subclasses_and_decimals():
+    class PgUUID(uuid.UUID):
+        pass
+
+    row_id = uuid.uuid4()
+    assert encode_default(PgUUID(str(row_id))) == str(row_id)
+    assert encode_default(Decimal("2.50")) == 2.5
+    with pytest.raises(TypeError):
+        encode_default(object())
+
+
+def test_rows_response_encodes_rows_and_keeps_headers():
+    row_id = uuid.uuid4()
+    rows = [(row_id, datetime(2025, 1, 2, 3, 4, 5), Decimal("1.25"))]
+
+    response = rows_response(["id", "timestamp", "value"], rows, headers={"ETag": '"v1"'})
+    assert orjson.loads(response.body) == [{"id": str(row_id), "timestamp": "2025-01-02T03:04:05", "value": 1.25}]
+    assert response.headers["etag"] == '"v1"'
+    assert response.media_type == "application/json"
+
+
+def test_response_columns_follow_the_model_field_order():
+    table = Table("items", MetaData(), Column("value", Float), Column("name", String), Column("extra", String))
+
+    class Item(BaseModel):
+        name: str
+        value: float
+
+    assert [column.name for column in response_columns(table, Item)] == ["name", "value"]
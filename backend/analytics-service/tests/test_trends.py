@@ -0,0 +1,52 @@
+"""
+Tests for the KPI trend statistics
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.trends import compute_trends
+
+DAY = datetime(2025, 6, 2)
+
+
+def test_daily_series_keeps_last_value_and_fills_gaps():
+    timestamps = [DAY + timedelta(hours=1), DAY + timedelta(hours=20), DAY + timedelta(days=2, hours=5)]
+
+    trends = compute_trends(timestamps, [5.0, 10.0, 20.0], freq="day", window=2, horizon=0)
+    assert trends["timestamps"] == ["2025-06-02T00:00:00", "2025-06-03T00:00:00", "2025-06-04T00:00:00"]
+    assert trends["values"] == [10.0, 10.0, 20.0]
+    assert trends["moving_average"] == [10.0, 10.0, 15.0]
+    assert trends["delta"] == [None, 0.0, 10.0]
+    assert trends["delta_pct"] == [None, 0.0, 100.0]
+    assert trends["forecast"] == {"timestamps": [], "values": [], "slope": None}
+
+
+def test_weeks_start_on_monday_and_change_from_zero_has_no_percentage():
+    sunday = DAY - timedelta(days=1)
+
+    trends = compute_trends([sunday, DAY], [0.0, 4.0], freq="week", horizon=0)
+    assert trends["timestamps"] == ["2025-05-26T00:00:00", "2025-06-02T00:00:00"]
+    assert trends["delta"] == [None, 4.0]
+    assert trends["delta_pct"] == [None, None]
+
+
+def test_forecast_extends_a_line_through_the_last_fit_points():
+    timestamps = [DAY + timedelta(days=i) for i in range(5)]
+
+    trends = compute_trends(timestamps, [100.0, 0.0, 2.0, 4.0, 6.0], freq="day", horizon=2, fit_points=4)
+    forecast = trends["forecast"]
+    assert forecast["timestamps"] == ["2025-06-07T00:00:00", "2025-06-08T00:00:00"]
+    assert forecast["values"] == pytest.approx([8.0, 10.0])
+    assert forecast["slope"] == pytest.approx(2.0)
+
+
+def test_forecast_without_freq_uses_the_median_interval():
+    timestamps = [DAY, DAY + timedelta(hours=1), DAY + timedelta(hours=2), DAY + timedelta(hours=5)]
+
+    trends = compute_trends(timestamps, [1.0, 2.0, 3.0, 6.0], freq=None, horizon=1)
+    assert trends["values"] == [1.0, 2.0, 3.0, 6.0]
+    assert trends["forecast"]["timestamps"] == ["2025-06-02T06:00:00"]
+    assert trends["forecast"]["values"] == pytest.approx([7.0])
+    assert trends["forecast"]["slope"] == pytest.approx(1 / 3600)
@@ -0,0 +1,131 @@
+"""
+Tests for the write-behind spool and queue
+"""
+
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from utils import write_behind
+from utils.write_behind import Spool, WriteBehindQueue, read_spool
+
+
+def test_spool_append_after_release_is_readable(tmp_path):
+    path = str(tmp_path / "spool.ndjson")
+    spool = Spool(path, compact_rows=100)
+    spool.append([{"id": "a", "v": 1}])
+    spool.release(1, [])
+    spool.append([{"id": "b", "v": 2}])
+    spool.close()
+
+    with open(path, "rb") as f:
+        assert f.read() == b'{"id": "b", "v": 2}\n'
+    assert read_spool(path) == [{"id": "b", "v": 2}]
+
+
+def test_spool_compaction_keeps_pending_rows(tmp_path):
+    path = str(tmp_path / "spool.ndjson")
+    spool = Spool(path, compact_rows=2)
+    spool.append([{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    spool.release(2, [{"id": "c"}])
+    spool.append([{"id": "d"}])
+    spool.close()
+
+    assert read_spool(path) == [{"id": "c"}, {"id": "d"}]
+
+
+def test_read_spool_skips_torn_line(tmp_path):
+    path = tmp_path / "spool.ndjson"
+    path.write_text('{"id": "a"}\n{"id": "b"\n')
+
+    assert read_spool(str(path)) == [{"id": "a"}]
+    assert read_spool(str(tmp_path / "missing.ndjson")) == []
+
+
+def collecting_queue(write=None, **options):
+    written = []
+
+    def default_write(rows):
+        written.append([row["id"] for row in rows])
+
+    options = {"max_rows": 100, "batch_size": 3, "max_delay": 10, **options}
+    return WriteBehindQueue("test-writer", write or default_write, **options), written
+
+
+def test_queue_writes_full_batches_and_the_rest_on_stop():
+    queue, written = collecting_queue()
+    queue.start()
+    assert queue.put([{"id": i} for i in range(4)])
+    queue.stop(timeout=5)
+
+    assert written == [[0, 1, 2], [3]]
+    assert queue.stats()["written"] == 4 and queue.stats()["queued"] == 0
+
+
+def test_queue_writes_after_max_delay():
+    queue, written = collecting_queue(max_delay=0.01)
+    queue.start()
+    queue.put([{"id": "a"}])
+    deadline = time.monotonic() + 5
+    while not written and time.monotonic() < deadline:
+        time.sleep(0.005)
+    queue.stop(timeout=5)
+
+    assert written == [["a"]]
+
+
+def test_queue_rejects_rows_when_full():
+    queue, _ = collecting_queue(max_rows=2)
+
+    assert queue.put([{"id": 1}, {"id": 2}])
+    assert not queue.put([{"id": 3}])
+    assert queue.stats()["rejected"] == 1
+
+
+def test_queue_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(write_behind, "RETRY_MIN_DELAY", 0.001)
+    attempts = []
+
+    def write(rows):
+        attempts.append(len(rows))
+        if len(attempts) < 3:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+
+    queue, _ = collecting_queue(write)
+    queue.start()
+    queue.put([{"id": 1}, {"id": 2}])
+    queue.stop(timeout=5)
+
+    assert attempts == [2, 2, 2]
+    assert queue.stats()["written"] == 2 and queue.stats()["dropped"] == 0
+
+
+def test_queue_drops_only_rows_the_database_refuses():
+    written = []
+
+    def write(rows):
+        if any(row["id"] == "bad" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("refused"))
+        written.extend(row["id"] for row in rows)
+
+    queue, _ = collecting_queue(write)
+    queue.start()
+    queue.put([{"id": "a"}, {"id": "bad"}, {"id": "b"}])
+    queue.stop(timeout=5)
+
+    assert written == ["a", "b"]
+    assert queue.stats()["dropped"] == 1
+
+
+def test_queue_spool_holds_unwritten_rows(tmp_path):
+    path = str(tmp_path / "spool.ndjson")
+    release = threading.Event()
+    queue, _ = collecting_queue(lambda rows: release.wait(), spool_path=path)
+    queue.start()
+    queue.put([{"id": i} for i in range(4)])
+
+    assert [row["id"] for row in read_spool(path)] == [0, 1, 2, 3]
+    release.set()
+    queue.stop(timeout=5)
+    assert read_spool(path) == []
@@ -0,0 +1,174 @@
+"""
+In-process result cache for analytics service
+Provides TTL + LRU caching of computed responses with single-flight
+protection, so concurrent misses for one key run a single computation
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """A computation in progress that other callers can wait for"""
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _LeaderCancelled(Exception):
+    """The caller computing a value was cancelled; a waiter computes it instead"""
+
+
+class TTLCache:
+    """Thread-safe TTL cache with LRU eviction and single-flight computation.
+
+    Keys are tuples whose first element names the endpoint, e.g.
+    ("dashboard", "month"), so every entry of an endpoint can be invalidated
+    at once.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        # Coroutine computations in progress: key -> (future, epoch)
+        self._async_flights: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        # Bumped on invalidation so results computed before it are not stored
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, key: Hashable) -> tuple:
+        """Return (found, value) for a fresh entry; the lock must be held"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        return False, None
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it once on a miss"""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(self._epoch)
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and flight.epoch == self._epoch:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    async def get_or_compute_async(self, key: tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Like get_or_compute for a coroutine function; waiters await instead of blocking the loop.
+
+        If the caller computing the value is cancelled, its waiters are not:
+        the first of them to resume computes the value for the others.
+        """
+        while True:
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    return value
+
+                flight = self._async_flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._async_flights[key] = (asyncio.get_running_loop().create_future(), self._epoch)
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+            future, epoch = flight
+            if leader:
+                break
+            try:
+                # Shielded so a cancelled waiter does not cancel the shared computation
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                del self._async_flights[key]
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark it retrieved so a flight without waiters does not log a warning
+            future.exception()
+            raise
+        with self._lock:
+            del self._async_flights[key]
+            if epoch == self._epoch:
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *endpoints: str):
+        """Drop every entry of the given endpoints, or all entries if none are given"""
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            if not endpoints:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in endpoints]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            }
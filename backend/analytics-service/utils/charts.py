@@ -0,0 +1,138 @@
+"""
+Chart rendering for analytics service
+Charts are drawn with matplotlib and seaborn in worker processes. The
+functions here take plain JSON-like data so they can be sent to a process
+pool, and the plotting libraries are only imported inside the workers.
+"""
+
+import hashlib
+import io
+import json
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+CHART_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+DPI = 100
+
+
+def chart_digest(kind: str, data: Dict[str, Any], fmt: str, options: Dict[str, Any]) -> str:
+    """Hash of everything a chart image depends on, used as cache key and ETag"""
+    payload = json.dumps([kind, data, fmt, options], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def warm_up():
+    """Process pool initializer: import and configure the plotting libraries once per worker"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import seaborn as sns
+    sns.set_theme(style="whitegrid")
+
+
+def _number(value: Any) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _parse_times(values: List[Any]) -> Optional[List[datetime]]:
+    """Values as datetimes if every one is an ISO date or timestamp, else None"""
+    try:
+        return [datetime.fromisoformat(str(value)) for value in values]
+    except ValueError:
+        return None
+
+
+def _draw_line(fig, ax, data: Dict[str, Any], options: Dict[str, Any]):
+    """data: {"series": [{"label": ..., "x": [...], "y": [...]}]}, x ISO timestamps or categories"""
+    from matplotlib import dates as mdates
+
+    series = data["series"]
+    all_x = [value for line in series for value in line["x"]]
+    as_times = _parse_times(all_x) is not None
+    for line in series:
+        x = _parse_times(line["x"]) if as_times else [str(value) for value in line["x"]]
+        y = [_number(value) for value in line["y"]]
+        ax.plot(x, y, label=line.get("label"), linewidth=1.5, marker="o" if len(x) <= 31 else None, markersize=3)
+    if as_times:
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    else:
+        ax.tick_params(axis="x", labelrotation=45)
+    if len(series) > 1:
+        ax.legend(loc="best", fontsize="small")
+    ax.set_ylabel(options.get("ylabel") or "")
+
+
+def _draw_bar(fig, ax, data: Dict[str, Any], options: Dict[str, Any]):
+    """data: {"labels": [...], "values": [...]}, drawn as horizontal bars in the given order"""
+    import seaborn as sns
+
+    labels = [str(label) for label in data["labels"]]
+    values = [_number(value) for value in data["values"]]
+    sns.barplot(x=values, y=labels, orient="h", color=sns.color_palette()[0], ax=ax)
+    if ax.containers:
+        ax.bar_label(ax.containers[0], fmt="%.4g", padding=3, fontsize="small")
+    ax.set_xlabel(options.get("ylabel") or "")
+    ax.set_ylabel("")
+
+
+def _draw_gauge(fig, ax, data: Dict[str, Any], options: Dict[str, Any]):
+    """data: {"value": ..., "target": ..., "unit": ...}, a half-circle gauge of value against target"""
+    from matplotlib.patches import Wedge
+
+    value = _number(data.get("value"))
+    target = _number(data.get("target"))
+    known = [number for number in (value, target) if not math.isnan(number)]
+    low = min([0.0] + known)
+    high = max([low + 1.0] + [number * 1.25 for number in known if number > 0])
+
+    def angle(number: float) -> float:
+        return 180.0 * (1 - (min(max(number, low), high) - low) / (high - low))
+
+    ax.add_patch(Wedge((0, 0), 1, 0, 180, width=0.3, color="#e6e6e6"))
+    if not math.isnan(value):
+        reached = math.isnan(target) or value >= target
+        ax.add_patch(Wedge((0, 0), 1, angle(value), 180, width=0.3, color="#2ca02c" if reached else "#ff7f0e"))
+    if not math.isnan(target):
+        theta = math.radians(angle(target))
+        ax.plot([0.65 * math.cos(theta), 1.05 * math.cos(theta)], [0.65 * math.sin(theta), 1.05 * math.sin(theta)],
+                color="#333333", linewidth=2)
+
+    unit = data.get("unit") or ""
+    ax.text(0, 0.12, "n/a" if math.isnan(value) else f"{value:,.4g} {unit}".strip(),
+            ha="center", va="center", fontsize="xx-large", fontweight="bold")
+    if not math.isnan(target):
+        ax.text(0, -0.12, f"target {target:,.4g} {unit}".strip(), ha="center", va="center", fontsize="medium")
+    ax.set_xlim(-1.1, 1.1)
+    ax.set_ylim(-0.3, 1.1)
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+
+RENDERERS = {
+    "line": _draw_line,
+    "bar": _draw_bar,
+    "gauge": _draw_gauge,
+}
+
+
+def render_chart(kind: str, data: Dict[str, Any], fmt: str, options: Dict[str, Any]) -> bytes:
+    """Draw a chart and return it encoded as PNG or SVG.
+
+    options: width and height in pixels, title, ylabel.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(options["width"] / DPI, options["height"] / DPI), dpi=DPI)
+    ax = fig.subplots()
+    RENDERERS[kind](fig, ax, data, options)
+    if options.get("title"):
+        ax.set_title(options["title"])
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
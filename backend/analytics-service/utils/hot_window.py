@@ -0,0 +1,385 @@
+"""
+In-memory hot window of recent analytics data for analytics service
+Keeps the rows of the last days as NumPy column arrays in fixed-size
+chunks: timestamps, values and dictionary-encoded source, data_type,
+dimension and dimension_value codes. Ingestion appends to the newest chunk,
+and range filters and bucketed aggregations over the window are computed
+with vectorized NumPy operations instead of a database query.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+ENCODED_COLUMNS = ("source", "data_type", "dimension", "dimension_value")
+# Columns of the rows loaded on warm-up, in this order
+LOAD_COLUMNS = ("id", "timestamp", "value") + ENCODED_COLUMNS
+# int64 timestamp + float64 value + an int32 code per encoded column
+ROW_BYTES = 8 + 8 + 4 * len(ENCODED_COLUMNS)
+# NumPy units date_trunc truncates to; weeks start on Monday and are handled apart
+BUCKET_UNITS = {"minute": "m", "hour": "h", "day": "D", "month": "M"}
+NULL_CODE = -1
+
+
+def to_micros(value: datetime) -> int:
+    """Microseconds since the epoch of a naive UTC timestamp"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def truncate_micros(timestamps: np.ndarray, bucket: str) -> np.ndarray:
+    """Vectorized date_trunc of microsecond timestamps, as datetime64[us]"""
+    moments = timestamps.view("datetime64[us]")
+    if bucket == "week":
+        days = moments.astype("datetime64[D]")
+        # The epoch was a Thursday, three days after a Monday
+        return (days - ((days.view(np.int64) + 3) % 7).astype("timedelta64[D]")).astype("datetime64[us]")
+    return moments.astype(f"datetime64[{BUCKET_UNITS[bucket]}]").astype("datetime64[us]")
+
+
+class Dictionary:
+    """Integer codes of the distinct strings of a column; NULL is -1.
+
+    Codes are never reused, so arrays holding them stay valid while new
+    strings are added.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL_CODE
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, values: Sequence[Optional[str]]) -> np.ndarray:
+        return np.fromiter((self.code(value) for value in values), dtype=np.int32, count=len(values))
+
+    def lookup(self, value: Optional[str]) -> Optional[int]:
+        """Code of a value, or None if no row has it"""
+        return NULL_CODE if value is None else self.codes.get(value)
+
+
+class Chunk:
+    """Preallocated column arrays holding up to ``capacity`` rows"""
+
+    __slots__ = ("size", "timestamps", "values", "codes", "min_timestamp", "max_timestamp")
+
+    def __init__(self, capacity: int):
+        self.size = 0
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.codes = {name: np.empty(capacity, dtype=np.int32) for name in ENCODED_COLUMNS}
+        self.min_timestamp: Optional[int] = None
+        self.max_timestamp: Optional[int] = None
+
+    @property
+    def capacity(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return self.capacity * ROW_BYTES
+
+
+class HotWindow:
+    """Recent analytics data rows held in memory for vectorized reads.
+
+    The window is complete from its start on: every row with a timestamp at
+    or after it is held, so queries whose range begins there are answered
+    exactly. The start follows now - span as rows are appended, and moves
+    past the newest row of any chunk evicted to stay under ``max_bytes``.
+    Chunks are evicted oldest first, once all their rows are before the
+    start or when a new chunk would not fit.
+
+    Before warm-up finishes the window answers nothing (queries return
+    None and go to the database), and rows ingested meanwhile are held back
+    and appended once the load is done.
+    """
+
+    def __init__(self, span: timedelta, max_bytes: int, chunk_rows: int = 65536):
+        self.span = span
+        self.max_bytes = max_bytes
+        self.chunk_rows = max(1, min(chunk_rows, max_bytes // ROW_BYTES))
+        self._lock = threading.Lock()
+        self._chunks: List[Chunk] = []
+        self._dictionaries = {name: Dictionary() for name in ENCODED_COLUMNS}
+        # Microseconds since the epoch from which the window is complete, None while not servable
+        self._start: Optional[int] = None
+        self._loading = False
+        # Rows ingested during warm-up, and their ids to skip when the load reads them too
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_ids = set()
+        self.evicted_chunks = 0
+
+    def begin_warm_up(self, now: datetime) -> datetime:
+        """Empty the window and start holding back ingested rows; returns the timestamp to load from"""
+        with self._lock:
+            self._chunks.clear()
+            self._start = None
+            self._loading = True
+            self._pending.clear()
+            self._pending_ids.clear()
+        return now - self.span
+
+    def load(self, batches: Iterable[Sequence[Sequence[Any]]], start: datetime):
+        """Append batches of rows read from the database (LOAD_COLUMNS, timestamp >= start) and open the window"""
+        for rows in batches:
+            with self._lock:
+                if not self._loading:
+                    return
+                if self._pending_ids:
+                    rows = [row for row in rows if str(row[0]) not in self._pending_ids]
+                if rows:
+                    _, timestamps, values, *encoded = zip(*rows)
+                    self._append(timestamps, values, dict(zip(ENCODED_COLUMNS, encoded)))
+        with self._lock:
+            if not self._loading:
+                return
+            self._loading = False
+            self._start = to_micros(start)
+            pending, self._pending = self._pending, []
+            self._pending_ids.clear()
+        self.append(pending)
+
+    def disable(self):
+        """Drop all rows and stop answering, e.g. after a failed warm-up"""
+        with self._lock:
+            self._chunks.clear()
+            self._start = None
+            self._loading = False
+            self._pending.clear()
+            self._pending_ids.clear()
+
+    def append(self, rows: List[Dict[str, Any]], ids: Optional[Sequence[Any]] = None):
+        """Add committed rows (dicts of the analytics_data columns) to the window"""
+        if not rows:
+            return
+        with self._lock:
+            if self._loading:
+                self._pending.extend(rows)
+                if ids is not None:
+                    self._pending_ids.update(str(row_id) for row_id in ids)
+                return
+            if self._start is None:
+                return
+            self._start = max(self._start, to_micros(datetime.utcnow() - self.span))
+            timestamps = np.array([row["timestamp"] for row in rows], dtype="datetime64[us]").view(np.int64)
+            keep = timestamps >= self._start
+            if not keep.all():
+                rows = [row for row, kept in zip(rows, keep.tolist()) if kept]
+                timestamps = timestamps[keep]
+            if rows:
+                self._append(
+                    timestamps, [row["value"] for row in rows],
+                    {name: [row.get(name) for row in rows] for name in ENCODED_COLUMNS}
+                )
+            self._evict_expired()
+
+    def _append(self, timestamps: Sequence[Any], values: Sequence[Optional[float]],
+                encoded: Dict[str, Sequence[Optional[str]]]):
+        timestamps = np.asarray(timestamps, dtype="datetime64[us]").view(np.int64)
+        # NULL values become NaN, which every aggregate skips
+        values = np.array(values, dtype=np.float64)
+        codes = {name: self._dictionaries[name].encode(column) for name, column in encoded.items()}
+        offset = 0
+        while offset < len(timestamps):
+            chunk = self._chunks[-1] if self._chunks else None
+            if chunk is None or chunk.size == chunk.capacity:
+                chunk = self._new_chunk()
+            count = min(chunk.capacity - chunk.size, len(timestamps) - offset)
+            part = slice(offset, offset + count)
+            filled = slice(chunk.size, chunk.size + count)
+            chunk.timestamps[filled] = timestamps[part]
+            chunk.values[filled] = values[part]
+            for name, column in codes.items():
+                chunk.codes[name][filled] = column[part]
+            low, high = int(timestamps[part].min()), int(timestamps[part].max())
+            chunk.min_timestamp = low if chunk.min_timestamp is None else min(chunk.min_timestamp, low)
+            chunk.max_timestamp = high if chunk.max_timestamp is None else max(chunk.max_timestamp, high)
+            chunk.size += count
+            offset += count
+
+    def _new_chunk(self) -> Chunk:
+        while self._chunks and self.nbytes + self.chunk_rows * ROW_BYTES > self.max_bytes:
+            self._evict_oldest()
+        chunk = Chunk(self.chunk_rows)
+        self._chunks.append(chunk)
+        return chunk
+
+    def _evict_oldest(self):
+        chunk = self._chunks.pop(0)
+        self.evicted_chunks += 1
+        # Rows up to the newest one of the chunk are no longer all held
+        if chunk.max_timestamp is not None and self._start is not None:
+            self._start = max(self._start, chunk.max_timestamp + 1)
+
+    def _evict_expired(self):
+        while len(self._chunks) > 1 and self._chunks[0].max_timestamp < self._start:
+            self._chunks.pop(0)
+            self.evicted_chunks += 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self._chunks)
+
+    def max_timestamp(self) -> Optional[datetime]:
+        """Latest timestamp of all analytics data, None when the window cannot tell"""
+        with self._lock:
+            if self._start is None:
+                return None
+            latest = max((chunk.max_timestamp for chunk in self._chunks if chunk.size), default=None)
+        # Later rows would be in the window, earlier ones may not be
+        if latest is None or latest < self._start:
+            return None
+        return from_micros(latest)
+
+    def _select(self, start: Optional[datetime], end: Optional[datetime],
+                filters: Dict[str, Optional[str]]) -> Optional[tuple]:
+        """(timestamps, values, dimension_value codes) of the rows in [start, end) matching the filters.
+
+        None when the window does not hold every row from start on.
+        """
+        empty = (np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int32))
+        with self._lock:
+            if self._start is None or start is None or to_micros(start) < self._start:
+                return None
+            codes = {}
+            for name, value in filters.items():
+                if value is not None:
+                    code = self._dictionaries[name].lookup(value)
+                    if code is None:
+                        return empty
+                    codes[name] = code
+            low = to_micros(start)
+            high = to_micros(end) if end is not None else None
+            # Filled parts of the chunks; later appends only write past them
+            parts = [
+                (chunk.timestamps[:chunk.size], chunk.values[:chunk.size],
+                 {name: column[:chunk.size] for name, column in chunk.codes.items()})
+                for chunk in self._chunks
+                if chunk.size and chunk.max_timestamp >= low and (high is None or chunk.min_timestamp < high)
+            ]
+
+        selected = []
+        for timestamps, values, chunk_codes in parts:
+            mask = timestamps >= low
+            if high is not None:
+                mask &= timestamps < high
+            for name, code in codes.items():
+                mask &= chunk_codes[name] == code
+            selected.append((timestamps[mask], values[mask], chunk_codes["dimension_value"][mask]))
+        if not selected:
+            return empty
+        return tuple(np.concatenate(columns) for columns in zip(*selected))
+
+    def aggregate(self, bucket: str, names: List[str], start: Optional[datetime], end: Optional[datetime],
+                  source: Optional[str] = None, data_type: Optional[str] = None,
+                  dimension: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Aggregate rows of [start, end) into time buckets like GROUP BY date_trunc(bucket, timestamp).
+
+        With a dimension, rows of that dimension are grouped by bucket and
+        dimension_value. Aggregates are sum, avg, min, max, count and pNN
+        percentiles (interpolated like percentile_cont). Groups are ordered
+        by bucket and dimension value, NULL last. Returns timestamps,
+        dimension_values (with a dimension) and values by aggregate name, or
+        None when the window does not cover start.
+        """
+        selection = self._select(start, end, {"source": source, "data_type": data_type, "dimension": dimension})
+        if selection is None:
+            return None
+        timestamps, values, dimension_codes = selection
+        buckets = truncate_micros(timestamps, bucket)
+        if dimension:
+            bucket_keys, bucket_index = np.unique(buckets, return_inverse=True)
+            ranks = self._ranks("dimension_value")
+            keys = bucket_index.astype(np.int64) * len(ranks) + ranks[dimension_codes + 1]
+        else:
+            keys = buckets
+        _, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+
+        result = {
+            "timestamps": buckets[first].tolist(),
+            "values": group_aggregates(names, values, groups, len(first)),
+        }
+        if dimension:
+            labels = self._dictionaries["dimension_value"].values
+            result["dimension_values"] = [
+                labels[code] if code != NULL_CODE else None for code in dimension_codes[first].tolist()
+            ]
+        return result
+
+    def _ranks(self, name: str) -> np.ndarray:
+        """Sort position of every code (shifted by one for NULL) in value order, NULL last"""
+        with self._lock:
+            labels = list(self._dictionaries[name].values)
+        ranks = np.empty(len(labels) + 1, dtype=np.int64)
+        ranks[0] = len(labels)
+        ranks[np.argsort(np.array(labels, dtype=object), kind="stable") + 1] = np.arange(len(labels))
+        return ranks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self._start is not None,
+                "loading": self._loading,
+                "start": from_micros(self._start).isoformat() if self._start is not None else None,
+                "rows": sum(chunk.size for chunk in self._chunks),
+                "chunks": len(self._chunks),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "evicted_chunks": self.evicted_chunks,
+                "distinct": {name: len(dictionary.values) for name, dictionary in self._dictionaries.items()},
+            }
+
+
+def group_aggregates(names: List[str], values: np.ndarray, groups: np.ndarray, count: int) -> Dict[str, list]:
+    """Aggregates of values by group index; like SQL, NULL (NaN) values are skipped"""
+    valid = ~np.isnan(values)
+    if not valid.all():
+        values, groups = values[valid], groups[valid]
+    counts = np.bincount(groups, minlength=count)
+    present = (counts > 0).tolist()
+    sorted_values = starts = None
+    results = {}
+    for name in names:
+        if name == "count":
+            results[name] = counts.tolist()
+            continue
+        if name in ("sum", "avg"):
+            column = np.bincount(groups, weights=values, minlength=count)
+            if name == "avg":
+                column = column / np.maximum(counts, 1)
+        else:
+            if sorted_values is None:
+                sorted_values = values[np.lexsort((values, groups))]
+                starts = np.cumsum(counts) - counts
+            if not len(sorted_values):
+                results[name] = [None] * count
+                continue
+            last = len(sorted_values) - 1
+            if name == "min":
+                column = sorted_values[np.minimum(starts, last)]
+            elif name == "max":
+                column = sorted_values[np.clip(starts + counts - 1, 0, last)]
+            else:
+                # percentile_cont: linear interpolation between the closest ranks
+                position = float(name[1:]) / 100 * np.maximum(counts - 1, 0)
+                lower = np.floor(position).astype(np.int64)
+                upper = np.ceil(position).astype(np.int64)
+                low = sorted_values[np.minimum(starts + lower, last)]
+                high = sorted_values[np.minimum(starts + upper, last)]
+                column = low + (high - low) * (position - lower)
+        results[name] = [value if has_rows else None for value, has_rows in zip(column.tolist(), present)]
+    return results
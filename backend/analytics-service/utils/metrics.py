@@ -0,0 +1,230 @@
+"""
+Request instrumentation for analytics service
+An ASGI middleware recording per-route latency, database time, rows
+returned and serialization time in Prometheus histograms, plus an opt-in
+sampling profiler for single requests. Database time is collected with
+SQLAlchemy cursor events into a per-request context variable.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from fastapi.routing import APIRoute
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000, float("inf"))
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+# Route label of requests that matched no route, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_DURATION = Histogram(
+    "analytics_http_request_duration_seconds", "Time from request to last response byte",
+    ["method", "route", "status"]
+)
+REQUEST_DB_DURATION = Histogram(
+    "analytics_http_request_db_seconds", "Time spent in database statements per request",
+    ["method", "route"]
+)
+REQUEST_SERIALIZATION_DURATION = Histogram(
+    "analytics_http_request_serialization_seconds",
+    "Time from the endpoint returning to the response being rendered",
+    ["method", "route"]
+)
+REQUEST_DB_ROWS = Histogram(
+    "analytics_http_request_db_rows", "Rows returned or affected by database statements per request",
+    ["method", "route"], buckets=ROWS_BUCKETS
+)
+DB_STATEMENT_DURATION = Histogram(
+    "analytics_db_statement_seconds", "Duration of database statements, requests and background work",
+    ["pool"]
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "analytics_db_pool_checkout_wait_seconds", "Time waited for a pooled database connection",
+    ["pool"], buckets=WAIT_BUCKETS
+)
+POOL_CONNECTIONS = Gauge(
+    "analytics_db_pool_connections", "Connections of a database pool by state",
+    ["pool", "state"]
+)
+
+
+class RequestStats:
+    """Measurements of the request being served"""
+
+    __slots__ = ("route", "db_seconds", "db_rows", "endpoint_end", "handler_end")
+
+    def __init__(self):
+        self.route: Optional[str] = None
+        self.db_seconds = 0.0
+        self.db_rows = 0
+        self.endpoint_end: Optional[float] = None
+        self.handler_end: Optional[float] = None
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def observe_pool_checkout(pool: str, seconds: float):
+    POOL_CHECKOUT_WAIT.labels(pool).observe(seconds)
+
+
+def track_pool(name: str, get_pool: Callable[[], Any]):
+    """Export the connection counts of a pool, read when metrics are scraped"""
+    POOL_CONNECTIONS.labels(name, "checked_out").set_function(lambda: get_pool().checkedout())
+    POOL_CONNECTIONS.labels(name, "idle").set_function(lambda: get_pool().checkedin())
+    POOL_CONNECTIONS.labels(name, "overflow").set_function(lambda: max(get_pool().overflow(), 0))
+
+
+def instrument_engine(engine, name: str):
+    """Time the statements of a (sync) engine and add them to the current request"""
+    statement_duration = DB_STATEMENT_DURATION.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_start"].pop()
+        statement_duration.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_seconds += elapsed
+            stats.db_rows += max(cursor.rowcount, 0)
+
+    @event.listens_for(engine, "handle_error")
+    def discard_statement(context):
+        # after_cursor_execute is not called for failed statements
+        starts = context.connection.info.get("statement_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class InstrumentedRoute(APIRoute):
+    """Route recording its path template and when its endpoint and handler finished.
+
+    The handler validates and renders the endpoint's return value, so the
+    time between the two is the response serialization time.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # The handler calls dependant.call with the resolved parameters; it
+        # decided on awaiting it from the endpoint, so the wrapper matches that
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            async def timed_endpoint(**values):
+                try:
+                    return await call(**values)
+                finally:
+                    _endpoint_returned()
+        else:
+            def timed_endpoint(**values):
+                try:
+                    return call(**values)
+                finally:
+                    _endpoint_returned()
+        self.dependant.call = timed_endpoint
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def instrumented_handler(request):
+            stats = current_request.get()
+            if stats is not None:
+                stats.route = route
+            response = await handler(request)
+            if stats is not None:
+                stats.handler_end = time.perf_counter()
+            return response
+
+        return instrumented_handler
+
+
+def _endpoint_returned():
+    stats = current_request.get()
+    if stats is not None:
+        stats.endpoint_end = time.perf_counter()
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording request metrics and, on request, a profile.
+
+    With ``profile_header`` set, a request carrying that header is run under
+    pyinstrument's sampling profiler and answered with the profile (HTML,
+    or text when the header value is "text") instead of its response.
+    """
+
+    def __init__(self, app, profile_header: Optional[str] = None, profile_interval: float = 0.001):
+        self.app = app
+        self.profile_header = profile_header.lower().encode() if profile_header else None
+        self.profile_interval = profile_interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.profile_header is not None:
+            profile = dict(scope["headers"]).get(self.profile_header)
+            if profile is not None:
+                await self.profile(scope, receive, send, profile.decode("latin-1").strip().lower())
+                return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            method, route = scope["method"], stats.route or UNMATCHED_ROUTE
+            REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+            if stats.route is not None:
+                REQUEST_DB_DURATION.labels(method, route).observe(stats.db_seconds)
+                REQUEST_DB_ROWS.labels(method, route).observe(stats.db_rows)
+                if stats.endpoint_end is not None and stats.handler_end is not None:
+                    REQUEST_SERIALIZATION_DURATION.labels(method, route).observe(
+                        stats.handler_end - stats.endpoint_end
+                    )
+
+    async def profile(self, scope, receive, send, output: str):
+        """Run the request under the profiler, discard its response and send the profile"""
+        from pyinstrument import Profiler
+
+        async def discard(message):
+            pass
+
+        profiler = Profiler(interval=self.profile_interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        if output == "text":
+            body, media_type = profiler.output_text(unicode=True).encode(), b"text/plain; charset=utf-8"
+        else:
+            body, media_type = profiler.output_html().encode(), b"text/html; charset=utf-8"
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", media_type), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def metrics_payload() -> tuple:
+    """(body, media type) of the metrics in Prometheus text format"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,67 @@
+"""
+Report result storage for analytics service
+Small results are kept inline in report_executions.result, large ones are
+stored gzip-compressed in report_executions.result_data, so every replica
+can read the results of the others
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+
+def report_cache_key(query: str, parameters: Optional[Dict[str, Any]]) -> str:
+    """Hash of the query text and its parameters identifying reusable results"""
+    payload = json.dumps({"query": query, "parameters": parameters or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultExpired(LookupError):
+    """The compressed payload of a result was removed after the retention period"""
+
+
+class ResultStore:
+    """Stores report results inline or compressed, depending on size"""
+
+    def __init__(self, inline_max_bytes: int = 256 * 1024,
+                 retention_seconds: float = 7 * 86400, prune_interval: float = 3600):
+        self.inline_max_bytes = inline_max_bytes
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def save(self, result: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        """Return the values to store in report_executions.result and result_data"""
+        encoded = json.dumps(result, default=str).encode()
+        if len(encoded) <= self.inline_max_bytes:
+            return result, None
+
+        data = gzip.compress(encoded, compresslevel=6)
+        return {
+            "storage": "compressed",
+            "bytes": len(encoded),
+            "compressed_bytes": len(data),
+            "row_count": result.get("row_count"),
+        }, data
+
+    def load(self, stored: Optional[Dict[str, Any]], data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """Return the full result; raises ResultExpired if its payload was pruned"""
+        if not stored or stored.get("storage") != "compressed":
+            return stored
+        if data is None:
+            raise ResultExpired()
+        return json.loads(gzip.decompress(data))
+
+    def prune_cutoff(self) -> Optional[datetime]:
+        """Completion time before which payloads are removed, at most once per interval"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self.prune_interval:
+                return None
+            self._last_prune = now
+        return datetime.utcfromtimestamp(now - self.retention_seconds)
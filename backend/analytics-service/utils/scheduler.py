@@ -0,0 +1,56 @@
+"""
+Scheduling helpers for analytics service
+Cron expression handling and a background thread running a task periodically
+"""
+
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from croniter import croniter
+
+logger = logging.getLogger("analytics-service")
+
+
+def is_valid_schedule(schedule: str) -> bool:
+    """Whether a cron expression can be parsed"""
+    return croniter.is_valid(schedule)
+
+
+def next_run_time(schedule: str, after: datetime, jitter_seconds: float = 0) -> datetime:
+    """Next occurrence of a cron expression after a time, delayed by a random jitter"""
+    occurrence = croniter(schedule, after).get_next(datetime)
+    if jitter_seconds > 0:
+        occurrence += timedelta(seconds=random.uniform(0, jitter_seconds))
+    return occurrence
+
+
+class PeriodicTask:
+    """Runs a function every ``interval`` seconds on a daemon thread until stopped"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"Periodic task {self.name} failed: {str(e)}")
@@ -0,0 +1,56 @@
+"""
+Response serialization helpers for analytics service
+List endpoints select plain column tuples and encode them with orjson,
+skipping ORM objects and per-row pydantic validation. Rows are sent as
+JSON objects, or with the columnar shape as one array per column.
+"""
+
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+ROW_SHAPES = ("rows", "columns")
+ROW_SHAPE_PATTERN = "^(rows|columns)$"
+
+
+def encode_default(value: Any) -> Any:
+    """Values orjson does not encode natively, such as asyncpg's UUID subclass"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class RowsResponse(ORJSONResponse):
+    """JSON response encoded with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def response_columns(table, response_model) -> list:
+    """Columns of a table backing a response model, in the model's field order"""
+    return [table.c[name] for name in response_model.__fields__]
+
+
+def rows_payload(columns: List[str], rows: Sequence[Sequence[Any]], shape: str = "rows") -> Any:
+    """Rows as a list of objects, or for the columnar shape as {column: [values]}"""
+    if shape == "columns":
+        if not rows:
+            return {column: [] for column in columns}
+        return {column: list(values) for column, values in zip(columns, zip(*rows))}
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def rows_response(columns: List[str], rows: Sequence[Sequence[Any]], shape: str = "rows",
+                  headers: Optional[Dict[str, str]] = None) -> RowsResponse:
+    """Encode rows with orjson.
+
+    Headers set on an endpoint's injected Response are not copied to a
+    response it returns, so headers such as ETag are passed here.
+    """
+    return RowsResponse(rows_payload(columns, rows, shape), headers=headers)
@@ -0,0 +1,93 @@
+"""
+Time series trend computation for analytics service
+Moving averages, period-over-period deltas and a linear forecast computed
+with pandas/NumPy over a whole series at once. pandas is imported on first
+use so it does not slow down service start.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+# Resampling frequency name -> pandas offset alias
+TREND_FREQUENCIES = {
+    "hour": "H",
+    "day": "D",
+    "week": "W-MON",
+    "month": "MS",
+}
+
+
+def _to_list(values) -> List[Optional[float]]:
+    """Array as a JSON friendly list with NaN as None"""
+    import pandas as pd
+
+    series = pd.Series(values, dtype="float64")
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def compute_trends(
+    timestamps: Sequence[datetime],
+    values: Sequence[float],
+    freq: Optional[str] = "day",
+    window: int = 7,
+    horizon: int = 7,
+    fit_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """Trend statistics of a series of (timestamp, value) observations.
+
+    With a freq the series is resampled to that period: the last value in
+    each period is kept and empty periods carry the previous value forward,
+    since KPIs are levels. Without one the observations are used as is.
+
+    Returns columnar arrays aligned with ``timestamps``: ``values``, the
+    ``moving_average`` over ``window`` periods, the ``delta`` and
+    ``delta_pct`` against the previous period, and a ``forecast`` of
+    ``horizon`` periods from a least squares line through the last
+    ``fit_points`` periods (all of them by default), whose ``slope`` is
+    per period, or per second without a freq.
+    """
+    import numpy as np
+    import pandas as pd
+
+    series = pd.Series(np.asarray(values, dtype="float64"), index=pd.DatetimeIndex(timestamps), dtype="float64")
+    series = series.sort_index()
+    if freq:
+        # Periods are labelled by their start, weeks start on Monday
+        series = series.resample(TREND_FREQUENCIES[freq], label="left", closed="left").last().ffill()
+
+    moving_average = series.rolling(window, min_periods=1).mean()
+    delta = series.diff()
+    previous = series.shift(1)
+    delta_pct = (delta / previous.abs().where(previous != 0)) * 100
+
+    forecast = {"timestamps": [], "values": [], "slope": None}
+    fitted = series.dropna()
+    if fit_points:
+        fitted = fitted.iloc[-fit_points:]
+    if horizon > 0 and len(fitted) >= 2:
+        # Positions in periods (or seconds without a freq) since the first fitted point
+        if freq:
+            positions = np.arange(len(series))[series.notna().to_numpy()][-len(fitted):]
+            future = len(series) - 1 + np.arange(1, horizon + 1)
+            future_index = pd.date_range(series.index[-1], periods=horizon + 1, freq=TREND_FREQUENCIES[freq])[1:]
+        else:
+            positions = (fitted.index - fitted.index[0]).total_seconds().to_numpy()
+            # Future observations assumed at the median interval between past ones
+            interval = np.median(np.diff(positions))
+            future = positions[-1] + interval * np.arange(1, horizon + 1)
+            future_index = fitted.index[0] + pd.to_timedelta(future, unit="s")
+        slope, intercept = np.polyfit(positions, fitted.to_numpy(), 1)
+        forecast = {
+            "timestamps": [timestamp.isoformat() for timestamp in future_index.to_pydatetime()],
+            "values": _to_list(intercept + slope * future),
+            "slope": float(slope),
+        }
+
+    return {
+        "timestamps": [timestamp.isoformat() for timestamp in series.index.to_pydatetime()],
+        "values": _to_list(series.to_numpy()),
+        "moving_average": _to_list(moving_average.to_numpy()),
+        "delta": _to_list(delta.to_numpy()),
+        "delta_pct": _to_list(delta_pct.to_numpy()),
+        "forecast": forecast,
+    }
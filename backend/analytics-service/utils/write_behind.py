@@ -0,0 +1,242 @@
+"""
+Write-behind buffer for analytics service
+Accepted rows wait in a bounded in-memory queue and a background thread
+writes them in batches, once enough rows are queued or the oldest has
+waited long enough. Rows can also be appended to a local spool file until
+written, so they survive a crash of the process.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError, TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger("analytics-service")
+
+RETRY_MIN_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+
+
+def is_transient(error: SQLAlchemyError) -> bool:
+    """Errors worth retrying: lost connections, pool exhaustion, timeouts, deadlocks"""
+    if isinstance(error, (OperationalError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def describe(error: SQLAlchemyError) -> str:
+    return str(getattr(error, "orig", None) or error).strip().splitlines()[0]
+
+
+def read_spool(path: str) -> List[Dict[str, Any]]:
+    """Records of a spool file; a line torn by a crash is skipped"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping unreadable line {number} of spool {path}")
+    return records
+
+
+class Spool:
+    """Append-only NDJSON file holding the queued rows that are not written yet.
+
+    Written rows are dropped by truncating the file once the queue is
+    empty, or by rewriting it with the remaining rows after ``compact_rows``
+    rows were written since the last rewrite.
+    """
+
+    def __init__(self, path: str, compact_rows: int):
+        self.path = path
+        self.compact_rows = compact_rows
+        self._released = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def append(self, rows: List[Dict[str, Any]]):
+        self._file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+        self._file.flush()
+
+    def release(self, count: int, pending: List[Dict[str, Any]]):
+        """Forget ``count`` written rows; ``pending`` are the rows still queued"""
+        self._released += count
+        if not pending:
+            # Rewind too, or the next append lands after a run of NUL bytes
+            self._file.seek(0)
+            self._file.truncate()
+            self._released = 0
+        elif self._released >= self.compact_rows:
+            temporary = self.path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row, default=str) + "\n" for row in pending))
+            self._file.close()
+            os.replace(temporary, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._released = 0
+
+    def close(self):
+        self._file.close()
+
+
+class WriteBehindQueue:
+    """Bounded queue of rows written by ``write`` in batches on a daemon thread.
+
+    ``put`` refuses rows once ``max_rows`` are queued or being written, so
+    callers can push back on their clients. A batch failing with a
+    transient error is retried until it is written; any other database
+    error makes its rows be written one by one, dropping the failing ones.
+    ``stop`` writes everything still queued before returning.
+
+    Spool file I/O happens under its own lock, never under the queue's
+    condition, so a spool compaction does not hold up ``stats`` or the
+    writer taking its next batch. With a spool, ``put`` writes to a file
+    and should not be called from an event loop.
+    """
+
+    def __init__(self, name: str, write: Callable[[List[Dict[str, Any]]], Any], max_rows: int,
+                 batch_size: int, max_delay: float, spool_path: Optional[str] = None):
+        self.name = name
+        self.write = write
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.spool_path = spool_path
+        self._spool: Optional[Spool] = None
+        # (time queued, row)
+        self._rows: deque = deque()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # Taken before the condition; keeps the spool in step with the queue
+        self._spool_lock = threading.Lock()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the writer; the spool is emptied, recover its rows with read_spool first"""
+        if self._thread is not None:
+            return
+        if self.spool_path:
+            self._spool = Spool(self.spool_path, compact_rows=self.max_rows)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write the queued rows and stop; rows left after the timeout stay in the spool"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.error(f"{self.name}: {len(self._rows) + self._in_flight} rows not written on shutdown")
+            elif self._spool is not None:
+                self._spool.close()
+
+    def put(self, rows: List[Dict[str, Any]]) -> bool:
+        """Queue rows, or return False if the queue has no room for them"""
+        if self._spool is None:
+            with self._condition:
+                return self._has_room(rows) and self._enqueue(rows)
+        with self._spool_lock:
+            with self._condition:
+                if not self._has_room(rows):
+                    return False
+            # Only the writer frees room meanwhile, and it waits for the spool lock
+            self._spool.append(rows)
+            with self._condition:
+                return self._enqueue(rows)
+
+    def _has_room(self, rows: List[Dict[str, Any]]) -> bool:
+        """Whether rows fit in the queue, counting them as rejected if not; the condition must be held"""
+        if self._stopping or len(self._rows) + self._in_flight + len(rows) > self.max_rows:
+            self.rejected += len(rows)
+            return False
+        return True
+
+    def _enqueue(self, rows: List[Dict[str, Any]]) -> bool:
+        """Add rows to the queue; the condition must be held"""
+        queued = time.monotonic()
+        self._rows.extend((queued, row) for row in rows)
+        self.accepted += len(rows)
+        if len(self._rows) >= self.batch_size or len(self._rows) == len(rows):
+            # A full batch, or the first row whose delay starts now
+            self._condition.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if len(self._rows) >= self.batch_size or (self._stopping and self._rows):
+                        break
+                    if self._stopping:
+                        return
+                    if self._rows:
+                        remaining = self._rows[0][0] + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                batch = [self._rows.popleft()[1] for _ in range(min(self.batch_size, len(self._rows)))]
+                self._in_flight = len(batch)
+            self._write_batch(batch)
+            if self._spool is None:
+                with self._condition:
+                    self._in_flight = 0
+                continue
+            with self._spool_lock:
+                with self._condition:
+                    self._in_flight = 0
+                    pending = [row for _, row in self._rows]
+                self._spool.release(len(batch), pending)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        delay = RETRY_MIN_DELAY
+        while True:
+            try:
+                self.write(batch)
+                self.written += len(batch)
+                return
+            except SQLAlchemyError as e:
+                if not is_transient(e):
+                    error = e
+                    break
+                logger.warning(f"{self.name}: writing {len(batch)} rows failed, retrying in {delay}s: {describe(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+        if len(batch) > 1:
+            # Find the rows the database refuses
+            for row in batch:
+                self._write_batch([row])
+            return
+        self.dropped += 1
+        logger.error(f"{self.name}: dropping row {batch[0].get('id')}: {describe(error)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "queued": len(self._rows) + self._in_flight,
+                "max_rows": self.max_rows,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "dropped": self.dropped,
+            }